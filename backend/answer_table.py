@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Réponses précalculées pour les questions les plus fréquentes
+- Regroupement des questions journalisées en intentions (similarité des embeddings)
+- Table de réponses générées à partir de l'index courant, reconstruite en arrière-plan
+  après chaque réindexation
+- Recherche par plus proche variante : au-dessus du seuil, la réponse est servie
+  sans recherche documentaire ni appel LLM
+"""
+
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def cluster_intents(questions: Sequence[str], counts: Sequence[int], embeddings: np.ndarray,
+                    similarity: float = 0.85) -> List[Dict]:
+    """
+    Regroupement glouton des questions, de la plus fréquente à la moins fréquente
+
+    Une question rejoint l'intention dont le représentant est le plus proche si la similarité
+    cosinus dépasse le seuil, sinon elle ouvre une nouvelle intention.
+
+    Returns:
+        [{'question': représentant, 'count': occurrences cumulées, 'variants': [(question, count)]}]
+        triées par fréquence décroissante
+    """
+    order = np.argsort(-np.asarray(counts), kind="stable")
+    vectors = _normalize(embeddings)
+    leaders: List[int] = []
+    intents: List[Dict] = []
+    for i in order:
+        if leaders:
+            scores = vectors[leaders] @ vectors[i]
+            best = int(np.argmax(scores))
+            if scores[best] >= similarity:
+                intents[best]['count'] += int(counts[i])
+                intents[best]['variants'].append((questions[i], int(counts[i])))
+                continue
+        leaders.append(int(i))
+        intents.append({'question': questions[i], 'count': int(counts[i]), 'variants': [(questions[i], int(counts[i]))]})
+    return sorted(intents, key=lambda intent: -intent['count'])
+
+
+class AnswerTable:
+    """
+    Table des réponses précalculées (intents.json → answers.json dans le même dossier)
+
+    Une table n'est servie que pour la version d'index avec laquelle elle a été construite ;
+    toute écriture dans l'index la rend inactive jusqu'à la reconstruction suivante.
+
+    Args:
+        directory: Dossier de intents.json (produit par scripts/build_answer_intents.py) et answers.json
+        min_similarity: Similarité cosinus minimale avec une variante connue de l'intention
+    """
+
+    def __init__(self, directory: str, min_similarity: float = 0.92):
+        self.directory = Path(directory)
+        self.intents_path = self.directory / "intents.json"
+        self.answers_path = self.directory / "answers.json"
+        self.min_similarity = min_similarity
+        self.index_version: Optional[int] = None  # version d'index servie (None = table inactive)
+        self._entries: List[Dict] = []
+        self._vectors: Dict[str, np.ndarray] = {}  # langue → variantes normalisées
+        self._owners: Dict[str, np.ndarray] = {}  # langue → indice de l'entrée de chaque variante
+        self._meta: Dict = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="answer-table")
+        self._rebuild_pending = False
+        self.stats = {'lookups': 0, 'hits': 0, 'stale': 0, 'rebuilds': 0, 'rebuild_errors': 0}
+        self._load()
+
+    def _load(self):
+        if not self.answers_path.exists():
+            return
+        try:
+            with open(self.answers_path, 'r', encoding='utf-8') as f:
+                table = json.load(f)
+            self._install(table)
+            logger.info(f"📇 Table de réponses chargée: {len(self._entries)} intentions ({self.answers_path})")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Table de réponses illisible ({e}), reconstruction nécessaire")
+
+    def _install(self, table: Dict):
+        vectors, owners = {}, {}
+        for language in {entry['language'] for entry in table['entries']}:
+            rows = [(i, v) for i, entry in enumerate(table['entries']) if entry['language'] == language
+                    for v in entry['embeddings']]
+            vectors[language] = _normalize(np.array([v for _, v in rows]))
+            owners[language] = np.array([i for i, _ in rows])
+        with self._lock:
+            self._entries = table['entries']
+            self._vectors, self._owners = vectors, owners
+            self._meta = {key: value for key, value in table.items() if key != 'entries'}
+
+    def has_intents(self) -> bool:
+        return self.intents_path.exists()
+
+    def adopt(self, index_version: int, fingerprint: str, embedding_label: str) -> bool:
+        """Au démarrage : réutilise la table sur disque si elle a été construite pour ce corpus et ce modèle"""
+        intents_version = self._intents_version()
+        if (self._entries and self._meta.get('fingerprint') == fingerprint
+                and self._meta.get('embedding') == embedding_label
+                and self._meta.get('intents_version') == intents_version):
+            self.index_version = index_version
+            return True
+        self.index_version = None
+        return False
+
+    def _intents_version(self) -> Optional[str]:
+        if not self.has_intents():
+            return None
+        with open(self.intents_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('version')
+
+    def lookup(self, embedding: Sequence[float], language: str, index_version: int) -> Optional[Dict]:
+        """Entrée de la table si la question correspond à une intention connue, sinon None"""
+        with self._lock:
+            self.stats['lookups'] += 1
+            if self.index_version is None or self.index_version != index_version:
+                self.stats['stale'] += 1
+                return None
+            vectors = self._vectors.get(language)
+            if vectors is None:
+                return None
+            query = _normalize(np.array([embedding]))[0]
+            scores = vectors @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.min_similarity:
+                return None
+            self.stats['hits'] += 1
+            entry = self._entries[self._owners[language][best]]
+            return {**{key: value for key, value in entry.items() if key != 'embeddings'},
+                    'similarity': round(float(scores[best]), 4)}
+
+    def build(self, encode: Callable[[List[str]], np.ndarray], answer: Callable[[str, str], Optional[Dict]],
+              index_version: int, fingerprint: str, embedding_label: str):
+        """
+        Génère les réponses des intentions à partir de l'index courant et remplace la table
+
+        Args:
+            encode: Embeddings d'une liste de questions (modèle de l'index)
+            answer: (question, langue) → {'answer', 'sources', 'citations'} ou None si pas de réponse fiable
+        """
+        with open(self.intents_path, 'r', encoding='utf-8') as f:
+            intents = json.load(f)
+
+        entries = []
+        for intent in intents['intents']:
+            result = answer(intent['question'], intent['language'])
+            if result is None:
+                logger.info(f"⏭️ Intention {intent['id']} ignorée (pas de réponse fiable): {intent['question'][:60]}")
+                continue
+            variants = [intent['question']] + [v for v in intent.get('variants', []) if v != intent['question']]
+            entries.append({
+                'id': intent['id'],
+                'language': intent['language'],
+                'question': intent['question'],
+                'count': intent.get('count'),
+                'answer': result['answer'],
+                'sources': result['sources'],
+                'citations': result['citations'],
+                'embeddings': np.asarray(encode(variants), dtype=np.float32).round(6).tolist(),
+            })
+
+        table = {
+            'built_at': datetime.now().isoformat(),
+            'intents_version': intents.get('version'),
+            'fingerprint': fingerprint,
+            'embedding': embedding_label,
+            'entries': entries,
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.answers_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(table, f, ensure_ascii=False)
+        os.replace(tmp_path, self.answers_path)
+
+        self._install(table)
+        self.index_version = index_version
+        logger.info(f"📇 Table de réponses reconstruite: {len(entries)}/{len(intents['intents'])} intentions")
+
+    def request_rebuild(self, build: Callable[[], None]):
+        """Reconstruction en arrière-plan ; les demandes reçues avant son démarrage sont regroupées"""
+        with self._lock:
+            self.index_version = None
+            if self._rebuild_pending:
+                return
+            self._rebuild_pending = True
+        self._executor.submit(self._run_rebuild, build)
+
+    def _run_rebuild(self, build: Callable[[], None]):
+        with self._lock:
+            self._rebuild_pending = False
+        try:
+            build()
+            self.stats['rebuilds'] += 1
+        except Exception:
+            self.stats['rebuild_errors'] += 1
+            logger.exception("❌ Échec de la reconstruction de la table de réponses")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            by_language = {}
+            for entry in self._entries:
+                by_language[entry['language']] = by_language.get(entry['language'], 0) + 1
+            return {
+                **stats,
+                'active': self.index_version is not None,
+                'intents': by_language,
+                'min_similarity': self.min_similarity,
+                'built_at': self._meta.get('built_at'),
+                'hit_rate': round(stats['hits'] / stats['lookups'] * 100, 2) if stats['lookups'] else 0,
+            }
@@ -6,13 +6,18 @@ Base de connaissance vectorielle locale avec ChromaDB
 
 import os
 import time
+import asyncio
 import logging
+import copy
 import json
-from datetime import datetime
-from typing import Dict, List, Optional
+import re
+import threading
+from datetime import datetime, date
+from typing import Dict, Iterator, List, Optional
 from pathlib import Path
 from contextlib import asynccontextmanager
-from functools import lru_cache
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from collections import defaultdict
 
 from fastapi import FastAPI, HTTPException, Request, Header, Depends
@@ -22,16 +27,54 @@ from dotenv import load_dotenv
 from langdetect import detect, DetectorFactory
 import chromadb
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from groq import Groq
 import secrets
 import hashlib
 
 # Import du processeur de documents universel
 try:
-    from .document_processor import DocumentProcessor, chunk_text
+    from .document_processor import DocumentProcessor, Chunk, iter_chunks, iter_chunks_tokens
+    from .deduplication import ChunkDeduplicator, make_chunk_id, split_sources, normalize_text
+    from .document_watcher import DocumentWatcher
+    from .ingestion_pipeline import IngestionPipeline
+    from .embedding_batcher import LengthBucketedEncoder, set_encoder_threads
+    from .embedding_backend import (
+        SerializedEncoder, load_embedding_model, save_embedding_probe, check_embedding_compatibility
+    )
+    from .lexical_index import BM25Index, reciprocal_rank_fusion
+    from .reranker import CrossEncoderReranker
+    from .vector_store import (
+        ChromaVectorStore, NumpyVectorStore, matches_where, source_key, SOURCE_PREFIX, TAG_PREFIX, DATE_KEY
+    )
+    from .context_packer import TokenCounter, ContextPacker
+    from .prompt_builder import PromptBuilder
+    from .history_compactor import HistoryCompactor
+    from .llm_client import ResilientLLMClient, CircuitBreaker, LLMUnavailableError, LLMTimeoutError
+    from .llm_provider import PoolConfig, load_provider_config, get_provider
+    from .model_router import ModelRouter
+    from .single_flight import SingleFlight
+    from .answer_table import AnswerTable
 except ImportError:
-    from document_processor import DocumentProcessor, chunk_text
+    from document_processor import DocumentProcessor, Chunk, iter_chunks, iter_chunks_tokens
+    from deduplication import ChunkDeduplicator, make_chunk_id, split_sources, normalize_text
+    from document_watcher import DocumentWatcher
+    from ingestion_pipeline import IngestionPipeline
+    from embedding_batcher import LengthBucketedEncoder, set_encoder_threads
+    from embedding_backend import (
+        SerializedEncoder, load_embedding_model, save_embedding_probe, check_embedding_compatibility
+    )
+    from lexical_index import BM25Index, reciprocal_rank_fusion
+    from reranker import CrossEncoderReranker
+    from vector_store import (
+        ChromaVectorStore, NumpyVectorStore, matches_where, source_key, SOURCE_PREFIX, TAG_PREFIX, DATE_KEY
+    )
+    from context_packer import TokenCounter, ContextPacker
+    from prompt_builder import PromptBuilder
+    from history_compactor import HistoryCompactor
+    from llm_client import ResilientLLMClient, CircuitBreaker, LLMUnavailableError, LLMTimeoutError
+    from llm_provider import PoolConfig, load_provider_config, get_provider
+    from model_router import ModelRouter
+    from single_flight import SingleFlight
+    from answer_table import AnswerTable
 
 # Configuration langdetect
 DetectorFactory.seed = 0
@@ -44,13 +87,139 @@ load_dotenv()
 # ==========================================
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+# Racine d'un serveur compatible (le SDK Groq appelle <racine>/openai/v1/...), ex. scripts/llm_stub_server.py
+# pour les tests hors ligne ; vide = API Groq
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+# Fournisseur des appels LLM : groq, ou autre nom configuré par LLM_PROVIDER_<NOM>_BASE_URL / _API_KEY
+# (API compatible OpenAI ; GROQ_MODEL et GROQ_FAST_MODEL désignent alors les modèles de ce fournisseur)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()
+# Pool de connexions HTTP du fournisseur, partagé par tous les appels
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+LLM_POOL_KEEPALIVE_SECONDS = float(os.getenv("LLM_POOL_KEEPALIVE_SECONDS", "30"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "false").lower() == "true"  # nécessite httpx[http2]
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+GROQ_FAST_MODEL = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "800"))
 DOCUMENTS_DIR = os.getenv("DOCUMENTS_DIR", "../documents")
+# Catalogue des documents (tags, date) dans le dossier documents/
+DOCUMENT_CATALOG = os.getenv("DOCUMENT_CATALOG", "catalog.json")
 
 # Limites de sécurité
 MAX_QUESTION_LENGTH = 500
 MAX_HISTORY_SIZE = 10
 RATE_LIMIT_SECONDS = 3
 
+# Découpage : "tokens" (tokenizer du modèle d'embeddings) ou "words" (historique)
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "tokens")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "0"))  # 0 = max_seq_length du modèle
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# Déduplication des chunks quasi identiques à l'indexation
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+
+# Surveillance du dossier documents/ (indexation incrémentale)
+WATCH_DOCUMENTS = os.getenv("WATCH_DOCUMENTS", "false").lower() == "true"
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "1.0"))
+
+# Recherche hybride : BM25 + vecteurs, fusion par rang réciproque (RRF)
+HYBRID_ENABLED = os.getenv("HYBRID_ENABLED", "true").lower() == "true"
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.5"))  # 0 = vecteurs seuls, 1 = BM25 seul
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+LEXICAL_BUDGET_MS = float(os.getenv("LEXICAL_BUDGET_MS", "5"))
+
+# Reranking par cross-encoder (optionnel)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "400"))
+
+# Seuil de pertinence : au-delà de cette distance cosinus, la question est hors périmètre
+# et le LLM n'est pas appelé. Désactivé par défaut : activer une fois RELEVANCE_MAX_DISTANCE
+# calibré sur le trafic journalisé et les rejets annotés (scripts/calibrate_relevance.py)
+RELEVANCE_GATE_ENABLED = os.getenv("RELEVANCE_GATE_ENABLED", "false").lower() == "true"
+RELEVANCE_MAX_DISTANCE = float(os.getenv("RELEVANCE_MAX_DISTANCE", "0.65"))
+RELEVANCE_MARGIN = float(os.getenv("RELEVANCE_MARGIN", "0.15"))  # k adaptatif : écart max au meilleur chunk
+# Au-delà du seuil, un meilleur score BM25 au moins égal garde les résultats lexicaux (codes d'erreur, postes)
+RELEVANCE_MIN_LEXICAL_SCORE = float(os.getenv("RELEVANCE_MIN_LEXICAL_SCORE", "6.0"))
+
+# Budget de tokens du prompt (comptés avec le tokenizer du modèle Groq)
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "")  # vide = estimation (caractères/token)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))  # système + historique + contexte + question
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_MIN_TOKEN_BUDGET = int(os.getenv("CONTEXT_MIN_TOKEN_BUDGET", "500"))  # historique réduit en dessous
+CONTEXT_MAX_PASSAGES = int(os.getenv("CONTEXT_MAX_PASSAGES", "3"))
+CONTEXT_SENTENCE_WINDOW = int(os.getenv("CONTEXT_SENTENCE_WINDOW", "2"))  # phrases gardées autour de la correspondance (passages qui dépassent le budget)
+CONTEXT_MAX_PASSAGE_TOKENS = int(os.getenv("CONTEXT_MAX_PASSAGE_TOKENS", "400"))
+
+# Compaction de l'historique : off, extractive (sans appel) ou llm (résumé en arrière-plan)
+HISTORY_COMPACTION = os.getenv("HISTORY_COMPACTION", "off").lower()
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "1"))  # tours gardés en entier
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "200"))
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "llama-3.1-8b-instant")
+
+# Résilience des appels LLM
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "20"))  # secondes par tentative
+LLM_TOTAL_TIMEOUT = float(os.getenv("LLM_TOTAL_TIMEOUT", "45"))  # secondes, nouvelles tentatives comprises
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))  # sur 429, 5xx et timeouts
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "4"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # échecs consécutifs avant ouverture
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_DELAY_MS = float(os.getenv("LLM_HEDGE_DELAY_MS", "0"))  # 0 = p95 des latences observées
+
+# Routage entre GROQ_FAST_MODEL et GROQ_MODEL (ajuster les seuils à partir des logs de conversation)
+# Désactivé par défaut. Les signaux de routage sont journalisés même désactivé : activer après
+# lecture de scripts/analyze_routing.py (part de trafic rapide selon ROUTER_CONFIDENT_DISTANCE),
+# puis y comparer latence et taux de refus par route
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "false").lower() == "true"
+ROUTER_CONFIDENT_DISTANCE = float(os.getenv("ROUTER_CONFIDENT_DISTANCE", "0.35"))
+ROUTER_SHORT_QUESTION_WORDS = int(os.getenv("ROUTER_SHORT_QUESTION_WORDS", "12"))
+ROUTER_PREMIUM_PLANS = [p.strip() for p in os.getenv("ROUTER_PREMIUM_PLANS", "enterprise").split(",") if p.strip()]
+ROUTER_FAST_MAX_TOKENS = int(os.getenv("ROUTER_FAST_MAX_TOKENS", "600"))
+ROUTER_SHORT_ANSWER_MAX_TOKENS = int(os.getenv("ROUTER_SHORT_ANSWER_MAX_TOKENS", "300"))
+
+# Coalescence des questions identiques simultanées (une seule recherche + un seul appel LLM)
+# Désactivé par défaut : activer après un test de charge avec et sans (scripts/load_test.py,
+# scénario burst_identical.json : appels LLM et compteurs de coalescence dans metrics_delta)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "false").lower() == "true"
+
+# Réponses précalculées des questions fréquentes (intentions : scripts/build_answer_intents.py),
+# reconstruites après chaque réindexation ; servies sans recherche ni appel LLM au-dessus du seuil
+# Désactivé par défaut : activer une fois answer_table/intents.json produit par ce script et relu
+# (intentions dépendant de la conversation ou de l'utilisateur retirées), réponses comprises
+ANSWER_TABLE_ENABLED = os.getenv("ANSWER_TABLE_ENABLED", "false").lower() == "true"
+ANSWER_TABLE_DIR = os.getenv("ANSWER_TABLE_DIR", "../answer_table")
+ANSWER_TABLE_MIN_SIMILARITY = float(os.getenv("ANSWER_TABLE_MIN_SIMILARITY", "0.92"))
+
+# Base vectorielle : "chroma" (HNSW) ou "numpy" (exhaustif, fichier mappé en mémoire)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+NUMPY_INDEX_DIR = os.getenv("NUMPY_INDEX_DIR", "../vector_index")
+# Compression des vecteurs (base numpy) : "", "int8", "pca" ou "pca_int8", rescorée en float32
+VECTOR_COMPRESSION = os.getenv("VECTOR_COMPRESSION", "").lower()
+VECTOR_REDUCED_DIM = int(os.getenv("VECTOR_REDUCED_DIM", "128"))
+VECTOR_RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+
+# Pipeline d'ingestion (étages en parallèle)
+INGEST_EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+
+# Encodage inter-documents par lots triés par longueur
+EMBED_WINDOW = int(os.getenv("EMBED_WINDOW", "512"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))
+
+# Modèle d'embeddings : backend "torch" (SentenceTransformer) ou "onnx" (onnxruntime)
+EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "../models/all-MiniLM-L6-v2-onnx")
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "false").lower() == "true"
+# Compatibilité avec l'index existant (vecteurs sondes) : en dessous, réindexation
+EMBED_COMPAT_MIN_COSINE = float(os.getenv("EMBED_COMPAT_MIN_COSINE", "0.99"))
+EMBED_AUTO_REINDEX = os.getenv("EMBED_AUTO_REINDEX", "true").lower() == "true"
+
 # ==========================================
 # 🔐 AUTHENTIFICATION API KEYS
 # ==========================================
@@ -63,6 +232,24 @@ VALID_API_KEYS = {
     # Ajouter vos clients ici
 }
 
+# Plan des tests de charge (sans quota mensuel, 100 000 requêtes/minute) : réservé à un backend
+# de test branché sur scripts/llm_stub_server.py, jamais activé en production
+LOADTEST_KEYS_ENABLED = os.getenv("LOADTEST_KEYS_ENABLED", "false").lower() == "true"
+LOADTEST_KEY_PREFIX = "sk_loadtest_"
+
+# Clés supplémentaires "client=clé,client=clé" (ex. clés des tests de charge, plan sk_loadtest_)
+ignored_loadtest_clients = []
+for entry in filter(None, os.getenv("EXTRA_API_KEYS", "").split(",")):
+    client_name, _, client_key = entry.strip().partition("=")
+    if client_key.startswith(LOADTEST_KEY_PREFIX) and not LOADTEST_KEYS_ENABLED:
+        ignored_loadtest_clients.append(client_name)
+        continue
+    if client_key:
+        VALID_API_KEYS[client_name] = client_key
+
+# Plans autorisés sur les endpoints d'administration (ex. POST /api/answer-table/rebuild)
+ADMIN_PLANS = [p.strip() for p in os.getenv("ADMIN_PLANS", "enterprise").split(",") if p.strip()]
+
 # Système de quotas par type de clé
 QUOTA_LIMITS = {
     "sk_demo_": 100,        # Plan démo: 100 requêtes/mois
@@ -82,6 +269,10 @@ RATE_LIMIT_PER_MINUTE = {
     "sk_enterprise_": 100,
 }
 
+if LOADTEST_KEYS_ENABLED:
+    QUOTA_LIMITS[LOADTEST_KEY_PREFIX] = 999999999
+    RATE_LIMIT_PER_MINUTE[LOADTEST_KEY_PREFIX] = 100000
+
 # Métriques
 metrics = {
     'total_requests': 0,
@@ -89,7 +280,23 @@ metrics = {
     'failed_requests': 0,
     'total_response_time': 0.0,
     'cache_hits': 0,
-    'cache_misses': 0
+    'cache_misses': 0,
+    'last_deduplication': None,
+    'last_ingestion': None,
+    'hybrid_searches': 0,
+    'lexical_timeouts': 0,
+    'llm_calls_avoided': 0,
+    'relevance_rejections': 0,
+    'relevance_lexical_overrides': 0,
+    'llm_calls': 0,
+    'prompt_tokens_total': 0,
+    'prompt_variable_tokens_total': 0,
+    'cached_prompt_tokens_total': 0,
+    'coalesced_requests': 0,
+    'precomputed_answers': 0,
+    'context_passages_dropped': 0,
+    'history_trimmed': 0,
+    'embedding_compatibility': None
 }
 
 # ==========================================
@@ -113,6 +320,21 @@ class JSONFormatter(logging.Formatter):
             log_data['session_id'] = record.session_id
         if hasattr(record, 'duration'):
             log_data['duration'] = record.duration
+        if hasattr(record, 'top_distance'):
+            log_data['top_distance'] = record.top_distance
+            log_data['llm_called'] = record.llm_called
+        if getattr(record, 'route', None):
+            log_data['route'] = record.route
+            log_data['model'] = record.model
+        if getattr(record, 'coalesced', False):
+            log_data['coalesced'] = True
+        if getattr(record, 'precomputed', None):
+            log_data['precomputed'] = record.precomputed
+        if hasattr(record, 'prompt_tokens'):
+            log_data['prompt_tokens'] = record.prompt_tokens
+            log_data['context_tokens'] = record.context_tokens
+            log_data['variable_tokens'] = record.variable_tokens
+            log_data['cached_tokens'] = record.cached_tokens
         return json.dumps(log_data)
 
 json_handler = logging.FileHandler('chatbot.log')
@@ -152,6 +374,17 @@ def get_key_prefix(api_key: str) -> str:
         return f"{parts[0]}_{parts[1]}_"
     return "sk_demo_"
 
+def get_plan(api_key: str) -> str:
+    """Plan du client ("demo", "starter", "business", "enterprise"…)"""
+    return get_key_prefix(api_key)[len("sk_"):-1]
+
+def verify_admin_key(api_key: str = Depends(verify_api_key)):
+    """Clé API valide d'un plan d'administration (ADMIN_PLANS)"""
+    if get_plan(api_key) not in ADMIN_PLANS:
+        logger.warning(f"❌ Accès administration refusé (plan {get_plan(api_key)})")
+        raise HTTPException(status_code=403, detail="Clé API sans droits d'administration")
+    return api_key
+
 def check_quota(api_key: str):
     """Vérifier si le quota mensuel n'est pas dépassé"""
     current_month = datetime.now().month
@@ -204,8 +437,12 @@ def check_rate_limit(api_key: str):
         )
 
 def log_conversation(question: str, answer: str, response_time: float, 
-                     language: str, sources: List[str], has_answer: bool):
-    """Logger une conversation pour analyse Evidently"""
+                     language: str, sources: List[str], has_answer: bool,
+                     top_distance: Optional[float] = None, llm_called: bool = True,
+                     prompt_tokens: Optional[int] = None, context_tokens: Optional[int] = None,
+                     routing: Optional[Dict] = None, coalesced: bool = False,
+                     precomputed: Optional[Dict] = None, relevance: Optional[Dict] = None):
+    """Logger une conversation pour analyse Evidently (et calibration du seuil de pertinence)"""
     log_entry = {
         "timestamp": datetime.now().isoformat(),
         "question": question,
@@ -215,7 +452,15 @@ def log_conversation(question: str, answer: str, response_time: float,
         "sources": sources,
         "has_answer": has_answer,
         "confidence": 0.85 if has_answer and sources else 0.5,
-        "num_sources": len(sources)
+        "num_sources": len(sources),
+        "top_distance": top_distance,
+        "relevance": relevance,
+        "llm_called": llm_called,
+        "prompt_tokens": prompt_tokens,
+        "context_tokens": context_tokens,
+        "routing": routing,
+        "coalesced": coalesced,
+        "precomputed": precomputed
     }
     
     # Ajouter au fichier du jour (format JSONL)
@@ -235,15 +480,49 @@ async def lifespan(app: FastAPI):
     """Gérer les événements de démarrage et arrêt"""
     # Startup
     logger.info("🚀 Démarrage API...")
-    if collection.count() == 0:
+    if vector_store.count() == 0:
         logger.info("Collection vide, indexation des documents...")
         index_documents()
     else:
-        logger.info(f"Collection déjà indexée: {collection.count()} chunks")
+        logger.info(f"Collection déjà indexée: {vector_store.count()} chunks")
+        compatibility = check_embedding_compatibility(
+            embedding_model, embedding_probe_path, EMBED_COMPAT_MIN_COSINE
+        )
+        metrics['embedding_compatibility'] = {**compatibility, 'current': EMBEDDING_LABEL, 'reindexed': False}
+        if compatibility['compatible'] is False:
+            logger.warning(
+                f"⚠️ Embeddings incompatibles avec l'index ({compatibility['indexed_with']} → {EMBEDDING_LABEL}, "
+                f"cosinus min {compatibility['min_cosine']})"
+            )
+        if compatibility['compatible'] is False and EMBED_AUTO_REINDEX:
+            logger.info("Réindexation complète avec le modèle courant...")
+            rebuild_index()
+            metrics['embedding_compatibility']['reindexed'] = True
+        else:
+            load_indexes()
+            if answer_table and answer_table.has_intents() and not answer_table.adopt(
+                index_version, corpus_fingerprint(), EMBEDDING_LABEL
+            ):
+                schedule_answer_table_rebuild()
+    
+    global document_watcher
+    if WATCH_DOCUMENTS:
+        processor = DocumentProcessor()
+        document_watcher = DocumentWatcher(
+            str(get_documents_dir()),
+            on_change=index_file,
+            on_delete=lambda path: remove_document(Path(path).name),
+            is_supported=processor.is_supported,
+            debounce_seconds=WATCH_DEBOUNCE_SECONDS
+        )
+        document_watcher.start()
     
     yield
     
     # Shutdown
+    if document_watcher:
+        document_watcher.stop()
+    llm_provider.close()
     logger.info("🔌 Arrêt API...")
 
 app = FastAPI(
@@ -266,35 +545,138 @@ app.add_middleware(
 # 🧠 INITIALISATION SERVICES
 # ==========================================
 
-# Client Groq
-groq_client = Groq(api_key=GROQ_API_KEY)
+# Fournisseur LLM (SDK) sur un pool de connexions partagé (nouvelles tentatives gérées par llm_client)
+llm_provider = get_provider(
+    load_provider_config(LLM_PROVIDER, GROQ_API_KEY, GROQ_BASE_URL),
+    PoolConfig(
+        max_connections=LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive=LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_POOL_KEEPALIVE_SECONDS,
+        http2=LLM_HTTP2,
+        connect_timeout=LLM_CONNECT_TIMEOUT
+    )
+)
+if llm_provider.custom_base_url:
+    logger.warning(f"⚠️ Appels LLM redirigés vers {llm_provider.base_url}")
+if LOADTEST_KEYS_ENABLED:
+    logger.warning(f"⚠️ Plan de test de charge {LOADTEST_KEY_PREFIX} actif (LOADTEST_KEYS_ENABLED) : "
+                   f"clés sans quota, réservées aux tests")
+elif ignored_loadtest_clients:
+    logger.warning(f"⚠️ Clés {LOADTEST_KEY_PREFIX} ignorées ({', '.join(ignored_loadtest_clients)}) : "
+                   f"LOADTEST_KEYS_ENABLED=false")
+llm_client = ResilientLLMClient(
+    llm_provider.create,
+    attempt_timeout=LLM_ATTEMPT_TIMEOUT,
+    total_timeout=LLM_TOTAL_TIMEOUT,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE,
+    backoff_max=LLM_BACKOFF_MAX,
+    breaker=CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS),
+    hedge=LLM_HEDGE_ENABLED,
+    hedge_delay=LLM_HEDGE_DELAY_MS / 1000 or None
+)
 
 # Modèle d'embeddings (léger et efficace)
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-
-# Base vectorielle ChromaDB
-chroma_client = chromadb.Client(Settings(
-    persist_directory="../chroma_db",
-    anonymized_telemetry=False
+if EMBED_BACKEND == "torch":
+    set_encoder_threads(EMBED_THREADS)
+# Partagé par les requêtes, l'indexation, la surveillance et la table de réponses : encode() sérialisé
+embedding_model = SerializedEncoder(load_embedding_model(
+    EMBED_BACKEND, EMBED_MODEL, ONNX_MODEL_DIR, quantized=ONNX_QUANTIZED, threads=EMBED_THREADS
 ))
+# Identifie les embeddings de l'index (vecteurs sondes enregistrés à l'indexation)
+EMBEDDING_LABEL = f"{getattr(embedding_model, 'backend', 'torch')}:{EMBED_MODEL}"
+embedding_encoder = LengthBucketedEncoder(embedding_model, batch_size=EMBED_BATCH_SIZE)
+# Copie dédiée au découpage : un tokenizer rapide ne doit pas être partagé entre threads
+chunk_tokenizer = copy.deepcopy(embedding_model.tokenizer)
 
-# Collection pour les documents
-try:
-    collection = chroma_client.get_collection("it_support_docs")
-    logger.info("✅ Collection ChromaDB chargée")
-except:
-    collection = chroma_client.create_collection(
-        name="it_support_docs",
-        metadata={"hnsw:space": "cosine"}
+# Comptage des tokens du prompt et assemblage du contexte
+prompt_token_counter = TokenCounter(PROMPT_TOKENIZER)
+context_packer = ContextPacker(
+    prompt_token_counter,
+    sentence_window=CONTEXT_SENTENCE_WINDOW,
+    max_passage_tokens=CONTEXT_MAX_PASSAGE_TOKENS
+)
+# Choix du modèle par requête (rapide ou grand)
+model_router = ModelRouter(
+    GROQ_MODEL, GROQ_FAST_MODEL,
+    enabled=ROUTER_ENABLED,
+    confident_distance=ROUTER_CONFIDENT_DISTANCE,
+    short_question_words=ROUTER_SHORT_QUESTION_WORDS,
+    premium_plans=ROUTER_PREMIUM_PLANS,
+    large_max_tokens=LLM_MAX_TOKENS,
+    fast_max_tokens=ROUTER_FAST_MAX_TOKENS,
+    short_answer_max_tokens=ROUTER_SHORT_ANSWER_MAX_TOKENS
+)
+
+# Messages du LLM : préfixe système statique (cache de préfixe côté fournisseur) + parties variables
+prompt_builder = PromptBuilder(prompt_token_counter, history_messages=5)
+
+def summarize_history(previous: str, folded: List[Dict]) -> str:
+    """Résumé glissant de l'historique par le modèle léger (hors chemin de la réponse)"""
+    completion = llm_client.create(
+        messages=prompt_builder.summary_request(previous, folded),
+        model=HISTORY_SUMMARY_MODEL,
+        temperature=0,
+        max_tokens=HISTORY_SUMMARY_MAX_TOKENS
+    )
+    return completion.choices[0].message.content
+
+history_compactor: Optional[HistoryCompactor] = None
+if HISTORY_COMPACTION in ("extractive", "llm"):
+    history_compactor = HistoryCompactor(
+        prompt_token_counter,
+        mode=HISTORY_COMPACTION,
+        keep_messages=HISTORY_KEEP_TURNS * 2,
+        max_summary_tokens=HISTORY_SUMMARY_MAX_TOKENS,
+        summarize=summarize_history,
+        executor=ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+    )
+
+# Cross-encoder de reranking (CPU)
+reranker = CrossEncoderReranker(RERANK_MODEL, budget_ms=RERANK_BUDGET_MS) if RERANK_ENABLED else None
+
+# Base vectorielle (ChromaDB ou NumPy exhaustif)
+if VECTOR_BACKEND == "numpy":
+    vector_store = NumpyVectorStore(
+        NUMPY_INDEX_DIR,
+        dimension=embedding_model.get_sentence_embedding_dimension(),
+        compression=VECTOR_COMPRESSION or None,
+        reduced_dim=VECTOR_REDUCED_DIM,
+        rescore_factor=VECTOR_RESCORE_FACTOR
     )
-    logger.info("✅ Nouvelle collection ChromaDB créée")
+    embedding_probe_path = Path(NUMPY_INDEX_DIR) / "embedding_probe.json"
+else:
+    if VECTOR_COMPRESSION:
+        logger.warning("⚠️ VECTOR_COMPRESSION ignoré: disponible uniquement avec VECTOR_BACKEND=numpy")
+    chroma_client = chromadb.Client(Settings(
+        persist_directory="../chroma_db",
+        anonymized_telemetry=False
+    ))
+    vector_store = ChromaVectorStore(chroma_client, "it_support_docs")
+    embedding_probe_path = Path("../chroma_db") / "embedding_probe.json"
+logger.info(f"✅ Base vectorielle: {vector_store.name} ({vector_store.count()} chunks)")
+
+# Surveillance des documents (démarrée dans lifespan si WATCH_DOCUMENTS=true)
+document_watcher: Optional[DocumentWatcher] = None
+
+# Réponses précalculées (reconstruites en arrière-plan après chaque écriture dans l'index)
+answer_table = AnswerTable(ANSWER_TABLE_DIR, ANSWER_TABLE_MIN_SIMILARITY) if ANSWER_TABLE_ENABLED else None
 
 # ==========================================
 # 📦 MODÈLES PYDANTIC
 # ==========================================
+class SearchFilters(BaseModel):
+    """Restreint la recherche à un sous-ensemble des documents"""
+    sources: Optional[List[str]] = None
+    file_types: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
 class ChatRequest(BaseModel):
     question: str = Field(..., min_length=1, max_length=MAX_QUESTION_LENGTH)
     session_id: Optional[str] = None
+    filters: Optional[SearchFilters] = None
     
     @field_validator('question')
     @classmethod
@@ -305,11 +687,24 @@ class ChatRequest(BaseModel):
             raise ValueError("Contenu suspect détecté")
         return v
 
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1, max_length=MAX_QUESTION_LENGTH)
+    top_k: int = Field(5, ge=1, le=20)
+    filters: Optional[SearchFilters] = None
+
+class Citation(BaseModel):
+    source: str
+    page: Optional[int] = None
+    char_start: Optional[int] = None
+    char_end: Optional[int] = None
+
 class ChatResponse(BaseModel):
     answer: str
     language: str
     sources: List[str] = []
+    citations: List[Citation] = []
     session_id: str
+    prompt_tokens: Optional[int] = None
 
 # ==========================================
 # 💾 GESTION SESSIONS
@@ -355,71 +750,262 @@ def detect_language(text: str) -> str:
 # ==========================================
 # 📚 INDEXATION DOCUMENTS (MULTI-FORMATS)
 # ==========================================
-def index_documents():
-    """Indexe tous les documents du dossier documents/ (PDF, Word, Excel, TXT, etc.)"""
-    # Résoudre le chemin absolu: backend/../documents = racine/documents
+
+# Sérialise les écritures dans la collection (réindexation, surveillance)
+index_lock = threading.RLock()
+
+# Version du contenu indexé, incrémentée à chaque écriture (clé de coalescence des requêtes)
+index_version = 0
+
+def bump_index_version():
+    global index_version
+    index_version += 1
+
+# Index de déduplication partagé par l'indexation complète et incrémentale
+deduplicator = ChunkDeduplicator(threshold=DEDUP_THRESHOLD)
+
+# Index lexical BM25, alimenté par les mêmes écritures que la base vectorielle
+lexical_index = BM25Index()
+
+def get_documents_dir() -> Path:
+    """Dossier des documents: backend/../documents = racine/documents"""
     backend_dir = Path(__file__).parent
     project_root = backend_dir.parent
-    docs_path = project_root / "documents"
+    return project_root / "documents"
+
+def normalize_tag(tag: str) -> str:
+    """Tag en clé de métadonnée : minuscules, caractères alphanumériques et _"""
+    return re.sub(r'[^a-z0-9]+', '_', tag.strip().lower()).strip('_')
+
+def load_document_catalog() -> Dict[str, Dict]:
+    """
+    Catalogue optionnel documents/catalog.json
+
+    Format: {"procedure_vpn.pdf": {"tags": ["procedures", "urgences"], "date": "2024-03-01"}}
+    """
+    catalog_path = get_documents_dir() / DOCUMENT_CATALOG
+    if not catalog_path.exists():
+        return {}
+    try:
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Catalogue illisible ({catalog_path.name}): {e}")
+        return {}
+
+def _document_fields(result: Dict, catalog: Dict[str, Dict]) -> Dict:
+    """Tags (booléens tag_<nom>) et date AAAAMMJJ d'un document, communs à tous ses chunks"""
+    file_path = Path(result['file_path'])
+    entry = catalog.get(file_path.name, {})
+    fields = {}
+    for tag in entry.get('tags', []):
+        if normalize_tag(tag):
+            fields[TAG_PREFIX + normalize_tag(tag)] = True
+    try:
+        doc_date = date.fromisoformat(entry['date']) if 'date' in entry else None
+    except (TypeError, ValueError):
+        logger.warning(f"⚠️ Date invalide dans le catalogue: {file_path.name}")
+        doc_date = None
+    if doc_date is None and file_path.exists():
+        # À défaut, date de dernière modification du fichier
+        doc_date = date.fromtimestamp(file_path.stat().st_mtime)
+    if doc_date is not None:
+        fields[DATE_KEY] = int(doc_date.strftime('%Y%m%d'))
+    return fields
+
+def split_into_chunks(text: str) -> Iterator[Chunk]:
+    """Découpe un texte selon CHUNK_STRATEGY (chunks avec positions dans la source)"""
+    if CHUNK_STRATEGY == "words":
+        return iter_chunks(text)
+    return iter_chunks_tokens(
+        text,
+        chunk_tokenizer,
+        max_tokens=CHUNK_MAX_TOKENS or embedding_model.max_seq_length,
+        overlap_tokens=CHUNK_OVERLAP_TOKENS
+    )
+
+def _chunk_metadata(result: Dict, chunk: Chunk, chunk_id: int, document_fields: Dict) -> Dict:
+    """Métadonnées d'un chunk (ChromaDB refuse les valeurs None)"""
+    metadata = {
+        "source": Path(result['file_path']).name,
+        source_key(Path(result['file_path']).name): True,
+        "file_type": result['file_type'],
+        "chunk_id": chunk_id,
+        "char_start": chunk.start,
+        "char_end": chunk.end,
+        **document_fields
+    }
+    if chunk.page is not None:
+        metadata["page"] = chunk.page
+    return metadata
+
+def _build_entries(result: Dict, catalog: Dict[str, Dict]) -> List[Dict]:
+    """Découpe un résultat d'extraction en chunks prêts à indexer"""
+    file_name = Path(result['file_path']).name
     
-    if not docs_path.exists():
-        logger.warning(f"Dossier {docs_path} introuvable")
-        return
+    if not result['success']:
+        logger.warning(f"❌ Échec: {file_name} - {result['error']}")
+        return []
     
-    # Initialiser le processeur universel
-    processor = DocumentProcessor()
+    text = result['text']
+    if not text or len(text) < 50:
+        logger.warning(f"⚠️ Document trop court ignoré: {file_name}")
+        return []
     
-    # Traiter tous les fichiers supportés
-    results = processor.process_directory(str(docs_path), recursive=False)
+    # Découper en chunks
+    document_fields = _document_fields(result, catalog)
+    entries = [
+        {
+            'id': make_chunk_id(Path(result['file_path']).stem, i, chunk.text),
+            'text': chunk.text,
+            'metadata': _chunk_metadata(result, chunk, i, document_fields)
+        }
+        for i, chunk in enumerate(split_into_chunks(text))
+    ]
+    logger.info(f"  → {file_name}: {len(entries)} chunks créés")
     
-    if not results:
-        logger.warning("Aucun document trouvé ou supporté")
-        return
+    return entries
+
+def _write_entries(entries: List[Dict], embeddings: List):
+    """Écriture groupée dans la base vectorielle (lots à la taille maximale acceptée)"""
+    bump_index_version()
+    vector_store.upsert(
+        ids=[entry['id'] for entry in entries],
+        embeddings=embeddings,
+        documents=[entry['text'] for entry in entries],
+        metadatas=[entry['metadata'] for entry in entries]
+    )
+    lexical_index.add(
+        [entry['id'] for entry in entries],
+        [entry['text'] for entry in entries],
+        [entry['metadata'] for entry in entries]
+    )
+
+def _update_metadatas(entries: List[Dict]):
+    """Répercute les changements de sources des chunks dédupliqués"""
+    if entries:
+        bump_index_version()
+        ids = [entry['id'] for entry in entries]
+        metadatas = [entry['metadata'] for entry in entries]
+        vector_store.update_metadata(ids, metadatas)
+        lexical_index.update_metadata(ids, metadatas)
+
+def _run_ingestion(file_paths: List[str], incremental: bool) -> Dict:
+    """
+    Ingère des fichiers via le pipeline par étages (extraction, découpage, embedding, écriture)
     
-    logger.info(f"Indexation de {len(results)} documents...")
+    Args:
+        file_paths: Fichiers à indexer
+        incremental: Si True, les anciens chunks de chaque fichier extrait avec succès sont
+            retirés avant écriture des nouveaux
     
-    total_chunks = 0
-    for result in results:
-        if not result['success']:
-            logger.warning(f"❌ Échec: {Path(result['file_path']).name} - {result['error']}")
-            continue
-        
+    Returns:
+        Rapport du pipeline (+ statistiques d'extraction et de déduplication)
+    """
+    extraction = {'success': 0, 'errors': 0, 'by_type': defaultdict(int)}
+    dedup_report = {'chunks_in': 0, 'chunks_kept': 0, 'chunks_removed': 0, 'chars_removed': 0}
+    updated = {}
+    doc_signatures = {}
+    catalog = load_document_catalog()
+    
+    def prepare(result: Dict) -> List[Dict]:
+        # Étage séquentiel : l'index de déduplication n'est pas partagé entre threads
         file_name = Path(result['file_path']).name
-        text = result['text']
-        
-        if not text or len(text) < 50:
-            logger.warning(f"⚠️ Document trop court ignoré: {file_name}")
-            continue
-        
-        # Découper en chunks
-        chunks = chunk_text(text)
-        logger.info(f"  → {file_name}: {len(chunks)} chunks créés")
+        extraction['success' if result['success'] else 'errors'] += 1
+        extraction['by_type'][result['file_type'] or 'Unknown'] += 1
         
-        # Générer embeddings
-        embeddings = embedding_model.encode(chunks).tolist()
+        entries = _build_entries(result, catalog)
+        if incremental and result['success']:
+            # Anciens chunks retirés après une extraction réussie, juste avant l'ajout des
+            # nouveaux : un échec laisse le document indexé tel quel. Le verrou d'index est
+            # tenu par le thread qui exécute le pipeline.
+            _remove_document_chunks(file_name)
+        if not entries or not DEDUP_ENABLED:
+            return entries
         
-        # Ajouter à ChromaDB
-        ids = [f"{Path(result['file_path']).stem}_chunk_{i}" for i in range(len(chunks))]
-        metadatas = [
-            {
-                "source": file_name,
-                "file_type": result['file_type'],
-                "chunk_id": i
-            } 
-            for i in range(len(chunks))
-        ]
+        # Documents quasi identiques (ex: versions successives d'un catalogue)
+        doc_sig = deduplicator.signature(result['text'])
+        for other_name, other_sig in doc_signatures.items():
+            sim = deduplicator.similarity(doc_sig, other_sig)
+            if sim >= deduplicator.threshold:
+                logger.info(f"  ♊ Documents quasi identiques: {other_name} ≈ {file_name} (similarité {sim:.2f})")
+        doc_signatures[file_name] = doc_sig
         
-        collection.add(
-            documents=chunks,
-            embeddings=embeddings,
-            ids=ids,
-            metadatas=metadatas
+        entries, changed, report = deduplicator.add_entries(entries)
+        for entry in changed:
+            updated[entry['id']] = entry
+        for key in dedup_report:
+            dedup_report[key] += report[key]
+        return entries
+    
+    pipeline = IngestionPipeline(
+        extract=lambda path: DocumentProcessor().extract_text(path),
+        prepare=prepare,
+        encode=embedding_encoder.encode,
+        write=_write_entries,
+        extract_workers=INGEST_EXTRACT_WORKERS,
+        queue_size=INGEST_QUEUE_SIZE,
+        embed_window=EMBED_WINDOW,
+        write_batch_size=vector_store.max_batch_size
+    )
+    
+    with index_lock:
+        report = pipeline.run(file_paths)
+        # Chunks déjà écrits qui ont reçu de nouvelles sources
+        _update_metadatas(list(updated.values()))
+        vector_store.persist()
+    
+    report['extraction'] = {**extraction, 'by_type': dict(extraction['by_type'])}
+    report['timestamp'] = datetime.now().isoformat()
+    metrics['last_ingestion'] = report
+    
+    if DEDUP_ENABLED and dedup_report['chunks_removed']:
+        # Estimation des gains : coût moyen mesuré d'un chunk encodé
+        written = report['chunks_written']
+        seconds_per_chunk = report['stages']['embed']['busy_seconds'] / written if written else 0.0
+        embedding_bytes = embedding_model.get_sentence_embedding_dimension() * 4
+        removed = dedup_report['chunks_removed']
+        dedup_report['index_bytes_saved'] = dedup_report['chars_removed'] + removed * embedding_bytes
+        dedup_report['embedding_seconds_saved'] = round(seconds_per_chunk * removed, 3)
+        dedup_report['timestamp'] = report['timestamp']
+        metrics['last_deduplication'] = dedup_report
+        logger.info(
+            f"♻️ Déduplication: {removed}/{dedup_report['chunks_in']} chunks fusionnés, "
+            f"~{dedup_report['index_bytes_saved'] / 1024:.1f} Ko d'index et "
+            f"~{dedup_report['embedding_seconds_saved']:.2f}s d'embedding économisés"
         )
-        
-        total_chunks += len(chunks)
+    
+    return report
+
+def index_documents():
+    """Indexe tous les documents du dossier documents/ (PDF, Word, Excel, TXT, etc.)"""
+    docs_path = get_documents_dir()
+    
+    if not docs_path.exists():
+        logger.warning(f"Dossier {docs_path} introuvable")
+        return
+    
+    # Tous les fichiers supportés
+    file_paths = [str(f) for f in sorted(DocumentProcessor().list_supported_files(str(docs_path)))]
+    
+    if not file_paths:
+        logger.warning("Aucun document trouvé ou supporté")
+        return
+    
+    logger.info(f"Indexation de {len(file_paths)} documents...")
+    
+    with index_lock:
+        if DEDUP_ENABLED:
+            deduplicator.reset()
+        report = _run_ingestion(file_paths, incremental=False)
+        # Compression réapprise sur le nouveau corpus
+        vector_store.fit_compression()
+        vector_store.persist()
+        save_embedding_probe(embedding_model, embedding_probe_path, EMBEDDING_LABEL)
     
     # Afficher statistiques
-    stats = processor.get_stats()
+    stats = report['extraction']
+    total_chunks = report['chunks_written']
     logger.info(f"""
     ╔════════════════════════════════════════╗
     ║   INDEXATION TERMINÉE                  ║
@@ -432,6 +1018,65 @@ def index_documents():
     
     for doc_type, count in stats['by_type'].items():
         logger.info(f"  📄 {doc_type}: {count} fichier(s)")
+    
+    schedule_answer_table_rebuild()
+
+def _remove_document_chunks(file_name: str):
+    """Retire les chunks d'un document (appelant responsable du verrou)"""
+    if DEDUP_ENABLED:
+        # Les chunks partagés avec d'autres documents changent de source principale
+        _update_metadatas(deduplicator.remove_source(file_name))
+    
+    existing_ids = vector_store.ids_where({"source": file_name})
+    if existing_ids:
+        bump_index_version()
+        vector_store.delete(existing_ids)
+        lexical_index.remove(existing_ids)
+        logger.info(f"🗑️ {file_name}: {len(existing_ids)} chunks supprimés")
+
+def remove_document(file_name: str):
+    """Retire un document de la collection active"""
+    with index_lock:
+        _remove_document_chunks(file_name)
+        vector_store.persist()
+    schedule_answer_table_rebuild()
+
+def index_file(file_path: str) -> int:
+    """Indexe (ou réindexe) un seul document dans la collection active"""
+    report = _run_ingestion([str(file_path)], incremental=True)
+    logger.info(f"➕ {Path(file_path).name}: {report['chunks_written']} chunks indexés (incrémental)")
+    schedule_answer_table_rebuild()
+    return report['chunks_written']
+
+def rebuild_index():
+    """Vide la base vectorielle et l'index BM25, puis réindexe tout"""
+    with index_lock:
+        bump_index_version()
+        vector_store.reset()
+        lexical_index.clear()
+        index_documents()
+
+def load_indexes():
+    """Reconstruit les index en mémoire (BM25, déduplication) depuis une collection déjà remplie"""
+    ids, documents, metadatas = vector_store.get_all()
+    # Index antérieur aux clés src_* (filtre par source) : complétées à partir des sources connues
+    missing = [i for i, metadata in enumerate(metadatas)
+               if not any(key.startswith(SOURCE_PREFIX) for key in metadata)]
+    if missing:
+        for i in missing:
+            sources = split_sources(metadatas[i].get('sources')) or [metadatas[i].get('source', 'Unknown')]
+            metadatas[i] = {**metadatas[i], **{source_key(source): True for source in sources}}
+        with index_lock:
+            _update_metadatas([{'id': ids[i], 'metadata': metadatas[i]} for i in missing])
+            vector_store.persist()
+        logger.info(f"🔑 Clés de filtre par source ajoutées à {len(missing)} chunks")
+    lexical_index.clear()
+    lexical_index.add(ids, documents, metadatas)
+    if DEDUP_ENABLED:
+        deduplicator.load([
+            {'id': chunk_id, 'text': doc, 'metadata': metadata}
+            for chunk_id, doc, metadata in zip(ids, documents, metadatas)
+        ])
 
 
 # ==========================================
@@ -443,114 +1088,395 @@ def get_cached_embedding(query: str) -> tuple:
     embedding = embedding_model.encode([query]).tolist()[0]
     return tuple(embedding)
 
-def search_documents(query: str, top_k: int = 3) -> Dict:
-    """Recherche dans ChromaDB avec cache"""
+# Recherches vectorielle et lexicale en parallèle
+search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search")
+
+def _to_document(chunk_id: str, content: str, metadata: Optional[Dict], distance: Optional[float]) -> Dict:
+    """Résultat de recherche au format commun"""
+    metadata = metadata or {}
+    source = metadata.get('source', 'Unknown')
+    return {
+        'id': chunk_id,
+        'content': content,
+        'source': source,
+        'sources': split_sources(metadata.get('sources')) or [source],
+        'page': metadata.get('page'),
+        'char_start': metadata.get('char_start'),
+        'char_end': metadata.get('char_end'),
+        'file_type': metadata.get('file_type'),
+        'tags': sorted(key[len(TAG_PREFIX):] for key in metadata if key.startswith(TAG_PREFIX)),
+        'doc_date': metadata.get(DATE_KEY),
+        'distance': distance
+    }
+
+def filters_to_where(filters: Optional[SearchFilters]) -> Optional[Dict]:
+    """
+    Filtres de l'API en clause where (format ChromaDB, compris aussi par la base NumPy)
+
+    Les tags sont cumulatifs (ET) ; sources et types acceptent plusieurs valeurs (OU).
+    Sources : clés src_* écrites pour chaque source d'un chunk dédupliqué, pas seulement la principale.
+    """
+    if filters is None:
+        return None
+    conditions = []
+    if filters.sources:
+        by_source = [{source_key(source): True} for source in dict.fromkeys(filters.sources)]
+        # ChromaDB exige au moins deux conditions dans un $or
+        conditions.append(by_source[0] if len(by_source) == 1 else {"$or": by_source})
+    if filters.file_types:
+        conditions.append({"file_type": {"$in": filters.file_types}})
+    for tag in filters.tags or []:
+        if normalize_tag(tag):
+            conditions.append({TAG_PREFIX + normalize_tag(tag): True})
+    if filters.date_from:
+        conditions.append({DATE_KEY: {"$gte": int(filters.date_from.strftime('%Y%m%d'))}})
+    if filters.date_to:
+        conditions.append({DATE_KEY: {"$lte": int(filters.date_to.strftime('%Y%m%d'))}})
+    
+    if not conditions:
+        return None
+    # ChromaDB exige au moins deux conditions dans un $and
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def _dense_search(query: str, n_results: int, where: Optional[Dict] = None) -> List[tuple]:
+    """Recherche vectorielle, retourne [(id, document)]"""
+    # Générer embedding de la question (avec cache)
+    try:
+        query_embedding = list(get_cached_embedding(query))
+        metrics['cache_hits'] += 1
+    except Exception as e:
+        logger.warning(f"⚠️ Embedding de la requête hors cache ({type(e).__name__}: {e})")
+        query_embedding = embedding_model.encode([query]).tolist()[0]
+        metrics['cache_misses'] += 1
+    
+    results = vector_store.query([query_embedding], n_results, where=where)[0]
+    return [
+        (chunk_id, _to_document(chunk_id, doc, metadata, distance))
+        for chunk_id, distance, doc, metadata in results
+    ]
+
+def _hybrid_candidates(query: str, n_candidates: int, where: Optional[Dict] = None) -> List[Dict]:
+    """Candidats vecteurs + BM25 fusionnés par rang réciproque"""
+    metrics['hybrid_searches'] += 1
+    candidates = max(n_candidates, HYBRID_CANDIDATES)
+    accept = (lambda metadata: matches_where(metadata, where)) if where else None
+    lexical_future = search_executor.submit(lexical_index.search, query, candidates, accept)
+    dense_hits = _dense_search(query, candidates, where)
+    
+    # Budget de latence : l'étape lexicale ne doit pas retarder la réponse
+    try:
+        lexical_hits = lexical_future.result(timeout=LEXICAL_BUDGET_MS / 1000)
+    except FutureTimeoutError:
+        metrics['lexical_timeouts'] += 1
+        logger.warning(f"⏱️ BM25 hors budget ({LEXICAL_BUDGET_MS} ms), vecteurs seuls")
+        lexical_hits = []
+    
+    by_id = {doc_id: doc for doc_id, doc in dense_hits}
+    for doc_id, score, text, metadata in lexical_hits:
+        by_id.setdefault(doc_id, _to_document(doc_id, text, metadata, None))['lexical_score'] = score
+    
+    fused = reciprocal_rank_fusion(
+        [[doc_id for doc_id, _ in dense_hits], [hit[0] for hit in lexical_hits]],
+        [1 - HYBRID_LEXICAL_WEIGHT, HYBRID_LEXICAL_WEIGHT]
+    )
+    logger.info(f"Recherche hybride: {len(dense_hits)} vecteurs, {len(lexical_hits)} BM25")
+    return [by_id[doc_id] for doc_id, _ in fused[:n_candidates]]
+
+def _relevance_gate(documents: List[Dict]) -> tuple:
+    """
+    Seuil de pertinence et k adaptatif
+    
+    Si le meilleur chunk (distance vectorielle) dépasse RELEVANCE_MAX_DISTANCE, la question
+    est hors périmètre : aucun document, sauf si le meilleur résultat BM25 atteint
+    RELEVANCE_MIN_LEXICAL_SCORE (terme exact du corpus) ; seuls les résultats BM25 au-dessus
+    de ce score sont alors gardés. Sinon on ne garde que les chunks proches du meilleur ; les résultats
+    BM25 seuls (sans distance) sont conservés.
+    
+    Returns:
+        (documents retenus, meilleure distance ou None, décision : passed, lexical, rejected ou None)
+    """
+    distances = [doc['distance'] for doc in documents if doc['distance'] is not None]
+    top_distance = min(distances) if distances else None
+    if not RELEVANCE_GATE_ENABLED or top_distance is None:
+        return documents, top_distance, None
+    
+    if top_distance > RELEVANCE_MAX_DISTANCE:
+        lexical = [doc for doc in documents if (doc.get('lexical_score') or 0) >= RELEVANCE_MIN_LEXICAL_SCORE]
+        if lexical:
+            metrics['relevance_lexical_overrides'] += 1
+            return lexical, top_distance, "lexical"
+        metrics['relevance_rejections'] += 1
+        return [], top_distance, "rejected"
+    
+    cutoff = min(RELEVANCE_MAX_DISTANCE, top_distance + RELEVANCE_MARGIN)
+    kept = [doc for doc in documents if doc['distance'] is None or doc['distance'] <= cutoff]
+    return kept, top_distance, "passed"
+
+def search_documents(query: str, top_k: int = 3, where: Optional[Dict] = None) -> Dict:
+    """
+    Recherche hybride (vecteurs + BM25) avec cache, seuil de pertinence, puis reranking optionnel
+    
+    Args:
+        query: Question
+        top_k: Nombre de documents retournés (maximum, le seuil peut en retenir moins)
+        where: Filtre de métadonnées appliqué pendant la recherche (voir filters_to_where)
+    
+    Returns:
+        {"documents": [...], "top_distance": meilleure distance cosinus ou None,
+         "relevance": {"decision", "top_lexical_score"} ou None si le seuil est désactivé}
+    """
     try:
-        # Générer embedding de la question (avec cache)
-        try:
-            query_embedding = list(get_cached_embedding(query))
-            metrics['cache_hits'] += 1
-        except:
-            query_embedding = embedding_model.encode([query]).tolist()[0]
-            metrics['cache_misses'] += 1
+        # Plus de candidats si un cross-encoder les reclasse ensuite
+        n_candidates = max(top_k, RERANK_CANDIDATES) if reranker else top_k
         
-        # Recherche
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
-        )
+        if HYBRID_ENABLED:
+            documents = _hybrid_candidates(query, n_candidates, where)
+        else:
+            documents = [doc for _, doc in _dense_search(query, n_candidates, where)]
+        
+        # Avant le reranking : une question hors périmètre ne coûte pas de cross-encoder
+        lexical_scores = [doc['lexical_score'] for doc in documents if doc.get('lexical_score') is not None]
+        documents, top_distance, decision = _relevance_gate(documents)
+        relevance = {
+            "decision": decision,
+            "top_lexical_score": round(max(lexical_scores), 3) if lexical_scores else None
+        } if decision else None
         
-        documents = []
-        if results['documents'] and results['documents'][0]:
-            for i, doc in enumerate(results['documents'][0]):
-                metadata = results['metadatas'][0][i] if results['metadatas'] else {}
-                documents.append({
-                    'content': doc,
-                    'source': metadata.get('source', 'Unknown'),
-                    'distance': results['distances'][0][i] if results['distances'] else 0
-                })
+        if reranker and documents:
+            documents = reranker.rerank(query, documents, top_k)
         
-        logger.info(f"Recherche: {len(documents)} documents trouvés")
-        return {"documents": documents}
+        distance_label = f"{top_distance:.3f}" if top_distance is not None else "n/a"
+        logger.info(f"Recherche: {len(documents[:top_k])} documents retenus (top_distance={distance_label})")
+        return {"documents": documents[:top_k], "top_distance": top_distance, "relevance": relevance}
     
     except Exception as e:
         logger.error(f"Erreur recherche: {e}")
-        return {"documents": []}
+        return {"documents": [], "top_distance": None, "relevance": None}
+
+def source_label(doc: Dict) -> str:
+    """Libellé de source pour le contexte (avec page si connue)"""
+    if doc.get('page'):
+        return f"{doc['source']}, page {doc['page']}"
+    return doc['source']
 
 # ==========================================
 # 🧠 GÉNÉRATION RÉPONSE GROQ
 # ==========================================
-def generate_answer(context: str, question: str, chat_history: List[Dict], user_lang: str) -> str:
-    """Génère réponse avec Groq"""
-    
-    language_name = "French" if user_lang == "fr" else "English"
-    
-    system_prompt = f"""You are a SPECIALIZED hospital IT Support assistant with STRICT limitations.
-
-🔒 ABSOLUTE RULES - YOU MUST FOLLOW THESE:
-1. You can ONLY answer questions about IT support topics found in the provided context
-2. If the question is NOT about IT support (computers, software, network, passwords, printers, etc.) → REFUSE to answer
-3. If no relevant information exists in the context → Say you don't have that information in your knowledge base
-4. NEVER answer questions about: medicine, health, personal advice, general knowledge, calculations, etc.
-5. NEVER make up information - use ONLY what's in the context below
-
-🌐 LANGUAGE RULE:
-The user's question is in {language_name}. You MUST respond in {language_name}.
-- If question is in French → respond in French
-- If question is in English → respond in English
-- NEVER mix languages
-
-📋 RESPONSE STYLE:
-- Clear and concise
-- Use bullet points for step-by-step instructions
-- Professional and courteous tone
-- If refusing: politely explain you only handle IT support questions
-
-📚 KNOWLEDGE BASE CONTEXT:
-{context if context else "No relevant IT support information found in knowledge base."}
-
-EXAMPLES OF VALID QUESTIONS:
-✅ "Comment réinitialiser mon mot de passe?"
-✅ "Mon imprimante ne fonctionne pas"
-✅ "Je n'arrive pas à me connecter à Citrix"
-✅ "How do I access the VPN?"
-
-EXAMPLES OF INVALID QUESTIONS (REFUSE THESE):
-❌ "Quelle est la capitale de la France?" → Medical/general knowledge
-❌ "Comment traiter un patient?" → Medical question
-❌ "Calcule 2+2" → Not IT support
-❌ "Tell me a joke" → Not IT support
-"""
-    
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    # Historique (5 derniers messages)
-    for msg in chat_history[-5:]:
-        messages.append({
-            "role": msg["role"],
-            "content": msg["content"]
-        })
-    
-    messages.append({"role": "user", "content": question})
+def _usage_tokens(usage) -> Dict:
+    """Tokens d'entrée rapportés par Groq (dont servis par le cache de préfixe)"""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+        'completion_tokens': getattr(usage, 'completion_tokens', None),
+        'cached_tokens': getattr(details, 'cached_tokens', None)
+    }
+
+def generate_answer(messages: List[Dict], user_lang: str, model: str = GROQ_MODEL,
+                    max_tokens: int = LLM_MAX_TOKENS) -> tuple:
+    """
+    Génère réponse avec Groq
     
+    Returns:
+        (réponse, {'prompt_tokens', 'completion_tokens', 'cached_tokens'} rapportés par Groq, None si absents,
+         erreur : None si l'appel a réussi, sinon 'unavailable' ou 'error' et la réponse est un message de repli)
+    """
     try:
-        chat_completion = groq_client.chat.completions.create(
+        chat_completion = llm_client.create(
             messages=messages,
-            model=GROQ_MODEL,
+            model=model,
             temperature=0.3,
-            max_tokens=800,
+            max_tokens=max_tokens,
             top_p=0.95
         )
         
         answer = chat_completion.choices[0].message.content.strip()
         logger.info(f"Réponse Groq générée: {len(answer)} caractères")
-        return answer
+        return answer, _usage_tokens(getattr(chat_completion, 'usage', None)), None
     
+    except (LLMUnavailableError, LLMTimeoutError) as e:
+        logger.error(f"Groq indisponible: {e}")
+        if user_lang == 'fr':
+            return ("Le service de réponse est momentanément indisponible. "
+                    "Réessayez dans quelques instants ou contactez le support au poste 5555."), _usage_tokens(None), 'unavailable'
+        return ("The answer service is temporarily unavailable. "
+                "Please retry shortly or contact support at extension 5555."), _usage_tokens(None), 'unavailable'
     except Exception as e:
-        logger.error(f"Erreur Groq: {e}")
+        logger.error(f"Erreur Groq ({type(e).__name__}): {e}")
         if user_lang == 'fr':
-            return "Désolé, une erreur est survenue. Réessayez."
-        return "Sorry, an error occurred. Please retry."
+            return "Désolé, une erreur est survenue. Réessayez.", _usage_tokens(None), 'error'
+        return "Sorry, an error occurred. Please retry.", _usage_tokens(None), 'error'
+
+# ==========================================
+# 🔁 PIPELINE DE RÉPONSE
+# ==========================================
+def answer_question(question: str, user_lang: str, where: Optional[Dict], chat_history: List[Dict],
+                    summary: Optional[str], plan: str) -> Dict:
+    """
+    Recherche, assemblage du prompt et génération (sans effet sur la session)
+    
+    Returns:
+        Réponse, sources, citations et mesures de la requête
+    """
+    # Recherche documents
+    search_results = search_documents(question, top_k=CONTEXT_MAX_PASSAGES, where=where)
+    documents = search_results.get("documents", [])
+    top_distance = search_results.get("top_distance")
+    top_content = documents[0]['content'] if documents else None
+
+    # Construire contexte : passages réduits et dédoublonnés dans le budget de tokens
+    context, context_tokens = "", 0
+    if documents:
+        # Conversation longue : tours anciens puis résumé retirés du prompt, jamais les documents
+        history_size = len(chat_history[-prompt_builder.history_messages:]) if prompt_builder.history_messages else 0
+        chat_history, trimmed_summary, base_tokens = prompt_builder.fit(
+            question, chat_history, user_lang, summary, PROMPT_TOKEN_BUDGET - CONTEXT_MIN_TOKEN_BUDGET
+        )
+        if len(chat_history) < history_size or trimmed_summary != summary:
+            metrics['history_trimmed'] += 1
+            logger.info(f"✂️ Historique réduit à {len(chat_history)} messages"
+                        f"{' sans résumé' if summary and not trimmed_summary else ''} pour le contexte")
+        summary = trimmed_summary
+        budget = max(CONTEXT_MIN_TOKEN_BUDGET, min(CONTEXT_TOKEN_BUDGET, PROMPT_TOKEN_BUDGET - base_tokens))
+        packed = context_packer.pack(question, documents, budget, source_label)
+        documents = packed.documents
+        context, context_tokens = packed.text, packed.tokens
+        metrics['context_passages_dropped'] += packed.dropped
+
+    sources = list(set([src for doc in documents for src in doc['sources']]))
+    citations = [
+        Citation(source=doc['source'], page=doc['page'],
+                 char_start=doc['char_start'], char_end=doc['char_end'])
+        for doc in documents
+    ]
+
+    # Générer réponse (sans contexte pertinent, pas d'appel au LLM)
+    llm_called = bool(context.strip())
+    prompt_tokens = variable_tokens = cached_tokens = None
+    routing = llm_error = None
+    if not llm_called:
+        metrics['llm_calls_avoided'] += 1
+        if user_lang == 'fr':
+            answer = ("Je n'ai pas trouvé d'information pertinente. "
+                     "Contactez le support au poste 5555.")
+        else:
+            answer = ("I couldn't find relevant information. "
+                     "Contact support at extension 5555.")
+    else:
+        messages = prompt_builder.build(context, question, chat_history, user_lang, summary)
+        prompt_size = prompt_builder.measure(messages)
+        decision = model_router.route(question, top_distance, top_content, plan)
+        llm_start = time.time()
+        answer, usage, llm_error = generate_answer(messages, user_lang, decision.model, decision.max_tokens)
+        llm_latency = time.time() - llm_start
+        prompt_tokens = usage['prompt_tokens'] or prompt_size['prompt_tokens']
+        cost = model_router.record(decision, llm_latency, prompt_tokens, usage['completion_tokens'])
+        routing = {
+            "route": decision.route,
+            "model": decision.model,
+            "max_tokens": decision.max_tokens,
+            "signals": decision.signals,
+            "reasons": decision.reasons,
+            "llm_latency": round(llm_latency, 3),
+            "completion_tokens": usage['completion_tokens'],
+            "cost_usd": round(cost, 6) if cost is not None else None,
+            "llm_error": llm_error
+        }
+        logger.info(f"🔀 Route {decision.route} ({decision.model}, max_tokens={decision.max_tokens}): "
+                    f"{', '.join(decision.reasons)}")
+        variable_tokens = prompt_size['variable_tokens']
+        cached_tokens = usage['cached_tokens']
+        metrics['llm_calls'] += 1
+        metrics['prompt_tokens_total'] += prompt_tokens
+        metrics['prompt_variable_tokens_total'] += variable_tokens
+        metrics['cached_prompt_tokens_total'] += cached_tokens or 0
+    
+    return {
+        "answer": answer,
+        "sources": sources,
+        "citations": citations,
+        "top_distance": top_distance,
+        "relevance": search_results.get("relevance"),
+        "llm_called": llm_called,
+        "llm_error": llm_error,
+        "prompt_tokens": prompt_tokens,
+        "context_tokens": context_tokens,
+        "variable_tokens": variable_tokens,
+        "cached_tokens": cached_tokens,
+        "routing": routing
+    }
+
+def chat_flight_key(question: str, user_lang: str, where: Optional[Dict], chat_history: List[Dict],
+                    summary: Optional[str], plan: str) -> tuple:
+    """Clé de coalescence : tout ce qui change la réponse (question normalisée, langue, index, historique…)"""
+    history = chat_history[-prompt_builder.history_messages:] if prompt_builder.history_messages else []
+    history_digest = hashlib.sha256(
+        json.dumps([summary, history], ensure_ascii=False).encode('utf-8')
+    ).hexdigest()[:16]
+    return (
+        normalize_text(question).strip(" ?!."), user_lang, index_version,
+        json.dumps(where, sort_keys=True, default=str), plan, history_digest
+    )
+
+# Requêtes /api/chat identiques en cours
+chat_flight = SingleFlight()
+
+# ==========================================
+# 📇 RÉPONSES PRÉCALCULÉES
+# ==========================================
+def corpus_fingerprint() -> str:
+    """Empreinte du contenu indexé (validité d'une table de réponses entre deux démarrages)"""
+    with index_lock:
+        ids, documents, _ = vector_store.get_all()
+    digest = hashlib.sha256()
+    for chunk_id, document in sorted(zip(ids, documents)):
+        digest.update(chunk_id.encode('utf-8'))
+        digest.update(document.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def _table_answer(question: str, language: str) -> Optional[Dict]:
+    """Réponse d'une intention, générée par le pipeline normal sur l'index courant"""
+    result = answer_question(question, language, None, [], None, "precomputed")
+    # Pas de contexte pertinent, ou échec de l'appel (réponse de repli) : rien à précalculer
+    if not result['llm_called'] or result['llm_error']:
+        return None
+    return {
+        'answer': result['answer'],
+        'sources': result['sources'],
+        'citations': [citation.model_dump() for citation in result['citations']]
+    }
+
+def build_answer_table():
+    version = index_version
+    answer_table.build(
+        lambda questions: embedding_model.encode(questions, convert_to_numpy=True, show_progress_bar=False),
+        _table_answer, version, corpus_fingerprint(), EMBEDDING_LABEL
+    )
+
+def schedule_answer_table_rebuild():
+    """Après une écriture dans l'index : table inactive jusqu'à sa reconstruction en arrière-plan"""
+    if answer_table and answer_table.has_intents():
+        answer_table.request_rebuild(build_answer_table)
+
+def precomputed_answer(question: str, user_lang: str) -> Optional[Dict]:
+    """Résultat au format de answer_question si la question correspond à une intention précalculée"""
+    entry = answer_table.lookup(get_cached_embedding(question), user_lang, index_version)
+    if entry is None:
+        return None
+    return {
+        "answer": entry['answer'],
+        "sources": entry['sources'],
+        "citations": [Citation(**citation) for citation in entry['citations']],
+        "top_distance": None,
+        "relevance": None,
+        "llm_called": False,
+        "llm_error": None,
+        "prompt_tokens": None,
+        "context_tokens": 0,
+        "variable_tokens": None,
+        "cached_tokens": None,
+        "routing": None,
+        "precomputed": {"intent": entry['id'], "similarity": entry['similarity']}
+    }
 
 # ==========================================
 # 🌐 ROUTES API
@@ -564,9 +1490,10 @@ async def root():
         "version": "3.0.0",
         "status": "running",
         "model": GROQ_MODEL,
-        "documents_indexed": collection.count(),
+        "documents_indexed": vector_store.count(),
         "endpoints": {
             "chat": "/api/chat",
+            "search": "/api/search",
             "health": "/api/health",
             "metrics": "/api/metrics",
             "reset": "/api/reset/{session_id}",
@@ -581,7 +1508,8 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "active_sessions": len(sessions_store),
-        "documents_count": collection.count()
+        "documents_count": vector_store.count(),
+        "llm_breaker": llm_client.breaker.state
     }
 
 @app.get("/api/metrics")
@@ -606,34 +1534,78 @@ async def get_metrics():
         "cache_hit_rate": round(cache_hit_rate * 100, 2),
         "cache_hits": metrics['cache_hits'],
         "cache_misses": metrics['cache_misses'],
-        "active_sessions": len(sessions_store)
+        "hybrid_searches": metrics['hybrid_searches'],
+        "lexical_timeouts": metrics['lexical_timeouts'],
+        "llm_calls_avoided": metrics['llm_calls_avoided'],
+        "relevance_rejections": metrics['relevance_rejections'],
+        "relevance_lexical_overrides": metrics['relevance_lexical_overrides'],
+        "relevance_threshold": RELEVANCE_MAX_DISTANCE if RELEVANCE_GATE_ENABLED else None,
+        "prompt": {
+            "tokenizer": prompt_token_counter.name,
+            "llm_calls": metrics['llm_calls'],
+            "avg_prompt_tokens": round(metrics['prompt_tokens_total'] / metrics['llm_calls'], 1) if metrics['llm_calls'] else 0,
+            "static_prefix_tokens": prompt_builder.prefix_tokens,
+            "avg_variable_tokens": round(metrics['prompt_variable_tokens_total'] / metrics['llm_calls'], 1) if metrics['llm_calls'] else 0,
+            "cached_token_rate": round(metrics['cached_prompt_tokens_total'] / metrics['prompt_tokens_total'] * 100, 2) if metrics['prompt_tokens_total'] else 0,
+            "token_budget": PROMPT_TOKEN_BUDGET,
+            "context_budget": CONTEXT_TOKEN_BUDGET,
+            "context_min_budget": CONTEXT_MIN_TOKEN_BUDGET,
+            "context_passages_dropped": metrics['context_passages_dropped'],
+            "history_trimmed": metrics['history_trimmed']
+        },
+        "lexical_index_size": len(lexical_index),
+        "vector_store": vector_store.get_stats(),
+        "reranker": reranker.get_stats() if reranker else None,
+        "active_sessions": len(sessions_store),
+        "last_deduplication": metrics['last_deduplication'],
+        "last_ingestion": metrics['last_ingestion'],
+        "embedding": {
+            **embedding_encoder.get_stats(),
+            "backend": EMBEDDING_LABEL,
+            "compatibility": metrics['embedding_compatibility']
+        },
+        "history_compaction": history_compactor.get_stats() if history_compactor else None,
+        "llm": {
+            **llm_client.get_stats(),
+            "provider": llm_provider.get_stats()
+        },
+        "routing": model_router.get_stats(),
+        "single_flight": {
+            **chat_flight.get_stats(),
+            "coalesced_requests": metrics['coalesced_requests']
+        } if SINGLE_FLIGHT_ENABLED else None,
+        "answer_table": {
+            **answer_table.get_stats(),
+            "served": metrics['precomputed_answers'],
+            "served_rate": round(metrics['precomputed_answers'] / metrics['total_requests'] * 100, 2) if metrics['total_requests'] else 0
+        } if answer_table else None,
+        "document_watcher": document_watcher.get_stats() if document_watcher else None
     }
 
 @app.post("/api/reindex")
 async def reindex_documents():
     """Force réindexation des documents"""
     try:
-        # Supprimer ancienne collection
-        chroma_client.delete_collection("it_support_docs")
-        
-        # Recréer
-        global collection
-        collection = chroma_client.create_collection(
-            name="it_support_docs",
-            metadata={"hnsw:space": "cosine"}
-        )
-        
-        # Réindexer
-        index_documents()
+        rebuild_index()
         
         return {
             "status": "success",
-            "documents_indexed": collection.count()
+            "documents_indexed": vector_store.count()
         }
     except Exception as e:
         logger.error(f"Erreur réindexation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/answer-table/rebuild")
+async def rebuild_answer_table(api_key: str = Depends(verify_admin_key)):
+    """Reconstruit la table de réponses précalculées (après mise à jour des intentions, PROTÉGÉ : clé d'administration)"""
+    if not answer_table:
+        raise HTTPException(status_code=404, detail="Table de réponses désactivée (ANSWER_TABLE_ENABLED=false)")
+    if not answer_table.has_intents():
+        raise HTTPException(status_code=404, detail="Aucune intention : lancer scripts/build_answer_intents.py")
+    schedule_answer_table_rebuild()
+    return {"status": "scheduled"}
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest, 
@@ -667,38 +1639,42 @@ async def chat(
                        else "Please wait a few seconds.")
                 raise HTTPException(status_code=429, detail=msg)
         
-        # Recherche documents
-        search_results = search_documents(question)
-        documents = search_results.get("documents", [])
+        where = filters_to_where(request.filters)
+        chat_history = list(session_data['chat_history'])
+        summary = session_data.get('summary')
+        plan = get_plan(api_key)
         
-        # Construire contexte
-        if documents:
-            context = "\n\n".join([
-                f"[Source: {doc['source']}]\n{doc['content']}"
-                for doc in documents[:3]
-            ])
-            sources = list(set([doc['source'] for doc in documents[:3]]))
+        # Question fréquente en début de session, sans filtre : réponse précalculée
+        result, coalesced = None, False
+        if answer_table and where is None and not chat_history and not summary:
+            result = await asyncio.to_thread(precomputed_answer, question, user_lang)
+        if result:
+            metrics['precomputed_answers'] += 1
         else:
-            context = ""
-            sources = []
-        
-        # Générer réponse
-        if not context.strip():
-            if user_lang == 'fr':
-                answer = ("Je n'ai pas trouvé d'information pertinente. "
-                         "Contactez le support au poste 5555.")
+            # Recherche + génération, partagées entre requêtes identiques simultanées
+            pipeline = partial(asyncio.to_thread, answer_question, question, user_lang, where, chat_history, summary, plan)
+            if SINGLE_FLIGHT_ENABLED:
+                result, coalesced = await chat_flight.do(
+                    chat_flight_key(question, user_lang, where, chat_history, summary, plan), pipeline
+                )
             else:
-                answer = ("I couldn't find relevant information. "
-                         "Contact support at extension 5555.")
-        else:
-            chat_history = session_data['chat_history']
-            answer = generate_answer(context, question, chat_history, user_lang)
+                result = await pipeline()
+        if coalesced:
+            metrics['coalesced_requests'] += 1
+        answer = result['answer']
+        sources = result['sources']
+        top_distance = result['top_distance']
+        llm_called = result['llm_called']
+        prompt_tokens = result['prompt_tokens']
+        routing = result['routing']
         
         # Mise à jour session
         session_data['chat_history'].append({"role": "user", "content": question})
         session_data['chat_history'].append({"role": "assistant", "content": answer})
         
-        if len(session_data['chat_history']) > MAX_HISTORY_SIZE * 2:
+        if history_compactor:
+            history_compactor.compact(session_data)
+        elif len(session_data['chat_history']) > MAX_HISTORY_SIZE * 2:
             session_data['chat_history'] = session_data['chat_history'][-MAX_HISTORY_SIZE*2:]
         
         session_data['last_question'] = question
@@ -716,7 +1692,15 @@ async def chat(
             response_time=duration,
             language=user_lang,
             sources=sources,
-            has_answer=len(answer) > 50 and "je n'ai pas" not in answer.lower()
+            has_answer=len(answer) > 50 and "je n'ai pas" not in answer.lower(),
+            top_distance=top_distance,
+            llm_called=llm_called,
+            prompt_tokens=prompt_tokens,
+            context_tokens=result['context_tokens'],
+            routing=routing,
+            coalesced=coalesced,
+            precomputed=result.get('precomputed'),
+            relevance=result['relevance']
         )
         
         # Log structuré
@@ -726,13 +1710,25 @@ async def chat(
         )
         log_record.session_id = session_id[:8]
         log_record.duration = round(duration, 3)
+        log_record.top_distance = round(top_distance, 4) if top_distance is not None else None
+        log_record.llm_called = llm_called
+        log_record.prompt_tokens = prompt_tokens
+        log_record.context_tokens = result['context_tokens']
+        log_record.variable_tokens = result['variable_tokens']
+        log_record.cached_tokens = result['cached_tokens']
+        log_record.coalesced = coalesced
+        log_record.precomputed = result['precomputed']['intent'] if result.get('precomputed') else None
+        log_record.route = routing['route'] if routing else None
+        log_record.model = routing['model'] if routing else None
         logger.handle(log_record)
         
         return ChatResponse(
             answer=answer,
             language=user_lang,
             sources=sources,
-            session_id=session_id
+            citations=result['citations'],
+            session_id=session_id,
+            prompt_tokens=prompt_tokens
         )
     
     except HTTPException:
@@ -743,6 +1739,31 @@ async def chat(
         logger.exception("Erreur interne")
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
+@app.post("/api/search")
+async def search(
+    request: SearchRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    """Recherche documentaire seule, sans génération (PROTÉGÉ PAR API KEY)"""
+    # Comme /api/chat : la requête est comptée dans le quota et le débit de la clé
+    check_quota(api_key)
+    check_rate_limit(api_key)
+    
+    where = filters_to_where(request.filters)
+    start_time = time.time()
+    # Embedding, BM25 et reranking hors de la boucle d'événements
+    results = await asyncio.to_thread(search_documents, request.query, top_k=request.top_k, where=where)
+    documents = results["documents"]
+    
+    return {
+        "query": request.query,
+        "filters": where,
+        "top_distance": results["top_distance"],
+        "documents": documents,
+        "count": len(documents),
+        "search_time_ms": round((time.time() - start_time) * 1000, 1)
+    }
+
 @app.post("/api/reset/{session_id}")
 async def reset_session(session_id: str):
     """Réinitialise une session"""
@@ -759,7 +1780,7 @@ async def reset_session(session_id: str):
 if __name__ == "__main__":
     import uvicorn
     
-    if not GROQ_API_KEY:
+    if LLM_PROVIDER == "groq" and not GROQ_API_KEY:
         logger.error("GROQ_API_KEY manquante")
         exit(1)
     
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Assemblage du contexte du prompt sous budget de tokens
+- Comptage avec le tokenizer du modèle de génération (estimation si indisponible)
+- Passages trop longs pour le budget réduits aux phrases autour de la correspondance
+- Texte répété entre chunks (chevauchement, quasi-doublons) retiré
+"""
+
+import math
+import logging
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+try:
+    from .deduplication import normalize_text
+    from .document_processor import _iter_sentences
+    from .lexical_index import tokenize
+except ImportError:
+    from deduplication import normalize_text
+    from document_processor import _iter_sentences
+    from lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Estimation sans tokenizer (texte français/anglais, tokenizer Llama 3)
+CHARS_PER_TOKEN = 4
+
+
+class TokenCounter:
+    """Compte les tokens avec le tokenizer du modèle de génération"""
+
+    # Format de chat Llama 3 : en-tête de rôle + <|eot_id|> par message
+    MESSAGE_OVERHEAD = 4
+
+    def __init__(self, tokenizer_name: Optional[str] = None):
+        self.tokenizer = None
+        self.name = "estimate"
+        # Un tokenizer rapide ne doit pas être utilisé par deux threads à la fois
+        self._lock = threading.Lock()
+        if tokenizer_name:
+            try:
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+                self.name = tokenizer_name
+                logger.info(f"✅ Tokenizer du prompt: {tokenizer_name}")
+            except Exception as e:
+                logger.warning(f"⚠️ Tokenizer {tokenizer_name} indisponible ({e}), "
+                               f"estimation à {CHARS_PER_TOKEN} caractères/token")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is None:
+            return math.ceil(len(text) / CHARS_PER_TOKEN)
+        with self._lock:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def count_messages(self, messages: List[Dict]) -> int:
+        """Tokens d'entrée d'une requête de chat (+1 pour <|begin_of_text|>)"""
+        return 1 + sum(self.count(m['content']) + self.MESSAGE_OVERHEAD for m in messages)
+
+
+class PackedContext(NamedTuple):
+    """Contexte assemblé et passages retenus"""
+    text: str
+    documents: List[Dict]  # copies des résultats : content réduit, offsets ajustés
+    tokens: int
+    dropped: int  # passages écartés (doublons ou budget épuisé)
+
+
+class ContextPacker:
+    """
+    Remplit un budget de tokens avec les passages les plus pertinents
+
+    Les documents sont pris dans l'ordre de la recherche et gardés entiers s'ils
+    tiennent dans le budget restant. Sinon, le chunk est réduit à la phrase qui
+    partage le plus de termes avec la question et aux phrases voisines. Les phrases
+    déjà présentes dans le contexte sont ignorées.
+    """
+
+    SEPARATOR = "\n\n"
+    GAP = " [...] "
+
+    def __init__(self, counter: TokenCounter, sentence_window: int = 2,
+                 max_passage_tokens: int = 400):
+        self.counter = counter
+        self.sentence_window = sentence_window
+        self.max_passage_tokens = max_passage_tokens
+
+    @staticmethod
+    def _best_sentence(sentences: List[str], terms: set) -> int:
+        """Indice de la phrase la plus proche de la question (première si aucun terme commun)"""
+        best, best_score = 0, 0
+        for i, sentence in enumerate(sentences):
+            score = len(terms.intersection(tokenize(sentence)))
+            if score > best_score:
+                best, best_score = i, score
+        return best
+
+    def _render(self, content: str, spans: List[tuple]) -> str:
+        """Texte des phrases retenues ; les phrases non contiguës sont séparées par [...]"""
+        parts = []
+        previous = None
+        for i, start, end in spans:
+            if previous is not None:
+                parts.append(content[previous[2]:start] if i == previous[0] + 1 else self.GAP)
+            parts.append(content[start:end])
+            previous = (i, start, end)
+        return "".join(parts).strip()
+
+    def _window(self, spans: List[tuple], best: int, max_tokens: int, content: str, header: str) -> List[tuple]:
+        """Réduit la fenêtre de phrases, par le bord le plus éloigné de la correspondance, jusqu'au budget"""
+        spans = list(spans)
+        while len(spans) > 1 and self.counter.count(header + self._render(content, spans)) > max_tokens:
+            if abs(spans[0][0] - best) >= abs(spans[-1][0] - best):
+                spans.pop(0)
+            else:
+                spans.pop()
+        return spans
+
+    def pack(self, question: str, documents: List[Dict], budget: int,
+             label: Callable[[Dict], str]) -> PackedContext:
+        """
+        Assemble le contexte
+
+        Args:
+            question: Question de l'utilisateur
+            documents: Résultats de recherche (meilleur en premier)
+            budget: Tokens disponibles pour le contexte
+            label: Libellé de source d'un document
+
+        Returns:
+            PackedContext
+        """
+        terms = set(tokenize(question))
+        seen = set()
+        blocks, packed = [], []
+        used, dropped = 0, 0
+        separator_tokens = self.counter.count(self.SEPARATOR)
+
+        for doc in documents:
+            content = doc['content']
+            offsets = [(start, end) for start, end, _ in _iter_sentences(content)]
+            sentences = [content[start:end] for start, end in offsets]
+            if not sentences:
+                dropped += 1
+                continue
+
+            spans = [
+                (i, start, end) for i, (start, end) in enumerate(offsets)
+                if normalize_text(sentences[i]) not in seen
+            ]
+            if not spans:
+                dropped += 1
+                continue
+
+            header = f"[Source: {label(doc)}]\n"
+            remaining = budget - used - (separator_tokens if blocks else 0)
+            limit = min(self.max_passage_tokens, remaining)
+            if self.counter.count(header + self._render(content, spans)) > limit:
+                # Passage trop long : fenêtre autour de la correspondance, puis réduction
+                best = self._best_sentence(sentences, terms)
+                low, high = best - self.sentence_window, best + self.sentence_window
+                spans = [span for span in spans if low <= span[0] <= high] or spans
+                spans = self._window(spans, best, limit, content, header)
+            block = header + self._render(content, spans)
+            tokens = self.counter.count(block)
+            if tokens > remaining:
+                dropped += 1
+                continue
+
+            seen.update(normalize_text(sentences[i]) for i, _, _ in spans)
+            used += tokens + (separator_tokens if blocks else 0)
+            blocks.append(block)
+
+            passage = dict(doc, content=self._render(content, spans))
+            if doc.get('char_start') is not None:
+                passage['char_start'] = doc['char_start'] + spans[0][1]
+                passage['char_end'] = doc['char_start'] + spans[-1][2]
+            packed.append(passage)
+
+        return PackedContext(self.SEPARATOR.join(blocks), packed, used, dropped)
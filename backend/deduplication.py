@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Détection de quasi-doublons (documents et chunks) à l'indexation
+MinHash + LSH sur des shingles de mots
+"""
+
+import re
+import json
+import hashlib
+import logging
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .vector_store import SOURCE_PREFIX, source_key
+except ImportError:
+    from vector_store import SOURCE_PREFIX, source_key
+
+logger = logging.getLogger(__name__)
+
+# Nombre premier de Mersenne (2^31 - 1) : a * h < 2^62, pas de débordement uint64
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_SEPARATEUR_SOURCES = " | "
+# Clés écrites par la déduplication (le reste des métadonnées est propre à chaque source)
+SOURCE_METADATA_KEY = 'source_metadata'
+_DEDUP_KEYS = ('sources', 'duplicates', SOURCE_METADATA_KEY)
+
+
+def normalize_text(text: str) -> str:
+    """Normalise le texte (minuscules, espaces) avant calcul des shingles"""
+    return re.sub(r'\s+', ' ', text.lower()).strip()
+
+
+def join_sources(sources: List[str]) -> str:
+    """Sérialise une liste de sources pour les métadonnées ChromaDB (valeurs scalaires)"""
+    return _SEPARATEUR_SOURCES.join(sources)
+
+
+def split_sources(value: Optional[str]) -> List[str]:
+    """Inverse de join_sources"""
+    if not value:
+        return []
+    return [s for s in value.split(_SEPARATEUR_SOURCES) if s]
+
+
+def make_chunk_id(stem: str, index: int, text: str) -> str:
+    """
+    Identifiant d'un chunk : document, position et empreinte du contenu
+
+    Un chunk partagé reste indexé sous l'identifiant du document qui l'a créé ;
+    l'empreinte évite que la réindexation de ce document l'écrase avec un autre texte.
+    """
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=6).hexdigest()
+    return f"{stem}_chunk_{index}_{digest}"
+
+
+class ChunkDeduplicator:
+    """
+    Regroupe les chunks quasi identiques (similarité de Jaccard estimée par MinHash)
+    Le premier chunk rencontré devient canonique et conserve la liste de toutes ses sources,
+    avec les métadonnées du chunk dans chacune (offsets, page, type, tags, date) : si la source
+    principale est retirée, le chunk reprend celles de la source suivante.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64,
+                 bands: int = 16, shingle_size: int = 5, seed: int = 42):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm doit être un multiple de bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Permutations (a*h + b) mod p, reproductibles
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, (1 << 31) - 1, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, (1 << 31) - 1, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+        # État LSH : bucket -> indices canoniques (les indices retirés sont libérés)
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._entries: Dict[int, Dict] = {}
+        self._next_idx = 0
+
+    # ==========================================
+    # MINHASH
+    # ==========================================
+
+    def _shingles(self, text: str) -> set:
+        """Shingles de k mots consécutifs"""
+        words = normalize_text(text).split(' ')
+        k = self.shingle_size
+        if len(words) <= k:
+            return {' '.join(words)}
+        return {' '.join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """Signature MinHash (num_perm valeurs uint64)"""
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little')
+             for s in self._shingles(text)),
+            dtype=np.uint64
+        )
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """Similarité de Jaccard estimée entre deux signatures"""
+        return float(np.mean(sig_a == sig_b))
+
+    def _band_keys(self, sig: np.ndarray) -> List[Tuple[int, bytes]]:
+        r = self.rows
+        return [(band, sig[band * r:(band + 1) * r].tobytes()) for band in range(self.bands)]
+
+    # ==========================================
+    # INDEX LSH
+    # ==========================================
+
+    def find_duplicate(self, sig: np.ndarray) -> Optional[int]:
+        """Retourne l'indice du chunk canonique le plus proche au-dessus du seuil"""
+        best_idx, best_sim = None, self.threshold
+        seen = set()
+        for key in self._band_keys(sig):
+            for idx in self._buckets.get(key, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                sim = self.similarity(sig, self._signatures[idx])
+                if sim >= best_sim:
+                    best_idx, best_sim = idx, sim
+        return best_idx
+
+    def _register(self, sig: np.ndarray, entry: Dict) -> int:
+        idx = self._next_idx
+        self._next_idx += 1
+        self._signatures[idx] = sig
+        self._entries[idx] = entry
+        for key in self._band_keys(sig):
+            self._buckets[key].append(idx)
+        return idx
+
+    def _unregister(self, idx: int):
+        """Retire un chunk canonique et ses entrées dans les buckets"""
+        sig = self._signatures.pop(idx)
+        del self._entries[idx]
+        for key in self._band_keys(sig):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            bucket.remove(idx)
+            if not bucket:
+                del self._buckets[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def reset(self):
+        """Vide l'index LSH"""
+        self._buckets.clear()
+        self._signatures.clear()
+        self._entries.clear()
+
+    @staticmethod
+    def _own_metadata(metadata: Dict) -> Dict:
+        return {key: value for key, value in metadata.items()
+                if key not in _DEDUP_KEYS and not key.startswith(SOURCE_PREFIX)}
+
+    @staticmethod
+    def _sync_metadata(entry: Dict):
+        # La source principale reste la première source encore présente, avec ses propres métadonnées ;
+        # une clé src_* par source pour les filtres
+        per_source = entry['source_metadata']
+        entry['metadata'] = {
+            **per_source[entry['sources'][0]],
+            **{source_key(source): True for source in entry['sources']},
+            'sources': join_sources(entry['sources']),
+            'duplicates': entry['duplicates'],
+            SOURCE_METADATA_KEY: json.dumps(per_source, ensure_ascii=False, sort_keys=True),
+        }
+
+    # ==========================================
+    # DÉDUPLICATION
+    # ==========================================
+
+    def add_entries(self, entries: List[Dict]) -> Tuple[List[Dict], List[Dict], Dict]:
+        """
+        Ajoute des chunks à l'index en fusionnant les quasi-doublons (incrémental)
+
+        Args:
+            entries: Liste de dicts {'id', 'text', 'metadata'} (metadata contient 'source')
+
+        Returns:
+            (nouveaux chunks canoniques à indexer,
+             chunks déjà indexés dont les métadonnées ont changé,
+             rapport)
+        """
+        new_entries: List[Dict] = []
+        updated: Dict[str, Dict] = {}
+        removed_chars = 0
+
+        for entry in entries:
+            sig = self.signature(entry['text'])
+            dup_idx = self.find_duplicate(sig)
+            source = entry['metadata'].get('source', 'Unknown')
+
+            if dup_idx is None:
+                entry['sources'] = [source]
+                entry['duplicates'] = 0
+                entry['source_metadata'] = {source: self._own_metadata(entry['metadata'])}
+                self._register(sig, entry)
+                new_entries.append(entry)
+                continue
+
+            canonical = self._entries[dup_idx]
+            if source not in canonical['sources']:
+                canonical['sources'].append(source)
+                canonical['source_metadata'][source] = self._own_metadata(entry['metadata'])
+            canonical['duplicates'] += 1
+            removed_chars += len(entry['text'])
+            if not any(canonical is e for e in new_entries):
+                updated[canonical['id']] = canonical
+
+        for entry in new_entries + list(updated.values()):
+            self._sync_metadata(entry)
+
+        report = {
+            'chunks_in': len(entries),
+            'chunks_kept': len(new_entries),
+            'chunks_removed': len(entries) - len(new_entries),
+            'chars_removed': removed_chars,
+        }
+        return new_entries, list(updated.values()), report
+
+    def load(self, entries: List[Dict]):
+        """Recharge l'index depuis des chunks déjà indexés (sans fusion)"""
+        self.reset()
+        for entry in entries:
+            metadata = entry['metadata']
+            entry.setdefault('sources', split_sources(metadata.get('sources'))
+                             or [metadata.get('source', 'Unknown')])
+            entry.setdefault('duplicates', metadata.get('duplicates', 0))
+            per_source = json.loads(metadata[SOURCE_METADATA_KEY]) if metadata.get(SOURCE_METADATA_KEY) else {}
+            # Index antérieur aux métadonnées par source : seule la source principale est connue
+            per_source.setdefault(metadata.get('source', 'Unknown'), self._own_metadata(metadata))
+            for source in entry['sources']:
+                if source not in per_source:
+                    per_source[source] = {'source': source}
+            entry.setdefault('source_metadata', per_source)
+            self._register(self.signature(entry['text']), entry)
+
+    def remove_source(self, source: str) -> List[Dict]:
+        """
+        Retire une source de l'index
+
+        Les chunks dont c'était la seule source sont oubliés (à supprimer de la collection
+        par l'appelant) ; les chunks partagés avec d'autres sources sont conservés.
+
+        Returns:
+            Chunks conservés dont les métadonnées ont changé
+        """
+        updated = []
+        for idx, entry in list(self._entries.items()):
+            if source not in entry['sources']:
+                continue
+            entry['sources'].remove(source)
+            entry['source_metadata'].pop(source, None)
+            if not entry['sources']:
+                self._unregister(idx)
+                continue
+            entry['duplicates'] = max(0, entry['duplicates'] - 1)
+            self._sync_metadata(entry)
+            updated.append(entry)
+        return updated
+
@@ -5,9 +5,12 @@ Supporte : PDF, Word, Excel, TXT, PowerPoint, Images
 """
 
 import os
+import re
+import bisect
 import logging
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, NamedTuple
 import fitz  # PyMuPDF
 from docx import Document
 import openpyxl
@@ -360,6 +363,28 @@ class DocumentProcessor:
     # TRAITEMENT BATCH
     # ==========================================
     
+    def list_supported_files(self, directory: str, recursive: bool = False) -> List[Path]:
+        """
+        Liste les fichiers supportés d'un dossier
+        
+        Args:
+            directory: Chemin du dossier
+            recursive: Si True, parcourt sous-dossiers
+        
+        Returns:
+            Liste de chemins (vide si le dossier n'existe pas)
+        """
+        directory = Path(directory)
+        
+        if not directory.exists():
+            return []
+        
+        pattern = '**/*' if recursive else '*'
+        return [
+            f for f in directory.glob(pattern)
+            if f.is_file() and self.is_supported(str(f))
+        ]
+    
     def process_directory(self, directory: str, recursive: bool = False) -> List[Dict]:
         """
         Traite tous les fichiers supportés dans un dossier
@@ -378,13 +403,7 @@ class DocumentProcessor:
             return []
         
         # Trouver tous les fichiers supportés
-        pattern = '**/*' if recursive else '*'
-        all_files = directory.glob(pattern)
-        
-        supported_files = [
-            f for f in all_files 
-            if f.is_file() and self.is_supported(str(f))
-        ]
+        supported_files = self.list_supported_files(str(directory), recursive)
         
         logger.info(f"📂 Traitement de {len(supported_files)} fichiers dans {directory}")
         
@@ -418,6 +437,88 @@ class DocumentProcessor:
 # FONCTIONS UTILITAIRES
 # ==========================================
 
+class Chunk(NamedTuple):
+    """Chunk de texte et sa position dans le document source"""
+    text: str
+    start: int  # offset caractère de début (inclus)
+    end: int  # offset caractère de fin (exclu)
+    page: Optional[int]  # page (PDF) ou slide (PowerPoint) du début du chunk
+
+
+# Marqueurs insérés par les extracteurs PDF / PowerPoint
+_PAGE_MARKER = re.compile(r'--- Page (\d+) ---|=== Slide (\d+) ===')
+
+
+class _PageIndex:
+    """Retrouve la page d'un offset à partir des marqueurs de page du texte extrait"""
+    
+    def __init__(self, text: str):
+        self.offsets = []
+        self.pages = []
+        for match in _PAGE_MARKER.finditer(text):
+            self.offsets.append(match.start())
+            self.pages.append(int(match.group(1) or match.group(2)))
+    
+    def page_at(self, offset: int) -> Optional[int]:
+        i = bisect.bisect_right(self.offsets, offset) - 1
+        if i < 0:
+            # Texte avant le premier marqueur : appartient à la première page
+            return self.pages[0] if self.pages else None
+        return self.pages[i]
+
+
+def _make_chunk(text: str, start: int, end: int, pages: _PageIndex) -> Optional[Chunk]:
+    """Construit un chunk en retirant les espaces de bord (offsets ajustés)"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start >= end:
+        return None
+    return Chunk(text[start:end], start, end, pages.page_at(start))
+
+
+def iter_chunks(text: str, chunk_size: int = 500, overlap: int = 50) -> Iterator[Chunk]:
+    """
+    Découpe le texte en chunks de mots avec overlap, sans copier le texte
+    
+    Le texte est parcouru par offsets ; seule la fenêtre courante (offsets des
+    mots) est gardée en mémoire et chaque chunk est une tranche du texte source.
+    
+    Args:
+        text: Texte à découper
+        chunk_size: Taille en mots
+        overlap: Nombre de mots de chevauchement
+    
+    Yields:
+        Chunk (texte, début, fin, page)
+    """
+    step = chunk_size - overlap
+    if step <= 0:
+        raise ValueError("overlap doit être inférieur à chunk_size")
+    
+    pages = _PageIndex(text)
+    window = deque()
+    new_words = 0
+    
+    for match in re.finditer(r'\S+', text):
+        window.append((match.start(), match.end()))
+        new_words += 1
+        if len(window) == chunk_size:
+            chunk = _make_chunk(text, window[0][0], window[-1][1], pages)
+            if chunk:
+                yield chunk
+            for _ in range(step):
+                window.popleft()
+            new_words = 0
+    
+    # Dernier chunk partiel (seulement s'il apporte des mots nouveaux)
+    if window and new_words:
+        chunk = _make_chunk(text, window[0][0], window[-1][1], pages)
+        if chunk:
+            yield chunk
+
+
 def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
     """
     Découpe le texte en chunks avec overlap
@@ -430,15 +531,117 @@ def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]
     Returns:
         Liste de chunks
     """
-    words = text.split()
-    chunks = []
+    return [chunk.text for chunk in iter_chunks(text, chunk_size, overlap)]
+
+
+# Fin de phrase (ponctuation + espaces) ou saut de ligne
+# Fin de phrase : ponctuation suivie d'un blanc (sauf numéro de liste « 1. », « 12. »)
+# ou ligne vide. Un simple retour à la ligne (étapes, listes) ne coupe pas la phrase.
+_SENTENCE_END = re.compile(r'(?<=[.!?;:])(?<!\b\d\.)(?<!\b\d\d\.)\s+|\n\s*\n\s*')
+
+
+def _iter_sentences(text: str) -> Iterator[tuple]:
+    """
+    Parcourt les phrases du texte
+    
+    Yields:
+        (début, fin, fin_de_paragraphe) en offsets caractères
+    """
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if text[start:match.start()].strip():
+            yield (start, match.start(), match.group().count('\n') >= 2)
+        start = match.end()
+    if text[start:].strip():
+        yield (start, len(text), True)
+
+
+def _iter_token_units(text: str, tokenizer, budget: int, group_size: int = 64) -> Iterator[tuple]:
+    """
+    Unités de découpe mesurées en tokens : phrases, ou morceaux de phrases trop longues
+    
+    Les phrases sont tokenisées par petits groupes pour garder une mémoire bornée.
+    
+    Yields:
+        (début, fin, nb_tokens, fin_de_paragraphe)
+    """
+    sentences = _iter_sentences(text)
+    while True:
+        group = [s for _, s in zip(range(group_size), sentences)]
+        if not group:
+            return
+        encoded = tokenizer(
+            [text[start:end] for start, end, _ in group],
+            add_special_tokens=False,
+            return_offsets_mapping=True
+        )
+        for (start, end, para_end), offsets in zip(group, encoded['offset_mapping']):
+            if len(offsets) <= budget:
+                yield (start, end, len(offsets), para_end)
+                continue
+            for i in range(0, len(offsets), budget):
+                piece = offsets[i:i + budget]
+                last = i + budget >= len(offsets)
+                yield (start + piece[0][0], start + piece[-1][1], len(piece), para_end and last)
+
+
+def iter_chunks_tokens(text: str, tokenizer, max_tokens: int = 256,
+                       overlap_tokens: int = 32) -> Iterator[Chunk]:
+    """
+    Découpe le texte en chunks mesurés en tokens du modèle d'embeddings
     
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk = ' '.join(words[i:i + chunk_size])
-        if chunk.strip():
-            chunks.append(chunk)
+    Les coupures se font en fin de phrase (de préférence en fin de paragraphe) ;
+    une phrase plus longue que max_tokens est coupée sur des frontières de tokens.
     
-    return chunks
+    Args:
+        text: Texte à découper
+        tokenizer: Tokenizer rapide (HuggingFace) du modèle d'embeddings
+        max_tokens: Longueur maximale de séquence du modèle (tokens spéciaux inclus)
+        overlap_tokens: Chevauchement maximal en tokens (phrases entières)
+    
+    Yields:
+        Chunk (texte, début, fin, page)
+    """
+    # Place réservée aux tokens spéciaux ([CLS], [SEP])
+    budget = max_tokens - tokenizer.num_special_tokens_to_add()
+    pages = _PageIndex(text)
+    
+    current = []
+    current_tokens = 0
+    for unit in _iter_token_units(text, tokenizer, budget):
+        if current and current_tokens + unit[2] > budget:
+            chunk = _make_chunk(text, current[0][0], current[-1][1], pages)
+            if chunk:
+                yield chunk
+            # Chevauchement : dernières phrases du chunk précédent
+            overlap, overlap_count = [], 0
+            for prev in reversed(current):
+                if overlap_count + prev[2] > overlap_tokens or overlap_count + prev[2] + unit[2] > budget:
+                    break
+                overlap.insert(0, prev)
+                overlap_count += prev[2]
+            current, current_tokens = overlap, overlap_count
+        
+        current.append(unit)
+        current_tokens += unit[2]
+        
+        # Fin de paragraphe avec un chunk déjà bien rempli : couper ici
+        if unit[3] and current_tokens >= 0.75 * budget:
+            chunk = _make_chunk(text, current[0][0], current[-1][1], pages)
+            if chunk:
+                yield chunk
+            current, current_tokens = [], 0
+    
+    if current:
+        chunk = _make_chunk(text, current[0][0], current[-1][1], pages)
+        if chunk:
+            yield chunk
+
+
+def chunk_text_tokens(text: str, tokenizer, max_tokens: int = 256,
+                      overlap_tokens: int = 32) -> List[str]:
+    """Version liste de iter_chunks_tokens (textes seuls)"""
+    return [chunk.text for chunk in iter_chunks_tokens(text, tokenizer, max_tokens, overlap_tokens)]
 
 
 # ==========================================
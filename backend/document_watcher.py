@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Surveillance du dossier documents/ (watchdog)
+Indexation incrémentale des fichiers ajoutés, modifiés ou supprimés
+"""
+
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+logger = logging.getLogger(__name__)
+
+# Fichiers temporaires (verrous Office, téléchargements partiels)
+IGNORED_PREFIXES = ('~$', '.')
+IGNORED_SUFFIXES = ('.tmp', '.part', '.crdownload')
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Transmet les événements fichiers au watcher"""
+
+    def __init__(self, watcher: "DocumentWatcher"):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path, 'changed')
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path, 'changed')
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path, 'deleted')
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path, 'deleted')
+            self.watcher.notify(event.dest_path, 'changed')
+
+
+class DocumentWatcher:
+    """
+    Surveille un dossier et déclenche l'indexation des seuls fichiers modifiés
+
+    - Anti-rebond : les rafales d'événements sur un fichier sont regroupées
+    - Copie terminée : un fichier n'est traité que si sa taille et sa date de
+      modification n'ont pas bougé depuis le dernier passage
+    """
+
+    def __init__(self, directory: str,
+                 on_change: Callable[[str], None],
+                 on_delete: Callable[[str], None],
+                 is_supported: Optional[Callable[[str], bool]] = None,
+                 debounce_seconds: float = 1.0,
+                 poll_interval: float = 0.5):
+        self.directory = Path(directory)
+        self.on_change = on_change
+        self.on_delete = on_delete
+        self.is_supported = is_supported or (lambda path: True)
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+
+        # chemin -> {'kind', 'time', 'stat'}
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._observer = None
+        self._worker = None
+
+        self.stats = {
+            'events': 0,
+            'indexed': 0,
+            'deleted': 0,
+            'errors': 0,
+        }
+
+    def _is_relevant(self, path: str) -> bool:
+        name = Path(path).name
+        if name.startswith(IGNORED_PREFIXES) or name.lower().endswith(IGNORED_SUFFIXES):
+            return False
+        return self.is_supported(path)
+
+    def notify(self, path: str, kind: str):
+        """Enregistre un événement (le dernier événement d'un fichier l'emporte)"""
+        if not self._is_relevant(path):
+            return
+        with self._lock:
+            self.stats['events'] += 1
+            self._pending[path] = {'kind': kind, 'time': time.monotonic(), 'stat': None}
+
+    # ==========================================
+    # CYCLE DE VIE
+    # ==========================================
+
+    def start(self):
+        """Démarre l'observateur et le thread de traitement"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._stop.clear()
+
+        self._observer = Observer()
+        self._observer.schedule(_EventHandler(self), str(self.directory), recursive=False)
+        self._observer.start()
+
+        self._worker = threading.Thread(target=self._run, name="document-watcher", daemon=True)
+        self._worker.start()
+        logger.info(f"👀 Surveillance de {self.directory} (anti-rebond {self.debounce_seconds}s)")
+
+    def stop(self):
+        """Arrête la surveillance"""
+        self._stop.set()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+        if self._worker:
+            self._worker.join(timeout=5)
+        logger.info("👀 Surveillance des documents arrêtée")
+
+    # ==========================================
+    # TRAITEMENT
+    # ==========================================
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self._flush()
+            except Exception as e:
+                logger.error(f"Erreur surveillance documents: {e}")
+
+    def _file_stat(self, path: str):
+        try:
+            st = os.stat(path)
+            # Sous Windows, un fichier en cours de copie ne peut pas être ouvert
+            with open(path, 'rb'):
+                pass
+            return (st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _flush(self):
+        now = time.monotonic()
+        with self._lock:
+            ready = [
+                (path, dict(event)) for path, event in self._pending.items()
+                if now - event['time'] >= self.debounce_seconds
+            ]
+
+        for path, event in ready:
+            if event['kind'] == 'changed':
+                stat = self._file_stat(path)
+                if stat is None and not os.path.exists(path):
+                    event['kind'] = 'deleted'
+                elif stat is None or stat != event['stat']:
+                    # Copie en cours : réessayer au prochain passage
+                    with self._lock:
+                        current = self._pending.get(path)
+                        if current and current['time'] == event['time']:
+                            current['stat'] = stat
+                    continue
+
+            with self._lock:
+                current = self._pending.get(path)
+                if not current or current['time'] != event['time']:
+                    # Nouvel événement reçu entre-temps
+                    continue
+                del self._pending[path]
+
+            self._dispatch(path, event['kind'])
+
+    def _dispatch(self, path: str, kind: str):
+        start = time.time()
+        try:
+            if kind == 'deleted':
+                self.on_delete(path)
+                self.stats['deleted'] += 1
+            else:
+                self.on_change(path)
+                self.stats['indexed'] += 1
+            logger.info(f"👀 {Path(path).name} ({kind}) traité en {time.time() - start:.2f}s")
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"❌ Indexation incrémentale échouée pour {Path(path).name}: {e}")
+
+    def get_stats(self) -> Dict:
+        """Retourne les statistiques de surveillance"""
+        with self._lock:
+            return {**self.stats, 'pending': len(self._pending)}
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Backends du modèle d'embeddings
+- torch : SentenceTransformer (historique)
+- onnx : modèle exporté par scripts/export_onnx_model.py, exécuté par onnxruntime
+  (variante quantifiée int8 disponible), sans importer PyTorch
+Vecteurs sondes : détectent un index construit avec des embeddings incompatibles
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ONNX_CONFIG_FILE = "encoder_config.json"
+
+# Phrases représentatives du corpus, encodées à l'indexation et au démarrage
+PROBE_TEXTS = [
+    "Comment réinitialiser mon mot de passe Windows ?",
+    "L'imprimante du service affiche l'erreur 0x80070005",
+    "How do I connect to the VPN from home?",
+    "Citrix ne démarre plus après la mise à jour du poste",
+    "Procédure de sauvegarde des dossiers partagés",
+]
+
+
+class OnnxSentenceEncoder:
+    """
+    Encodeur ONNX Runtime avec l'interface utilisée de SentenceTransformer
+
+    encode(), tokenizer, max_seq_length et get_sentence_embedding_dimension() ;
+    pooling moyen sur le masque d'attention puis normalisation, comme le modèle d'origine.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        config_path = model_dir / ONNX_CONFIG_FILE
+        model_path = model_dir / ("model_int8.onnx" if quantized else "model.onnx")
+        if not config_path.exists() or not model_path.exists():
+            raise FileNotFoundError(
+                f"Modèle ONNX introuvable dans {model_dir} (lancer scripts/export_onnx_model.py)"
+            )
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        self.model_name = config['model_name']
+        self.max_seq_length = config['max_seq_length']
+        self.normalize = config['normalize']
+        self._dimension = config['dimension']
+        self.backend = "onnx-int8" if quantized else "onnx"
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Threads fixes : pas de sursouscription avec les autres étages du pipeline
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        logger.info(f"✅ Encodeur ONNX chargé: {model_path.name} ({self.model_name}, "
+                    f"{threads or 'auto'} threads)")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        outputs = []
+        for start in range(0, len(sentences), batch_size):
+            batch = self.tokenizer(
+                sentences[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np"
+            )
+            feeds = {name: batch[name].astype(np.int64) for name in batch if name in self._input_names}
+            hidden = self.session.run(None, feeds)[0]
+            mask = batch['attention_mask'][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if self.normalize:
+                pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            outputs.append(pooled.astype(np.float32))
+
+        embeddings = np.vstack(outputs) if outputs else np.zeros((0, self._dimension), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+class SerializedEncoder:
+    """
+    Modèle d'embeddings partagé entre threads : un seul encode() à la fois
+
+    Le tokenizer rapide HuggingFace du modèle n'est pas réentrant : deux appels simultanés
+    (requêtes, indexation, surveillance, table de réponses) lèvent "Already borrowed".
+    Les autres attributs sont ceux du modèle ; un thread qui tokenise lui-même utilise
+    sa propre copie du tokenizer (copy.deepcopy).
+    """
+
+    def __init__(self, model):
+        self._model = model
+        self._lock = threading.Lock()
+
+    def encode(self, *args, **kwargs):
+        with self._lock:
+            return self._model.encode(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+def load_embedding_model(backend: str, model_name: str, onnx_dir: Optional[str] = None,
+                         quantized: bool = False, threads: int = 0):
+    """Modèle d'embeddings selon le backend ("torch" ou "onnx")"""
+    if backend == "onnx":
+        return OnnxSentenceEncoder(onnx_dir, quantized=quantized, threads=threads)
+
+    # Import tardif : PyTorch n'est chargé que pour ce backend
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu")
+
+
+def _probe_vectors(model) -> np.ndarray:
+    vectors = np.asarray(model.encode(PROBE_TEXTS, convert_to_numpy=True, show_progress_bar=False),
+                         dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def save_embedding_probe(model, path: Path, label: str):
+    """Enregistre les vecteurs sondes du modèle qui a construit l'index"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'label': label, 'vectors': _probe_vectors(model).tolist()}, f)
+
+
+def check_embedding_compatibility(model, path: Path, min_cosine: float = 0.99) -> Dict:
+    """
+    Compare les vecteurs sondes du modèle courant à ceux de l'index
+
+    Returns:
+        {'compatible': True/False (None si l'index n'a pas de sondes),
+         'min_cosine': similarité minimale, 'indexed_with': modèle de l'index}
+    """
+    path = Path(path)
+    if not path.exists():
+        return {'compatible': None, 'min_cosine': None, 'indexed_with': None}
+    with open(path, 'r', encoding='utf-8') as f:
+        probe = json.load(f)
+
+    stored = np.asarray(probe['vectors'], dtype=np.float32)
+    current = _probe_vectors(model)
+    if stored.shape != current.shape:
+        return {'compatible': False, 'min_cosine': None, 'indexed_with': probe['label']}
+    min_cos = float(np.min(np.sum(stored * current, axis=1)))
+    return {
+        'compatible': min_cos >= min_cosine,
+        'min_cosine': round(min_cos, 5),
+        'indexed_with': probe['label'],
+    }
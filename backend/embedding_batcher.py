@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Encodage par lots triés par longueur en tokens
+Regroupe des chunks de plusieurs documents pour limiter le padding
+"""
+
+import copy
+import time
+import logging
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def set_encoder_threads(num_threads: Optional[int]):
+    """Fixe le nombre de threads CPU de PyTorch (0/None = défaut)"""
+    if not num_threads:
+        return
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+        logger.info(f"🧵 Encodage limité à {num_threads} threads")
+    except ImportError:
+        logger.warning("torch indisponible, EMBED_THREADS ignoré")
+
+
+class LengthBucketedEncoder:
+    """
+    Encode une liste de textes par lots de longueurs homogènes
+
+    Les textes sont triés par nombre de tokens, découpés en lots de batch_size,
+    encodés, puis remis dans l'ordre d'origine.
+    """
+
+    def __init__(self, model, batch_size: int = 32):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_seq_length = getattr(model, 'max_seq_length', None) or 512
+        # Copie du tokenizer : celui du modèle sert aussi à encode(), dans d'autres threads
+        self._tokenizer = copy.deepcopy(getattr(model, 'tokenizer', None))
+        self._lock = threading.Lock()
+        self.stats = {
+            'chunks': 0,
+            'batches': 0,
+            'seconds': 0.0,
+            'tokens': 0,
+            'padded_tokens': 0,
+        }
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        """Longueur de chaque texte en tokens du modèle (tronquée à max_seq_length)"""
+        if self._tokenizer is None:
+            # Approximation : ~4 caractères par token
+            return [min(len(t) // 4 + 2, self.max_seq_length) for t in texts]
+        encoded = self._tokenizer(texts, add_special_tokens=True, truncation=True,
+                            max_length=self.max_seq_length)['input_ids']
+        return [len(ids) for ids in encoded]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode les textes, résultat dans l'ordre d'entrée"""
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        start = time.perf_counter()
+        lengths = self.token_lengths(texts)
+        order = np.argsort(lengths, kind='stable')
+
+        embeddings = None
+        padded = 0
+        batches = 0
+        for i in range(0, len(order), self.batch_size):
+            idx = order[i:i + self.batch_size]
+            batch_embeddings = self.model.encode(
+                [texts[j] for j in idx],
+                batch_size=len(idx),
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=batch_embeddings.dtype)
+            embeddings[idx] = batch_embeddings
+            padded += max(lengths[j] for j in idx) * len(idx)
+            batches += 1
+
+        with self._lock:
+            self.stats['chunks'] += len(texts)
+            self.stats['batches'] += batches
+            self.stats['seconds'] += time.perf_counter() - start
+            self.stats['tokens'] += sum(lengths)
+            self.stats['padded_tokens'] += padded
+        return embeddings
+
+    def get_stats(self) -> dict:
+        """Débit (chunks/s) et efficacité du padding (tokens utiles / tokens calculés)"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['chunks_per_second'] = round(stats['chunks'] / stats['seconds'], 1) if stats['seconds'] else 0.0
+        stats['padding_efficiency'] = (round(stats['tokens'] / stats['padded_tokens'], 3)
+                                       if stats['padded_tokens'] else 0.0)
+        stats['seconds'] = round(stats['seconds'], 3)
+        return stats
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Compaction de l'historique des sessions
+Les tours anciens sont repliés dans un résumé court (borné en tokens) ; le prompt
+ne porte plus que ce résumé et le dernier tour, quelle que soit la longueur de la session.
+- extractive : question + première phrase de la réponse, sans appel externe
+- llm : résumé extractif immédiat, remplacé en arrière-plan par un résumé du modèle léger
+"""
+
+import re
+import logging
+import threading
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional
+
+try:
+    from .context_packer import TokenCounter
+except ImportError:
+    from context_packer import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+_FIRST_SENTENCE = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+class HistoryCompactor:
+    """
+    Replie les messages anciens d'une session dans session['summary']
+
+    Args:
+        counter: Compteur de tokens du prompt
+        mode: "extractive" ou "llm"
+        keep_messages: Messages conservés tels quels (2 = dernier tour)
+        max_summary_tokens: Taille maximale du résumé
+        summarize: (résumé précédent, messages repliés) -> nouveau résumé (mode llm)
+        executor: Exécuteur des résumés en arrière-plan (mode llm)
+    """
+
+    def __init__(self, counter: TokenCounter, mode: str = "extractive", keep_messages: int = 2,
+                 max_summary_tokens: int = 200,
+                 summarize: Optional[Callable[[str, List[Dict]], str]] = None,
+                 executor: Optional[Executor] = None):
+        if mode == "llm" and (summarize is None or executor is None):
+            raise ValueError("Le mode llm nécessite summarize et executor")
+        self.counter = counter
+        self.mode = mode
+        self.keep_messages = keep_messages
+        self.max_summary_tokens = max_summary_tokens
+        self.summarize = summarize
+        self.executor = executor
+        self._lock = threading.Lock()
+        self.stats = {'compactions': 0, 'llm_summaries': 0, 'llm_failures': 0}
+
+    @staticmethod
+    def _shorten(text: str, limit: int) -> str:
+        text = " ".join(text.split())
+        return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + "…"
+
+    def _extract(self, messages: List[Dict]) -> List[str]:
+        """Une ligne par message : question complète (courte), première phrase de la réponse"""
+        lines = []
+        for msg in messages:
+            if msg['role'] == 'user':
+                lines.append(f"- User: {self._shorten(msg['content'], 200)}")
+            else:
+                first = _FIRST_SENTENCE.split(msg['content'].strip(), 1)[0]
+                lines.append(f"  Assistant: {self._shorten(first, 200)}")
+        return lines
+
+    def _fit(self, summary: str) -> str:
+        """Borne le résumé en tokens en retirant les lignes les plus anciennes"""
+        lines = summary.splitlines()
+        while len(lines) > 1 and self.counter.count("\n".join(lines)) > self.max_summary_tokens:
+            lines.pop(0)
+            # Pas de réponse orpheline en tête du résumé
+            while len(lines) > 1 and lines[0].startswith("  "):
+                lines.pop(0)
+        return "\n".join(lines)
+
+    def compact(self, session: Dict):
+        """Replie les messages qui précèdent les keep_messages derniers"""
+        history = session['chat_history']
+        if len(history) <= self.keep_messages:
+            return
+        folded = history[:-self.keep_messages]
+        session['chat_history'] = history[-self.keep_messages:]
+
+        previous = session.get('summary') or ""
+        session['summary'] = self._fit("\n".join(filter(None, [previous] + self._extract(folded))))
+        session['summary_version'] = session.get('summary_version', 0) + 1
+        with self._lock:
+            self.stats['compactions'] += 1
+
+        if self.mode == "llm":
+            self.executor.submit(self._refine, session, previous, folded, session['summary_version'])
+
+    def _refine(self, session: Dict, previous: str, folded: List[Dict], version: int):
+        """Résumé du modèle léger ; ignoré si la session a été compactée entre-temps"""
+        try:
+            summary = self._fit(self.summarize(previous, folded).strip())
+        except Exception as e:
+            logger.warning(f"⚠️ Résumé de l'historique échoué, résumé extractif conservé: {e}")
+            with self._lock:
+                self.stats['llm_failures'] += 1
+            return
+        if summary and session.get('summary_version') == version:
+            session['summary'] = summary
+        with self._lock:
+            self.stats['llm_summaries'] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'mode': self.mode, 'max_summary_tokens': self.max_summary_tokens, **self.stats}
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline d'ingestion par étages : extraction -> découpage -> embedding -> écriture
+Les étages tournent en parallèle, reliés par des files bornées (backpressure)
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Marqueur de fin de flux
+_END = object()
+
+
+class PipelineAborted(Exception):
+    """Un autre étage a échoué, le pipeline s'arrête"""
+
+
+class StageStats:
+    """
+    Métriques d'un étage
+
+    - busy: temps passé à travailler
+    - starved: temps passé à attendre une entrée (étage amont trop lent)
+    - blocked: temps passé à attendre de la place en sortie (backpressure de l'aval)
+    """
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+    def add(self, field: str, value: float):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + value)
+
+    def as_dict(self, wall_time: float) -> Dict:
+        capacity = wall_time * self.workers
+        return {
+            'workers': self.workers,
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'busy_seconds': round(self.busy, 3),
+            'starved_seconds': round(self.starved, 3),
+            'blocked_seconds': round(self.blocked, 3),
+            'utilization': round(self.busy / capacity, 3) if capacity > 0 else 0.0,
+            'items_per_busy_second': round(self.items_out / self.busy, 1) if self.busy > 0 else 0.0,
+            'max_queue_depth': self.max_queue_depth,
+        }
+
+
+class IngestionPipeline:
+    """
+    Ingestion de fichiers en flux
+
+    Args:
+        extract: fichier -> résultat d'extraction (un appel par fichier, exécuté en parallèle)
+        prepare: résultat d'extraction -> liste de chunks {'id', 'text', 'metadata'}
+                 (découpage et déduplication, exécuté séquentiellement)
+        encode: liste de textes -> liste d'embeddings
+        write: (chunks, embeddings) -> None, écriture groupée dans la base vectorielle
+        extract_workers: threads d'extraction
+        queue_size: taille des files entre étages
+        embed_window: chunks regroupés entre fichiers avant chaque appel à encode
+        write_batch_size: chunks par écriture (limite de lot de la base)
+    """
+
+    def __init__(self,
+                 extract: Callable[[str], Dict],
+                 prepare: Callable[[Dict], List[Dict]],
+                 encode: Callable[[List[str]], List],
+                 write: Callable[[List[Dict], List], None],
+                 extract_workers: int = 2,
+                 queue_size: int = 8,
+                 embed_window: int = 512,
+                 write_batch_size: int = 1000):
+        self.extract = extract
+        self.prepare = prepare
+        self.encode = encode
+        self.write = write
+        self.extract_workers = max(1, extract_workers)
+        self.queue_size = queue_size
+        self.embed_window = embed_window
+        self.write_batch_size = write_batch_size
+
+    # ==========================================
+    # FILES BORNÉES
+    # ==========================================
+
+    def _put(self, q: queue.Queue, item, stats: StageStats):
+        start = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.add('blocked', time.perf_counter() - start)
+        stats.max_queue_depth = max(stats.max_queue_depth, q.qsize())
+
+    def _get(self, q: queue.Queue, stats: StageStats):
+        start = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                item = q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        stats.add('starved', time.perf_counter() - start)
+        return item
+
+    def _guard(self, target, *args):
+        """Exécute un étage : la première erreur arrête tout le pipeline"""
+        try:
+            target(*args)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            if self._error is None:
+                self._error = e
+            logger.exception("Erreur pipeline d'ingestion")
+            self._abort.set()
+
+    # ==========================================
+    # ÉTAGES
+    # ==========================================
+
+    def _extract_stage(self, files: queue.Queue, out: queue.Queue, stats: StageStats):
+        while True:
+            try:
+                file_path = files.get_nowait()
+            except queue.Empty:
+                break
+            if self._abort.is_set():
+                raise PipelineAborted()
+            stats.add('items_in', 1)
+            start = time.perf_counter()
+            result = self.extract(str(file_path))
+            stats.add('busy', time.perf_counter() - start)
+            self._put(out, result, stats)
+            stats.add('items_out', 1)
+        self._put(out, _END, stats)
+
+    def _chunk_stage(self, inp: queue.Queue, out: queue.Queue, stats: StageStats):
+        remaining = self.extract_workers
+        while remaining:
+            result = self._get(inp, stats)
+            if result is _END:
+                remaining -= 1
+                continue
+            stats.items_in += 1
+            if result.get('success'):
+                self.documents_extracted += 1
+            start = time.perf_counter()
+            entries = self.prepare(result)
+            stats.add('busy', time.perf_counter() - start)
+            for entry in entries:
+                self._put(out, entry, stats)
+            stats.items_out += len(entries)
+        self._put(out, _END, stats)
+
+    def _embed_stage(self, inp: queue.Queue, out: queue.Queue, stats: StageStats):
+        batch = []
+        done = False
+        while not done:
+            item = self._get(inp, stats)
+            if item is _END:
+                done = True
+            else:
+                batch.append(item)
+                stats.items_in += 1
+            # Fenêtre complète, ou dernière fenêtre partielle en fin de flux
+            if batch and (len(batch) >= self.embed_window or done):
+                start = time.perf_counter()
+                embeddings = self.encode([entry['text'] for entry in batch])
+                stats.add('busy', time.perf_counter() - start)
+                self._put(out, (batch, embeddings), stats)
+                stats.items_out += len(batch)
+                batch = []
+        self._put(out, _END, stats)
+
+    def _write_stage(self, inp: queue.Queue, stats: StageStats):
+        pending, pending_embeddings = [], []
+        done = False
+        while not done:
+            item = self._get(inp, stats)
+            if item is _END:
+                done = True
+            else:
+                batch, batch_embeddings = item
+                stats.items_in += len(batch)
+                pending.extend(batch)
+                pending_embeddings.extend(batch_embeddings)
+            # Écritures groupées à la taille maximale de lot de la base
+            while pending and (len(pending) >= self.write_batch_size or done):
+                size = self.write_batch_size
+                start = time.perf_counter()
+                self.write(pending[:size], pending_embeddings[:size])
+                stats.add('busy', time.perf_counter() - start)
+                stats.items_out += len(pending[:size])
+                del pending[:size], pending_embeddings[:size]
+
+    # ==========================================
+    # EXÉCUTION
+    # ==========================================
+
+    def run(self, file_paths: List[str]) -> Dict:
+        """
+        Ingère une liste de fichiers
+
+        Returns:
+            Rapport : durée totale, chunks écrits, métriques par étage et étage goulot
+        """
+        self._abort = threading.Event()
+        self._error: Optional[Exception] = None
+        self.documents_extracted = 0
+
+        files: queue.Queue = queue.Queue()
+        for file_path in file_paths:
+            files.put(file_path)
+
+        extracted = queue.Queue(maxsize=self.queue_size)
+        chunks = queue.Queue(maxsize=self.queue_size * self.embed_window)
+        embedded = queue.Queue(maxsize=self.queue_size)
+
+        stats = {
+            'extract': StageStats('extract', self.extract_workers),
+            'chunk': StageStats('chunk'),
+            'embed': StageStats('embed'),
+            'write': StageStats('write'),
+        }
+
+        threads = [
+            threading.Thread(target=self._guard, name=f"ingest-extract-{i}",
+                             args=(self._extract_stage, files, extracted, stats['extract']))
+            for i in range(self.extract_workers)
+        ]
+        threads += [
+            threading.Thread(target=self._guard, name="ingest-chunk",
+                             args=(self._chunk_stage, extracted, chunks, stats['chunk'])),
+            threading.Thread(target=self._guard, name="ingest-embed",
+                             args=(self._embed_stage, chunks, embedded, stats['embed'])),
+            threading.Thread(target=self._guard, name="ingest-write",
+                             args=(self._write_stage, embedded, stats['write'])),
+        ]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - start
+
+        if self._error is not None:
+            raise self._error
+
+        stages = {name: stage.as_dict(wall_time) for name, stage in stats.items()}
+        bottleneck = max(stages, key=lambda name: stages[name]['utilization']) if stages else None
+        report = {
+            'files': len(file_paths),
+            'documents_extracted': self.documents_extracted,
+            'chunks_written': stats['write'].items_out,
+            'wall_seconds': round(wall_time, 3),
+            'chunks_per_second': round(stats['write'].items_out / wall_time, 1) if wall_time > 0 else 0.0,
+            'bottleneck': bottleneck,
+            'stages': stages,
+        }
+
+        self._log_report(report)
+        return report
+
+    @staticmethod
+    def _log_report(report: Dict):
+        lines = [
+            f"⚙️ Pipeline d'ingestion: {report['files']} fichiers, {report['chunks_written']} chunks "
+            f"en {report['wall_seconds']:.2f}s (goulot: {report['bottleneck']})"
+        ]
+        for name, stage in report['stages'].items():
+            lines.append(
+                f"   {name:8s} util {stage['utilization'] * 100:5.1f}%  "
+                f"busy {stage['busy_seconds']:7.2f}s  attente entrée {stage['starved_seconds']:7.2f}s  "
+                f"bloqué sortie {stage['blocked_seconds']:7.2f}s"
+            )
+        logger.info("\n".join(lines))
+
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Index lexical BM25 en mémoire
+Complète la recherche vectorielle pour les termes exacts (codes d'erreur, noms d'applications, postes)
+"""
+
+import re
+import math
+import heapq
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Mots, nombres et codes composés : "0x80070005", "REQ-1234", "v2.3"
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+STOPWORDS = {
+    # Français
+    "le", "la", "les", "un", "une", "des", "de", "du", "et", "ou", "a", "au", "aux", "en",
+    "je", "tu", "il", "elle", "on", "nous", "vous", "ils", "mon", "ma", "mes", "ne", "pas",
+    "que", "qui", "quoi", "pour", "par", "sur", "dans", "avec", "est", "sont", "comment", "ce",
+    # Anglais
+    "the", "an", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are", "my", "i",
+    "how", "do", "does", "what", "it", "be", "can",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalisés (minuscules, sans accents) ; les codes composés gardent aussi leurs parties"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    tokens = []
+    for token in _TOKEN.findall(text):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = re.split(r"[-_./]", token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p and p not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    Index inversé BM25 (Okapi) mis à jour en même temps que la base vectorielle
+
+    Les documents supprimés libèrent leur emplacement ; les listes de postings
+    sont des dicts {emplacement: fréquence}.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        """Vide l'index"""
+        with self._lock:
+            self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+            self._slot_by_id: Dict[str, int] = {}
+            self._ids: List[Optional[str]] = []
+            self._texts: List[Optional[str]] = []
+            self._metadatas: List[Optional[Dict]] = []
+            self._lengths: List[int] = []
+            self._terms: List[Optional[Dict[str, int]]] = []
+            self._free: List[int] = []
+            self._total_length = 0
+
+    def __len__(self):
+        return len(self._slot_by_id)
+
+    # ==========================================
+    # ÉCRITURE
+    # ==========================================
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict]):
+        """Ajoute (ou remplace) des documents"""
+        with self._lock:
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                if doc_id in self._slot_by_id:
+                    self._remove_one(doc_id)
+
+                counts: Dict[str, int] = defaultdict(int)
+                for token in tokenize(text):
+                    counts[token] += 1
+
+                if self._free:
+                    slot = self._free.pop()
+                    self._ids[slot], self._texts[slot], self._metadatas[slot] = doc_id, text, dict(metadata)
+                    self._lengths[slot], self._terms[slot] = sum(counts.values()), dict(counts)
+                else:
+                    slot = len(self._ids)
+                    self._ids.append(doc_id)
+                    self._texts.append(text)
+                    self._metadatas.append(dict(metadata))
+                    self._lengths.append(sum(counts.values()))
+                    self._terms.append(dict(counts))
+
+                self._slot_by_id[doc_id] = slot
+                self._total_length += self._lengths[slot]
+                for term, tf in counts.items():
+                    self._postings[term][slot] = tf
+
+    def _remove_one(self, doc_id: str):
+        slot = self._slot_by_id.pop(doc_id)
+        for term in self._terms[slot]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(slot, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths[slot]
+        self._ids[slot] = self._texts[slot] = self._metadatas[slot] = self._terms[slot] = None
+        self._lengths[slot] = 0
+        self._free.append(slot)
+
+    def remove(self, ids: List[str]):
+        """Supprime des documents (ids inconnus ignorés)"""
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self._slot_by_id:
+                    self._remove_one(doc_id)
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        """Met à jour les métadonnées sans réindexer le texte"""
+        with self._lock:
+            for doc_id, metadata in zip(ids, metadatas):
+                slot = self._slot_by_id.get(doc_id)
+                if slot is not None:
+                    self._metadatas[slot] = dict(metadata)
+
+    # ==========================================
+    # RECHERCHE
+    # ==========================================
+
+    def search(self, query: str, k: int = 10,
+               accept: Optional[Callable[[Dict], bool]] = None) -> List[Tuple[str, float, str, Dict]]:
+        """
+        Recherche BM25
+
+        Args:
+            query: Requête
+            k: Nombre de résultats
+            accept: Filtre sur les métadonnées, appliqué avant la sélection du top-k
+
+        Returns:
+            Liste de (id, score, texte, métadonnées) triée par score décroissant
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._slot_by_id)
+            if not n_docs or not terms:
+                return []
+            avg_length = self._total_length / n_docs
+
+            scores: Dict[int, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for slot, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[slot] / avg_length)
+                    scores[slot] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            candidates = scores.items()
+            if accept is not None:
+                candidates = [(slot, score) for slot, score in candidates if accept(self._metadatas[slot])]
+            best = heapq.nlargest(k, candidates, key=lambda item: item[1])
+            return [(self._ids[slot], score, self._texts[slot], self._metadatas[slot]) for slot, score in best]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], weights: List[float], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fusion de classements par rang réciproque pondéré
+
+    Args:
+        rankings: Listes d'ids triées (meilleur en premier)
+        weights: Poids de chaque classement
+        k: Constante de lissage RRF
+
+    Returns:
+        Liste de (id, score fusionné) triée par score décroissant
+    """
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] += weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Appels LLM résilients
+- Délai par tentative et délai total
+- Nouvelles tentatives bornées sur 429 / 5xx / timeout, backoff exponentiel avec jitter
+- Disjoncteur : échec immédiat tant que le fournisseur est dégradé
+- Requête de couverture (hedging) optionnelle après le p95 observé
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Exceptions réseau des SDK (groq, openai, httpx) reconnues par leur nom
+_RETRY_ERRORS = {"APITimeoutError", "APIConnectionError", "TimeoutException", "NetworkError", "RemoteProtocolError"}
+
+
+class LLMUnavailableError(Exception):
+    """Disjoncteur ouvert : le fournisseur n'est pas appelé"""
+
+
+class LLMTimeoutError(Exception):
+    """Délai total dépassé"""
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError, LLMTimeoutError)):
+        return True
+    if getattr(error, 'status_code', None) in RETRY_STATUSES:
+        return True
+    return any(cls.__name__ in _RETRY_ERRORS for cls in type(error).__mro__)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Délai demandé par le fournisseur (en-tête Retry-After d'une réponse 429/503)"""
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états
+
+    closed : appels normaux ; après failure_threshold échecs consécutifs → open
+    open : échec immédiat pendant reset_timeout secondes → half_open
+    half_open : un seul appel d'essai ; succès → closed, échec → open
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opens = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("✅ Disjoncteur LLM refermé")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opens += 1
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+                logger.warning(f"⚠️ Disjoncteur LLM ouvert ({self.failures} échecs), "
+                               f"appels suspendus {self.reset_timeout:.0f}s")
+
+
+class ResilientLLMClient:
+    """
+    Enveloppe une fonction d'appel chat-completions (create(**kwargs, timeout=...))
+
+    Args:
+        create: Fonction d'appel du SDK (ex. client.chat.completions.create)
+        attempt_timeout: Délai d'une tentative (secondes)
+        total_timeout: Délai total, nouvelles tentatives comprises
+        max_retries: Nouvelles tentatives après la première
+        backoff_base / backoff_max: Backoff exponentiel "full jitter" (secondes)
+        breaker: Disjoncteur partagé
+        hedge: Active la requête de couverture sur la première tentative
+        hedge_delay: Délai avant couverture (secondes), None = p95 des latences observées
+    """
+
+    def __init__(self, create: Callable[..., Any], attempt_timeout: float = 20.0, total_timeout: float = 45.0,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 4.0,
+                 breaker: Optional[CircuitBreaker] = None, hedge: bool = False,
+                 hedge_delay: Optional[float] = None, hedge_min_samples: int = 20):
+        self._create = create
+        self.attempt_timeout = attempt_timeout
+        self.total_timeout = total_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm") if hedge else None
+        self._latencies = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self.stats = {
+            'calls': 0, 'attempts': 0, 'retries': 0, 'timeouts': 0, 'failures': 0,
+            'fast_failures': 0, 'hedges': 0, 'hedge_wins': 0,
+        }
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _call(self, kwargs: Dict, timeout: float):
+        self._count('attempts')
+        start = time.monotonic()
+        result = self._create(**kwargs, timeout=timeout)
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return result
+
+    def _current_hedge_delay(self) -> Optional[float]:
+        if self.hedge_delay:
+            return self.hedge_delay
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            return float(np.percentile(self._latencies, 95))
+
+    def _attempt(self, kwargs: Dict, timeout: float, hedge: bool):
+        """Une tentative ; avec couverture, une seconde requête part si la première dépasse le délai"""
+        delay = self._current_hedge_delay() if hedge else None
+        if delay is None or delay >= timeout:
+            return self._call(kwargs, timeout)
+
+        first = self._executor.submit(self._call, kwargs, timeout)
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+        self._count('hedges')
+        second = self._executor.submit(self._call, kwargs, timeout - delay)
+
+        deadline = time.monotonic() + timeout - delay
+        pending, errors = {first, second}, []
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                raise LLMTimeoutError(f"Aucune réponse en {timeout:.1f}s (couverture comprise)")
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count('hedge_wins')
+                    return future.result()
+                errors.append(future.exception())
+        raise errors[0]
+
+    def create(self, **kwargs):
+        """Appel chat-completions avec délais, nouvelles tentatives, disjoncteur et couverture"""
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('fast_failures')
+            raise LLMUnavailableError("Fournisseur LLM dégradé (disjoncteur ouvert)")
+
+        deadline = time.monotonic() + self.total_timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise LLMTimeoutError(f"Délai total de {self.total_timeout:.0f}s dépassé")
+                result = self._attempt(kwargs, min(self.attempt_timeout, remaining), hedge=self.hedge and attempt == 0)
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                if not is_retryable(e):
+                    # Erreur de la requête (400, 401…) : le fournisseur répond, le disjoncteur n'est pas concerné
+                    self.breaker.record_success()
+                    self._count('failures')
+                    raise
+                self.breaker.record_failure()
+                if isinstance(e, LLMTimeoutError) or "Timeout" in type(e).__name__:
+                    self._count('timeouts')
+
+                attempt += 1
+                backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                backoff = max(backoff, _retry_after(e) or 0.0)
+                if attempt > self.max_retries or time.monotonic() + backoff >= deadline:
+                    self._count('failures')
+                    raise
+                if not self.breaker.allow():
+                    # Disjoncteur ouvert par cet échec (seuil atteint ou essai en half_open raté)
+                    self._count('failures')
+                    raise LLMUnavailableError("Fournisseur LLM dégradé (disjoncteur ouvert)") from e
+                self._count('retries')
+                logger.warning(f"⚠️ Appel LLM échoué ({type(e).__name__}), nouvelle tentative "
+                               f"{attempt}/{self.max_retries} dans {backoff:.2f}s")
+                time.sleep(backoff)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000 if self._latencies else None
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'breaker_state': self.breaker.state,
+            'breaker_opens': self.breaker.opens,
+            'hedging': self.hedge,
+            'latency_ms': {
+                'p50': round(float(np.percentile(latencies, 50)), 1),
+                'p95': round(float(np.percentile(latencies, 95)), 1),
+                'p99': round(float(np.percentile(latencies, 99)), 1),
+            } if latencies is not None else None,
+        }
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Fournisseurs LLM : SDK Groq (ou SDK OpenAI pour une autre API compatible) sur un pool HTTP réglable
+- Un client httpx par fournisseur (connexions, keep-alive, HTTP/2, délai de connexion),
+  partagé par tous ses appels
+- Groq par défaut ; autre fournisseur (auto-hébergé, stub de test) par configuration
+- Statistiques du pool : connexions ouvertes, utilisées, inactives
+"""
+
+import os
+import logging
+import threading
+import importlib.util
+from typing import Dict, NamedTuple, Optional
+
+import httpx
+from groq import Groq
+
+logger = logging.getLogger(__name__)
+
+
+class PoolConfig(NamedTuple):
+    """Réglages du pool de connexions d'un fournisseur"""
+    max_connections: int = 20
+    max_keepalive: int = 10
+    keepalive_expiry: float = 30.0  # secondes d'inactivité avant fermeture d'une connexion
+    http2: bool = False
+    connect_timeout: float = 5.0
+
+
+class ProviderConfig(NamedTuple):
+    name: str
+    base_url: Optional[str]  # None = point d'accès par défaut du SDK
+    api_key: Optional[str]
+
+
+def load_provider_config(name: str, groq_api_key: Optional[str] = None,
+                         groq_base_url: Optional[str] = None) -> ProviderConfig:
+    """
+    Configuration d'un fournisseur
+
+    groq : SDK Groq ; GROQ_BASE_URL est la racine du serveur (le SDK appelle <racine>/openai/v1/...)
+    autre nom : SDK OpenAI sur LLM_PROVIDER_<NOM>_BASE_URL (ex. http://vllm:8000/v1) et LLM_PROVIDER_<NOM>_API_KEY
+    """
+    if name == "groq":
+        return ProviderConfig(name, groq_base_url, groq_api_key)
+
+    prefix = f"LLM_PROVIDER_{name.upper()}_"
+    base_url = os.getenv(prefix + "BASE_URL")
+    if not base_url:
+        raise ValueError(f"Fournisseur LLM '{name}' inconnu : définir {prefix}BASE_URL")
+    return ProviderConfig(name, base_url, os.getenv(prefix + "API_KEY") or None)
+
+
+def _sdk(name: str):
+    if name == "groq":
+        return Groq
+    try:
+        from openai import OpenAI
+    except ImportError:
+        raise ValueError(f"Fournisseur LLM '{name}' : paquet openai requis (pip install openai)")
+    return OpenAI
+
+
+class LLMProvider:
+    """
+    Client chat completions d'un fournisseur (SDK) sur un client httpx partagé
+
+    create : mêmes arguments que client.chat.completions.create ; timeout (secondes) borne
+    chaque étape httpx. Sans streaming, la réponse n'arrive qu'une fois générée : le délai
+    de lecture borne donc l'appel entier.
+    Nouvelles tentatives désactivées dans le SDK : elles sont gérées par llm_client.
+    """
+
+    def __init__(self, config: ProviderConfig, pool: PoolConfig = PoolConfig()):
+        self.name = config.name
+        self.pool = pool
+        http2 = pool.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("⚠️ HTTP/2 demandé mais paquet h2 absent (pip install httpx[http2]), HTTP/1.1 utilisé")
+            http2 = False
+        self.http2 = http2
+
+        limits = httpx.Limits(max_connections=pool.max_connections,
+                              max_keepalive_connections=pool.max_keepalive,
+                              keepalive_expiry=pool.keepalive_expiry)
+        self._transport = httpx.HTTPTransport(limits=limits, http2=http2)
+        self._http = httpx.Client(transport=self._transport,
+                                  timeout=httpx.Timeout(None, connect=pool.connect_timeout))
+        # Serveur auto-hébergé sans authentification : le SDK OpenAI exige une clé
+        api_key = config.api_key or (None if config.name == "groq" else "none")
+        self.client = _sdk(config.name)(api_key=api_key, base_url=config.base_url,
+                                        http_client=self._http, max_retries=0)
+        self.base_url = str(self.client.base_url).rstrip("/")
+        self.custom_base_url = config.base_url is not None
+
+    def create(self, timeout: Optional[float] = None, **kwargs):
+        if timeout is not None:
+            kwargs['timeout'] = httpx.Timeout(timeout, connect=min(self.pool.connect_timeout, timeout))
+        return self.client.chat.completions.create(**kwargs)
+
+    def close(self):
+        self._http.close()
+
+    def get_stats(self) -> Dict:
+        pool = getattr(self._transport, '_pool', None)
+        connections = list(getattr(pool, 'connections', []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            'name': self.name,
+            'base_url': self.base_url,
+            'http2': self.http2,
+            'max_keepalive': self.pool.max_keepalive,
+            'keepalive_expiry': self.pool.keepalive_expiry,
+            'pool': {
+                'max_connections': self.pool.max_connections,
+                'open': len(connections),
+                'in_use': len(connections) - idle,
+                'idle': idle,
+            },
+        }
+
+
+_providers: Dict[str, LLMProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(config: ProviderConfig, pool: PoolConfig = PoolConfig()) -> LLMProvider:
+    """Fournisseur partagé par nom : un seul pool de connexions par fournisseur dans le processus"""
+    with _providers_lock:
+        if config.name not in _providers:
+            _providers[config.name] = LLMProvider(config, pool)
+            logger.info(f"🔌 Fournisseur LLM '{config.name}' ({_providers[config.name].base_url}, "
+                        f"{pool.max_connections} connexions, keep-alive {pool.keepalive_expiry:.0f}s)")
+        return _providers[config.name]
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Routage des questions entre un modèle Groq rapide et le grand modèle
+Signaux peu coûteux : longueur de la question, confiance de la recherche,
+liste d'étapes déjà présente dans le meilleur chunk, plan du client.
+Chaque route mesure sa latence et son coût pour ajuster les seuils sur le trafic réel.
+"""
+
+import re
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Prix Groq en dollars par million de tokens (entrée, sortie)
+MODEL_PRICES = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+}
+
+# Lignes "1.", "2)", "- ", "• ", "Étape 3" : procédure pas à pas
+_STEP_LINE = re.compile(r'^\s*(?:\d{1,2}\s*[.)-]|[-•*]\s|(?:étape|step)\s*\d)', re.IGNORECASE | re.MULTILINE)
+
+
+def has_step_list(text: Optional[str], min_steps: int = 3) -> bool:
+    return bool(text) and len(_STEP_LINE.findall(text)) >= min_steps
+
+
+def estimate_cost(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Optional[float]:
+    """Coût d'un appel en dollars (None si le modèle n'a pas de prix connu)"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return ((prompt_tokens or 0) * prices[0] + (completion_tokens or 0) * prices[1]) / 1_000_000
+
+
+class RouteDecision(NamedTuple):
+    """Modèle retenu pour une requête et signaux qui ont conduit au choix"""
+    route: str  # "fast" ou "large"
+    model: str
+    max_tokens: int
+    signals: Dict
+    reasons: List[str]
+
+
+class ModelRouter:
+    """
+    Choisit le modèle et max_tokens d'une requête
+
+    Route rapide si la recherche est confiante (distance du meilleur chunk sous le seuil)
+    et que la question est courte ou que le chunk contient déjà la procédure ;
+    les plans premium n'y vont que pour les questions courtes.
+    """
+
+    def __init__(self, large_model: str, fast_model: str, enabled: bool = True,
+                 confident_distance: float = 0.35, short_question_words: int = 12,
+                 premium_plans: Optional[List[str]] = None, large_max_tokens: int = 800,
+                 fast_max_tokens: int = 600, short_answer_max_tokens: int = 300):
+        self.large_model = large_model
+        self.fast_model = fast_model
+        self.enabled = enabled
+        self.confident_distance = confident_distance
+        self.short_question_words = short_question_words
+        self.premium_plans = set(premium_plans or [])
+        self.large_max_tokens = large_max_tokens
+        self.fast_max_tokens = fast_max_tokens
+        self.short_answer_max_tokens = short_answer_max_tokens
+        self._lock = threading.Lock()
+        self._stats = {
+            route: {'requests': 0, 'latencies': deque(maxlen=1000), 'prompt_tokens': 0,
+                    'completion_tokens': 0, 'cost_usd': 0.0}
+            for route in ("fast", "large")
+        }
+
+    def route(self, question: str, top_distance: Optional[float], top_content: Optional[str],
+              plan: str) -> RouteDecision:
+        words = len(question.split())
+        signals = {
+            'question_words': words,
+            'top_distance': round(top_distance, 4) if top_distance is not None else None,
+            'step_list': has_step_list(top_content),
+            'plan': plan,
+        }
+        confident = top_distance is not None and top_distance <= self.confident_distance
+        short = words <= self.short_question_words
+
+        reasons = []
+        if not self.enabled:
+            reasons.append("routing disabled")
+        elif not confident:
+            reasons.append("low retrieval confidence")
+        elif plan in self.premium_plans and not short:
+            reasons.append("premium plan, long question")
+        elif not (short or signals['step_list']):
+            reasons.append("long question without step list")
+
+        if reasons:
+            return RouteDecision("large", self.large_model, self.large_max_tokens, signals, reasons)
+
+        reasons = ["confident retrieval"] + (["short question"] if short else []) \
+            + (["step list in top chunk"] if signals['step_list'] else [])
+        max_tokens = self.short_answer_max_tokens if short and not signals['step_list'] else self.fast_max_tokens
+        return RouteDecision("fast", self.fast_model, max_tokens, signals, reasons)
+
+    def record(self, decision: RouteDecision, latency: float, prompt_tokens: Optional[int],
+               completion_tokens: Optional[int]) -> Optional[float]:
+        """Enregistre latence et tokens d'un appel ; retourne son coût estimé"""
+        cost = estimate_cost(decision.model, prompt_tokens, completion_tokens)
+        with self._lock:
+            stats = self._stats[decision.route]
+            stats['requests'] += 1
+            stats['latencies'].append(latency)
+            stats['prompt_tokens'] += prompt_tokens or 0
+            stats['completion_tokens'] += completion_tokens or 0
+            stats['cost_usd'] += cost or 0.0
+        return cost
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            routes = {}
+            for route, stats in self._stats.items():
+                latencies = np.array(stats['latencies'])
+                routes[route] = {
+                    'model': self.fast_model if route == "fast" else self.large_model,
+                    'requests': stats['requests'],
+                    'p50_seconds': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+                    'p95_seconds': round(float(np.percentile(latencies, 95)), 3) if len(latencies) else None,
+                    'prompt_tokens': stats['prompt_tokens'],
+                    'completion_tokens': stats['completion_tokens'],
+                    'cost_usd': round(stats['cost_usd'], 4),
+                }
+        return {'enabled': self.enabled, 'routes': routes}
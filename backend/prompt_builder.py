@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Assemblage des messages envoyés au LLM
+- Préfixe système statique, identique octet pour octet d'une requête à l'autre
+  (réutilisable par le cache de préfixe du fournisseur)
+- Parties variables (historique, contexte, consigne de langue, question) après le préfixe
+- Gabarits par langue construits une seule fois au chargement
+"""
+
+from typing import Dict, List, Optional
+
+try:
+    from .context_packer import TokenCounter
+except ImportError:
+    from context_packer import TokenCounter
+
+
+SYSTEM_PREFIX = """You are a SPECIALIZED hospital IT Support assistant with STRICT limitations.
+
+🔒 ABSOLUTE RULES - YOU MUST FOLLOW THESE:
+1. You can ONLY answer questions about IT support topics found in the provided context
+2. If the question is NOT about IT support (computers, software, network, passwords, printers, etc.) → REFUSE to answer
+3. If no relevant information exists in the context → Say you don't have that information in your knowledge base
+4. NEVER answer questions about: medicine, health, personal advice, general knowledge, calculations, etc.
+5. NEVER make up information - use ONLY what's in the context
+
+🌐 LANGUAGE RULE:
+Each user message states the language of the question. You MUST respond in that language.
+- If question is in French → respond in French
+- If question is in English → respond in English
+- NEVER mix languages
+
+📋 RESPONSE STYLE:
+- Clear and concise
+- Use bullet points for step-by-step instructions
+- Professional and courteous tone
+- If refusing: politely explain you only handle IT support questions
+
+📚 KNOWLEDGE BASE CONTEXT:
+The context for the current question is given in the last user message, between
+<context> and </context>. Earlier messages do not carry context.
+
+EXAMPLES OF VALID QUESTIONS:
+✅ "Comment réinitialiser mon mot de passe?"
+✅ "Mon imprimante ne fonctionne pas"
+✅ "Je n'arrive pas à me connecter à Citrix"
+✅ "How do I access the VPN?"
+
+EXAMPLES OF INVALID QUESTIONS (REFUSE THESE):
+❌ "Quelle est la capitale de la France?" → Medical/general knowledge
+❌ "Comment traiter un patient?" → Medical question
+❌ "Calcule 2+2" → Not IT support
+❌ "Tell me a joke" → Not IT support
+"""
+
+NO_CONTEXT = "No relevant IT support information found in knowledge base."
+
+# Résumé des tours repliés par la compaction de l'historique
+SUMMARY_HEADER = "Summary of the earlier conversation (older turns are not repeated):\n"
+
+SUMMARY_INSTRUCTIONS = """You maintain a running summary of an IT support conversation.
+Merge the current summary with the new turns into a short bullet list (at most 8 bullets):
+the user's problem, their environment (devices, software, error codes) and what was already tried or answered.
+Keep the language of the conversation. Output only the bullet list."""
+
+
+class LanguageTemplate:
+    """Gabarit du dernier message utilisateur pour une langue (parties fixes pré-assemblées)"""
+
+    def __init__(self, language_name: str):
+        self.language_name = language_name
+        self._head = "<context>\n"
+        self._tail = (
+            f"\n</context>\n\n"
+            f"The user's question is in {language_name}. You MUST respond in {language_name}.\n\n"
+            f"Question: "
+        )
+
+    def render(self, context: str, question: str) -> str:
+        return self._head + (context or NO_CONTEXT) + self._tail + question
+
+
+TEMPLATES = {
+    'fr': LanguageTemplate("French"),
+    'en': LanguageTemplate("English"),
+}
+
+
+class PromptBuilder:
+    """
+    Construit les messages : [préfixe système] + historique + [contexte, langue, question]
+
+    Seul le dernier message dépend de la recherche ; le préfixe ne change jamais
+    et l'historique d'une session ne fait que s'allonger.
+    """
+
+    def __init__(self, counter: TokenCounter, history_messages: int = 5):
+        self.counter = counter
+        self.history_messages = history_messages
+        self.system_message = {"role": "system", "content": SYSTEM_PREFIX}
+        # Tokens du préfixe commun (message système + <|begin_of_text|>)
+        self.prefix_tokens = counter.count_messages([self.system_message])
+
+    def build(self, context: str, question: str, chat_history: List[Dict], user_lang: str,
+              summary: Optional[str] = None) -> List[Dict]:
+        """Messages de la requête de chat (résumé des tours anciens si l'historique est compacté)"""
+        template = TEMPLATES.get(user_lang, TEMPLATES['en'])
+        messages = [self.system_message]
+        if summary:
+            messages.append({"role": "system", "content": SUMMARY_HEADER + summary})
+        if self.history_messages:
+            messages.extend(
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in chat_history[-self.history_messages:]
+            )
+        messages.append({"role": "user", "content": template.render(context, question)})
+        return messages
+
+    def fit(self, question: str, chat_history: List[Dict], user_lang: str, summary: Optional[str],
+            max_tokens: int) -> tuple:
+        """
+        Historique et résumé réduits pour que le prompt sans contexte tienne dans max_tokens
+
+        Les tours les plus anciens sont retirés d'abord (par paires question/réponse), puis le résumé.
+
+        Returns:
+            (historique, résumé, tokens du prompt sans contexte)
+        """
+        history = chat_history[-self.history_messages:] if self.history_messages else []
+        while True:
+            tokens = self.counter.count_messages(self.build("", question, history, user_lang, summary))
+            if tokens <= max_tokens or (not history and not summary):
+                return history, summary, tokens
+            if history:
+                history = history[2:]
+            else:
+                summary = None
+
+    @staticmethod
+    def summary_request(previous: str, folded: List[Dict]) -> List[Dict]:
+        """Messages de la requête de résumé (modèle léger)"""
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in folded)
+        return [
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": f"Current summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"},
+        ]
+
+    def measure(self, messages: List[Dict]) -> Dict:
+        """Taille du prompt : total, préfixe statique et partie variable (tokens)"""
+        total = self.counter.count_messages(messages)
+        return {
+            'prompt_tokens': total,
+            'prefix_tokens': self.prefix_tokens,
+            'variable_tokens': total - self.prefix_tokens,
+        }
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Reranking des candidats par cross-encoder (CPU)
+Budget de latence strict : au-delà, l'ordre de la recherche est conservé
+Budget par défaut : voir scripts/benchmark_reranker.py (20 candidats × 256 tokens)
+"""
+
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """
+    Reclasse les candidats (question, chunk) en un seul lot
+
+    Les scores sont mis en cache par (question, empreinte du texte du chunk) : un chunk
+    réindexé avec un autre contenu n'hérite pas de l'ancien score. Si le scoring
+    dépasse le budget, il se termine en arrière-plan et remplit le cache pour
+    les requêtes suivantes. Tant qu'un scoring est en cours, aucun autre n'est
+    soumis : la requête garde l'ordre de la recherche au lieu d'empiler un
+    travail qui serait abandonné à son tour.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 budget_ms: float = 400.0, cache_size: int = 4096, max_length: int = 256):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Un seul scoring à la fois : le CPU n'est pas sursouscrit
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._busy = threading.Semaphore(1)
+        self.stats = {
+            'calls': 0,
+            'fallbacks': 0,
+            'skipped_busy': 0,
+            'cache_hits': 0,
+            'pairs_scored': 0,
+            'total_ms': 0.0,
+        }
+        logger.info(f"✅ Cross-encoder chargé: {model_name} (budget {budget_ms} ms)")
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _cache_put(self, items: Dict[Tuple[str, str], float]):
+        with self._cache_lock:
+            self._cache.update(items)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _key(query: str, content: str) -> Tuple[str, str]:
+        return query, hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _score(self, query: str, pending: List[Tuple[Tuple[str, str], str]]) -> Dict[Tuple[str, str], float]:
+        scores = self.model.predict([(query, text) for _, text in pending], batch_size=len(pending),
+                                    show_progress_bar=False)
+        result = {key: float(score) for (key, _), score in zip(pending, scores)}
+        self._cache_put(result)
+        self.stats['pairs_scored'] += len(pending)
+        return result
+
+    def rerank(self, query: str, documents: List[Dict], top_k: int) -> List[Dict]:
+        """
+        Garde les top_k meilleurs documents selon le cross-encoder
+
+        Args:
+            query: Question
+            documents: Candidats dans l'ordre de la recherche (clés 'id' et 'content')
+            top_k: Nombre de documents conservés
+        """
+        if len(documents) <= 1:
+            return documents[:top_k]
+
+        start = time.perf_counter()
+        self.stats['calls'] += 1
+
+        scores = {}
+        pending = []
+        keys = {doc['id']: self._key(query, doc['content']) for doc in documents}
+        for doc in documents:
+            key = keys[doc['id']]
+            cached = self._cache_get(key)
+            if cached is None:
+                pending.append((key, doc['content']))
+            else:
+                scores[key] = cached
+                self.stats['cache_hits'] += 1
+
+        if pending:
+            # Un scoring (éventuellement abandonné) occupe déjà le CPU : pas de file d'attente
+            if not self._busy.acquire(blocking=False):
+                self.stats['skipped_busy'] += 1
+                self.stats['total_ms'] += (time.perf_counter() - start) * 1000
+                logger.debug("⏭️ Reranking déjà en cours, ordre de recherche conservé")
+                return documents[:top_k]
+            future = self._executor.submit(self._score, query, pending)
+            future.add_done_callback(lambda _: self._busy.release())
+            remaining = self.budget_ms / 1000 - (time.perf_counter() - start)
+            try:
+                scores.update(future.result(timeout=max(remaining, 0)))
+            except FutureTimeoutError:
+                self.stats['fallbacks'] += 1
+                self.stats['total_ms'] += (time.perf_counter() - start) * 1000
+                logger.warning(f"⏱️ Reranking hors budget ({self.budget_ms} ms), ordre de recherche conservé")
+                return documents[:top_k]
+
+        ranked = sorted(documents, key=lambda doc: scores[keys[doc['id']]], reverse=True)
+        for doc in ranked:
+            doc['rerank_score'] = scores[keys[doc['id']]]
+
+        self.stats['total_ms'] += (time.perf_counter() - start) * 1000
+        return ranked[:top_k]
+
+    def get_stats(self) -> Dict:
+        """Statistiques de reranking"""
+        stats = dict(self.stats)
+        stats['avg_ms'] = round(stats['total_ms'] / stats['calls'], 2) if stats['calls'] else 0.0
+        stats['total_ms'] = round(stats['total_ms'], 1)
+        return stats
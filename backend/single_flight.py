@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Coalescence des requêtes identiques en cours (single-flight, asyncio)
+Tant qu'un calcul est en cours pour une clé, les appels suivants avec la même clé
+attendent son résultat au lieu de relancer le calcul.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Un calcul à la fois par clé
+
+    Le calcul tourne dans sa propre tâche : l'abandon du premier appelant
+    (client déconnecté) n'annule pas le résultat attendu par les autres.
+    Une erreur est transmise à tous les appelants de la clé.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {'leaders': 0, 'coalesced': 0, 'max_waiters': 0}
+        self._waiters: Dict[Hashable, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Returns:
+            (résultat, True si le résultat vient d'un calcul lancé par un autre appelant)
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.stats['coalesced'] += 1
+            self._waiters[key] += 1
+            self.stats['max_waiters'] = max(self.stats['max_waiters'], self._waiters[key])
+        else:
+            self.stats['leaders'] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 1
+            task.add_done_callback(lambda done, k=key: self._release(k, done))
+        return await asyncio.shield(task), shared
+
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            waiters = self._waiters.pop(key, 1)
+            if waiters > 1:
+                logger.info(f"🔗 {waiters - 1} requête(s) identique(s) servie(s) par un seul calcul")
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'in_flight': len(self._inflight)}
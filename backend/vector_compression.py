@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Représentations compressées des embeddings pour la recherche exhaustive
+- int8 : quantification scalaire par dimension (4x moins de mémoire)
+- pca : projection sur les composantes principales (dimension réduite)
+- pca_int8 : les deux
+Les scores compressés servent à présélectionner des candidats, rescorés en float32.
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("int8", "pca", "pca_int8")
+
+
+class VectorCompressor:
+    """
+    Encode des vecteurs normalisés en codes compacts et score des requêtes contre ces codes
+
+    Le produit scalaire est approché par (q - μ)·Pᵀ · codes : le terme q·μ est
+    constant pour une requête et ne change pas le classement.
+    """
+
+    def __init__(self, method: str = "int8", reduced_dim: int = 128, max_train: int = 50000, seed: int = 42):
+        if method not in METHODS:
+            raise ValueError(f"Compression inconnue: {method} (attendu: {', '.join(METHODS)})")
+        self.method = method
+        self.reduced_dim = reduced_dim
+        self.max_train = max_train
+        self.seed = seed
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.dimension: Optional[int] = None
+
+    @property
+    def uses_pca(self) -> bool:
+        return self.method.startswith("pca")
+
+    @property
+    def uses_int8(self) -> bool:
+        return self.method.endswith("int8")
+
+    @property
+    def fitted(self) -> bool:
+        return self.dimension is not None
+
+    @property
+    def code_dim(self) -> int:
+        return self.components.shape[0] if self.uses_pca else self.dimension
+
+    @property
+    def code_dtype(self):
+        return np.int8 if self.uses_int8 else np.float32
+
+    def bytes_per_vector(self) -> int:
+        return self.code_dim * np.dtype(self.code_dtype).itemsize
+
+    def fit(self, vectors: np.ndarray):
+        """Apprend la projection et les échelles sur un échantillon du corpus"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) > self.max_train:
+            rng = np.random.default_rng(self.seed)
+            vectors = vectors[rng.choice(len(vectors), self.max_train, replace=False)]
+        self.dimension = vectors.shape[1]
+
+        if self.uses_pca:
+            self.mean = vectors.mean(axis=0)
+            _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+            self.components = vt[:min(self.reduced_dim, vt.shape[0])].astype(np.float32)
+            projected = (vectors - self.mean) @ self.components.T
+        else:
+            projected = vectors
+
+        if self.uses_int8:
+            # Écrêtage au 99,9e percentile : les valeurs extrêmes ne dégradent pas la résolution
+            self.scale = np.maximum(np.percentile(np.abs(projected), 99.9, axis=0), 1e-6).astype(np.float32) / 127
+        logger.info(f"🗜️ Compression {self.method}: {self.dimension} → {self.code_dim} dims, "
+                    f"{self.bytes_per_vector()} octets/vecteur (appris sur {len(vectors)} vecteurs)")
+
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.uses_pca:
+            return (vectors - self.mean) @ self.components.T
+        return vectors
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Codes compacts (n, code_dim)"""
+        projected = self._project(vectors)
+        if self.uses_int8:
+            return np.clip(np.rint(projected / self.scale), -127, 127).astype(np.int8)
+        return projected.astype(np.float32)
+
+    def score(self, queries: np.ndarray, codes: np.ndarray, block_size: int = 16384) -> np.ndarray:
+        """Scores approchés (n_requêtes, n_codes), par blocs pour borner la mémoire temporaire"""
+        projected = self._project(queries)
+        if self.uses_int8:
+            projected = projected * self.scale
+        scores = np.empty((len(projected), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), block_size):
+            block = codes[start:start + block_size]
+            scores[:, start:start + len(block)] = projected @ block.astype(np.float32, copy=False).T
+        return scores
+
+    def save(self, path: Path):
+        arrays = {'method': np.array(self.method), 'dimension': np.array(self.dimension)}
+        for name in ('mean', 'components', 'scale'):
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        np.savez(path, **arrays)
+
+    def load(self, path: Path) -> bool:
+        """Recharge des paramètres appris ; False s'ils ne correspondent pas à la configuration"""
+        with np.load(path) as state:
+            if str(state['method']) != self.method:
+                return False
+            if self.uses_pca and state['components'].shape[0] != self.reduced_dim:
+                return False
+            self.dimension = int(state['dimension'])
+            self.mean = state['mean'] if 'mean' in state else None
+            self.components = state['components'] if 'components' in state else None
+            self.scale = state['scale'] if 'scale' in state else None
+        return True
@@ -0,0 +1,606 @@
+# -*- coding: utf-8 -*-
+"""
+Bases vectorielles interchangeables derrière search_documents
+- ChromaVectorStore : ChromaDB (HNSW + métadonnées SQLite)
+- NumpyVectorStore : produit scalaire exhaustif sur une matrice float32 mappée en mémoire
+"""
+
+import json
+import hashlib
+import logging
+import operator
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    from .vector_compression import VectorCompressor
+except ImportError:
+    from vector_compression import VectorCompressor
+
+logger = logging.getLogger(__name__)
+
+# (id, distance cosinus, texte, métadonnées)
+Hit = Tuple[str, float, str, Dict]
+
+
+# Clés indexées par listes de postings dans NumpyVectorStore (+ toutes les clés tag_* et src_*)
+PARTITION_KEYS = ('source', 'file_type')
+TAG_PREFIX = 'tag_'
+# Un booléen par source du chunk (chunks dédupliqués : toutes leurs sources, pas seulement la principale)
+SOURCE_PREFIX = 'src_'
+# Date du document (entier AAAAMMJJ), indexée en colonne pour les filtres d'intervalle
+DATE_KEY = 'doc_date'
+
+_COMPARISONS = {
+    '$eq': operator.eq, '$ne': operator.ne,
+    '$gt': operator.gt, '$gte': operator.ge,
+    '$lt': operator.lt, '$lte': operator.le,
+}
+
+
+def source_key(source: str) -> str:
+    """Clé de métadonnée d'une source (empreinte du nom : pas de collision ni de caractère interdit)"""
+    return SOURCE_PREFIX + hashlib.blake2b(source.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _matches_condition(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == '$in':
+            if value not in operand:
+                return False
+        elif op == '$nin':
+            if value in operand:
+                return False
+        elif value is None:
+            # Comme ChromaDB : une clé absente ne satisfait aucune comparaison
+            return False
+        elif not _COMPARISONS[op](value, operand):
+            return False
+    return True
+
+
+def matches_where(metadata: Optional[Dict], where: Optional[Dict]) -> bool:
+    """
+    Évalue un filtre au format ChromaDB sur des métadonnées
+
+    Supporte l'égalité, $eq/$ne/$gt/$gte/$lt/$lte, $in/$nin, $and et $or.
+    """
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif not _matches_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+def _conjuncts(where: Optional[Dict]) -> List[Dict]:
+    """Aplatit un filtre en conditions reliées par ET ({clé: condition} ou {'$or': ...})"""
+    if not where:
+        return []
+    conjuncts = []
+    for key, condition in where.items():
+        if key == '$and':
+            for sub in condition:
+                conjuncts.extend(_conjuncts(sub))
+        else:
+            conjuncts.append({key: condition})
+    return conjuncts
+
+
+class VectorStore:
+    """Interface commune des bases vectorielles"""
+
+    name = "base"
+    max_batch_size = 1000
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def upsert(self, ids: List[str], embeddings: List, documents: List[str], metadatas: List[Dict]):
+        raise NotImplementedError
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        """Remplace les métadonnées des chunks (les clés absentes sont retirées)"""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def ids_where(self, where: Dict) -> List[str]:
+        """Ids des chunks dont les métadonnées correspondent au filtre"""
+        raise NotImplementedError
+
+    def get_all(self) -> Tuple[List[str], List[str], List[Dict]]:
+        """(ids, textes, métadonnées) de tous les chunks"""
+        raise NotImplementedError
+
+    def query(self, embeddings: List, n_results: int, where: Optional[Dict] = None) -> List[List[Hit]]:
+        """Top-k par requête (plusieurs requêtes en un appel), restreint aux chunks filtrés"""
+        raise NotImplementedError
+
+    def reset(self):
+        """Vide la base"""
+        raise NotImplementedError
+
+    def persist(self):
+        """Écrit l'état sur disque si la base le nécessite"""
+
+    def fit_compression(self):
+        """Réapprend la compression des vecteurs si la base en utilise une"""
+
+    def get_stats(self) -> Dict:
+        return {'backend': self.name, 'chunks': self.count()}
+
+
+# ==========================================
+# CHROMADB
+# ==========================================
+
+class ChromaVectorStore(VectorStore):
+    """Base ChromaDB (espace cosinus)"""
+
+    name = "chroma"
+
+    def __init__(self, client, collection_name: str = "it_support_docs"):
+        self.client = client
+        self.collection_name = collection_name
+        self.max_batch_size = getattr(client, 'max_batch_size', 5461)
+        try:
+            self.collection = client.get_collection(collection_name)
+            logger.info("✅ Collection ChromaDB chargée")
+        except Exception:
+            self.collection = self._create()
+            logger.info("✅ Nouvelle collection ChromaDB créée")
+
+    def _create(self):
+        return self.client.create_collection(
+            name=self.collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        embeddings = np.asarray(embeddings, dtype=np.float32).tolist()
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update_metadata(self, ids, metadatas):
+        # update() et upsert() de ChromaDB fusionnent les métadonnées : les chunks sont réécrits
+        existing = self.collection.get(ids=ids, include=["embeddings", "documents"])
+        if not existing['ids']:
+            return
+        by_id = dict(zip(ids, metadatas))
+        self.collection.delete(ids=existing['ids'])
+        self.collection.add(
+            ids=existing['ids'],
+            embeddings=existing['embeddings'],
+            documents=existing['documents'],
+            metadatas=[by_id[chunk_id] for chunk_id in existing['ids']]
+        )
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def ids_where(self, where):
+        return self.collection.get(where=where, include=[])['ids']
+
+    def get_all(self):
+        existing = self.collection.get(include=["documents", "metadatas"])
+        return existing['ids'], existing['documents'], existing['metadatas']
+
+    def query(self, embeddings, n_results, where=None):
+        embeddings = np.asarray(embeddings, dtype=np.float32).tolist()
+        # Filtre appliqué par ChromaDB avant la recherche HNSW
+        if where:
+            results = self.collection.query(query_embeddings=embeddings, n_results=n_results, where=where)
+        else:
+            results = self.collection.query(query_embeddings=embeddings, n_results=n_results)
+        hits = []
+        for q in range(len(embeddings)):
+            ids = results['ids'][q] if results['ids'] else []
+            hits.append([
+                (
+                    ids[i],
+                    results['distances'][q][i] if results['distances'] else 0,
+                    results['documents'][q][i],
+                    results['metadatas'][q][i] if results['metadatas'] else {}
+                )
+                for i in range(len(ids))
+            ])
+        return hits
+
+    def reset(self):
+        self.client.delete_collection(self.collection_name)
+        self.collection = self._create()
+
+
+# ==========================================
+# NUMPY (EXHAUSTIF)
+# ==========================================
+
+class NumpyVectorStore(VectorStore):
+    """
+    Recherche exhaustive : une matrice float32 contiguë d'embeddings normalisés
+
+    - vecteurs dans un fichier mappé en mémoire (vectors.f32), capacité doublée au besoin
+    - ids, textes et métadonnées dans des listes parallèles (index.json)
+    - top-k par argpartition, plusieurs requêtes en un produit matriciel
+    - les suppressions laissent des trous réutilisés par les insertions suivantes
+    - filtres : listes de postings par source, type et tag, colonne de dates ;
+      seules les lignes retenues sont scorées
+    - compression optionnelle (int8, pca, pca_int8) : les codes compacts restent en
+      mémoire pour la présélection, la matrice float32 n'est lue que pour rescorer
+      les rescore_factor × k meilleurs candidats
+    """
+
+    name = "numpy"
+    max_batch_size = 4096
+    _NO_DATE = np.iinfo(np.int64).min
+    # En dessous, pas assez de vecteurs pour apprendre la compression
+    MIN_TRAIN_VECTORS = 256
+
+    def __init__(self, directory: str, dimension: int = 384, initial_capacity: int = 1024,
+                 compression: Optional[str] = None, reduced_dim: int = 128, rescore_factor: int = 4):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dimension = dimension
+        self._vectors_path = self.directory / "vectors.f32"
+        self._index_path = self.directory / "index.json"
+        self._compression_path = self.directory / "compression.npz"
+        self._lock = threading.RLock()
+        self._compressor = VectorCompressor(compression, reduced_dim) if compression else None
+        self._codes: Optional[np.ndarray] = None
+        self.rescore_factor = rescore_factor
+
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict]] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._partitions: Dict[str, Dict[Any, Set[int]]] = defaultdict(lambda: defaultdict(set))
+
+        if self._index_path.exists() and self._vectors_path.exists():
+            self._load()
+        else:
+            self._alive = np.zeros(initial_capacity, dtype=bool)
+            self._dates = np.full(initial_capacity, self._NO_DATE, dtype=np.int64)
+            self._matrix = self._open_matrix(initial_capacity, mode='w+')
+
+    def _open_matrix(self, capacity: int, mode: str) -> np.memmap:
+        return np.memmap(self._vectors_path, dtype=np.float32, mode=mode, shape=(capacity, self.dimension))
+
+    def _load(self):
+        with open(self._index_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        self.dimension = state['dimension']
+        self._ids = state['ids']
+        self._documents = state['documents']
+        self._metadatas = state['metadatas']
+        capacity = state['capacity']
+        self._matrix = self._open_matrix(capacity, mode='r+')
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._dates = np.full(capacity, self._NO_DATE, dtype=np.int64)
+        for row, chunk_id in enumerate(self._ids):
+            if chunk_id is None:
+                self._free.append(row)
+            else:
+                self._row_by_id[chunk_id] = row
+                self._alive[row] = True
+                self._index_row(row)
+        logger.info(f"✅ Index NumPy chargé: {len(self._row_by_id)} chunks ({self.directory})")
+
+        if self._compressor is not None:
+            if self._compression_path.exists() and self._compressor.load(self._compression_path):
+                self._encode_all()
+            else:
+                self.fit_compression()
+
+    def persist(self):
+        with self._lock:
+            self._matrix.flush()
+            tmp_path = self._index_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'dimension': self.dimension,
+                    'capacity': int(self._matrix.shape[0]),
+                    'ids': self._ids,
+                    'documents': self._documents,
+                    'metadatas': self._metadatas,
+                }, f, ensure_ascii=False)
+            tmp_path.replace(self._index_path)
+            if self.compressed:
+                self._compressor.save(self._compression_path)
+
+    def _grow(self, needed: int):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        rows = np.array(self._matrix[:len(self._ids)])
+        # Libérer le mapping avant de recréer le fichier (obligatoire sous Windows)
+        self._matrix.flush()
+        del self._matrix
+        self._matrix = self._open_matrix(new_capacity, mode='w+')
+        self._matrix[:len(rows)] = rows
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._alive = alive
+        dates = np.full(new_capacity, self._NO_DATE, dtype=np.int64)
+        dates[:len(self._dates)] = self._dates
+        self._dates = dates
+        if self._codes is not None:
+            codes = np.zeros((new_capacity, self._codes.shape[1]), dtype=self._codes.dtype)
+            codes[:len(self._codes)] = self._codes
+            self._codes = codes
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    # ==========================================
+    # COMPRESSION
+    # ==========================================
+
+    @property
+    def compressed(self) -> bool:
+        return self._codes is not None
+
+    def _encode_all(self, block_size: int = 16384):
+        """(Re)calcule les codes de toutes les lignes, par blocs"""
+        capacity = self._matrix.shape[0]
+        self._codes = np.zeros((capacity, self._compressor.code_dim), dtype=self._compressor.code_dtype)
+        for start in range(0, len(self._ids), block_size):
+            end = min(start + block_size, len(self._ids))
+            self._codes[start:end] = self._compressor.encode(self._matrix[start:end])
+
+    def fit_compression(self):
+        """Apprend la compression sur le corpus actuel (à relancer après une réindexation complète)"""
+        if self._compressor is None:
+            return
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:len(self._ids)])
+            if len(rows) < self.MIN_TRAIN_VECTORS:
+                logger.info(f"🗜️ Compression différée: {len(rows)} vecteurs (< {self.MIN_TRAIN_VECTORS})")
+                self._codes = None
+                return
+            self._compressor.fit(self._matrix[rows])
+            self._encode_all()
+
+    def get_stats(self) -> Dict:
+        """Taille de l'index, dont les octets scorés à chaque requête (codes ou matrice float32)"""
+        n = len(self._row_by_id)
+        full = n * self.dimension * 4
+        return {
+            'backend': self.name,
+            'chunks': n,
+            'compression': self._compressor.method if self.compressed else None,
+            'float32_bytes': full,
+            'search_bytes': n * self._compressor.bytes_per_vector() if self.compressed else full,
+        }
+
+    # ==========================================
+    # INDEX DES MÉTADONNÉES
+    # ==========================================
+
+    @staticmethod
+    def _is_partitioned(key: str) -> bool:
+        return key in PARTITION_KEYS or key.startswith(TAG_PREFIX) or key.startswith(SOURCE_PREFIX)
+
+    def _index_row(self, row: int):
+        for key, value in self._metadatas[row].items():
+            if self._is_partitioned(key):
+                self._partitions[key][value].add(row)
+            elif key == DATE_KEY and isinstance(value, int):
+                self._dates[row] = value
+
+    def _unindex_row(self, row: int):
+        for key, value in self._metadatas[row].items():
+            if self._is_partitioned(key):
+                rows = self._partitions[key].get(value)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows:
+                        del self._partitions[key][value]
+        self._dates[row] = self._NO_DATE
+
+    def _partition_rows(self, key: str, condition: Any) -> Optional[Set[int]]:
+        """Lignes d'une égalité ou d'un $in sur une clé partitionnée (None si non applicable)"""
+        if not self._is_partitioned(key):
+            return None
+        if not isinstance(condition, dict):
+            values = [condition]
+        elif set(condition) == {'$in'}:
+            values = condition['$in']
+        elif set(condition) == {'$eq'}:
+            values = [condition['$eq']]
+        else:
+            return None
+        rows = set()
+        for value in values:
+            rows |= self._partitions[key].get(value, set())
+        return rows
+
+    def _candidate_mask(self, where: Dict, n_rows: int) -> np.ndarray:
+        """
+        Lignes vivantes satisfaisant le filtre
+
+        Égalités et $in sur les clés partitionnées (seules ou reliées par $or) : union des
+        listes de postings ; intervalles sur la date : masque vectorisé ; le reste est évalué
+        ligne à ligne sur les seules lignes restantes.
+        """
+        mask = self._alive[:n_rows].copy()
+        residual = []
+        for conjunct in _conjuncts(where):
+            (key, condition), = conjunct.items()
+            if key == '$or':
+                subs = [self._partition_rows(*next(iter(sub.items()))) if len(sub) == 1 else None
+                        for sub in condition]
+                rows = set().union(*subs) if all(sub is not None for sub in subs) else None
+            else:
+                rows = self._partition_rows(key, condition)
+            if rows is not None:
+                partition = np.zeros(n_rows, dtype=bool)
+                if rows:
+                    partition[list(rows)] = True
+                mask &= partition
+                continue
+            if (key == DATE_KEY and isinstance(condition, dict)
+                    and set(condition) <= {'$gt', '$gte', '$lt', '$lte', '$eq'}):
+                dates = self._dates[:n_rows]
+                in_range = dates != self._NO_DATE
+                for op, operand in condition.items():
+                    in_range &= _COMPARISONS[op](dates, operand)
+                mask &= in_range
+                continue
+            residual.append(conjunct)
+
+        for row in np.flatnonzero(mask) if residual else ():
+            if not all(matches_where(self._metadatas[row], c) for c in residual):
+                mask[row] = False
+        return mask
+
+    # ==========================================
+    # LECTURE / ÉCRITURE
+    # ==========================================
+
+    def count(self) -> int:
+        return len(self._row_by_id)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        vectors = self._normalize(embeddings)
+        with self._lock:
+            rows = []
+            for chunk_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                row = self._row_by_id.get(chunk_id)
+                if row is None:
+                    if self._free:
+                        row = self._free.pop()
+                    else:
+                        row = len(self._ids)
+                        self._grow(row + 1)
+                        self._ids.append(None)
+                        self._documents.append(None)
+                        self._metadatas.append(None)
+                    self._row_by_id[chunk_id] = row
+                else:
+                    self._unindex_row(row)
+                self._matrix[row] = vector
+                self._ids[row] = chunk_id
+                self._documents[row] = document
+                self._metadatas[row] = dict(metadata)
+                self._alive[row] = True
+                self._index_row(row)
+                rows.append(row)
+            if self.compressed and rows:
+                # Paramètres de compression existants (recalibrés par fit_compression)
+                self._codes[rows] = self._compressor.encode(vectors[:len(rows)])
+
+    def update_metadata(self, ids, metadatas):
+        with self._lock:
+            for chunk_id, metadata in zip(ids, metadatas):
+                row = self._row_by_id.get(chunk_id)
+                if row is not None:
+                    self._unindex_row(row)
+                    self._metadatas[row] = dict(metadata)
+                    self._index_row(row)
+
+    def delete(self, ids):
+        with self._lock:
+            for chunk_id in ids:
+                row = self._row_by_id.pop(chunk_id, None)
+                if row is None:
+                    continue
+                self._unindex_row(row)
+                self._ids[row] = self._documents[row] = self._metadatas[row] = None
+                self._alive[row] = False
+                self._free.append(row)
+
+    def ids_where(self, where):
+        with self._lock:
+            mask = self._candidate_mask(where, len(self._ids))
+            return [self._ids[row] for row in np.flatnonzero(mask)]
+
+    def get_all(self):
+        with self._lock:
+            rows = [row for row, chunk_id in enumerate(self._ids) if chunk_id is not None]
+            return ([self._ids[r] for r in rows], [self._documents[r] for r in rows],
+                    [self._metadatas[r] for r in rows])
+
+    def _coarse_scores(self, queries: np.ndarray, rows: Optional[np.ndarray], n_rows: int) -> np.ndarray:
+        if self.compressed:
+            codes = self._codes[:n_rows] if rows is None else self._codes[rows]
+            return self._compressor.score(queries, codes)
+        matrix = self._matrix[:n_rows] if rows is None else self._matrix[rows]
+        return queries @ matrix.T
+
+    def query(self, embeddings, n_results, where=None):
+        queries = self._normalize(embeddings)
+        with self._lock:
+            n_rows = len(self._ids)
+            if not self._row_by_id:
+                return [[] for _ in range(len(queries))]
+
+            if where:
+                mask = self._candidate_mask(where, n_rows)
+                rows = np.flatnonzero(mask)
+                if not len(rows):
+                    return [[] for _ in range(len(queries))]
+                if len(rows) * 2 >= n_rows:
+                    # Filtre peu sélectif : balayage complet masqué
+                    rows = None
+            else:
+                mask, rows = self._alive[:n_rows], None
+
+            scores = self._coarse_scores(queries, rows, n_rows)
+            if rows is None:
+                scores[:, ~mask] = -np.inf
+            n_valid = int(mask.sum())
+            k = min(n_results, n_valid)
+            # Scores compressés approchés : présélection élargie, rescorée en float32
+            shortlist = min(k * self.rescore_factor, n_valid) if self.compressed else k
+
+            hits = []
+            for q in range(len(queries)):
+                top = np.argpartition(-scores[q], shortlist - 1)[:shortlist]
+                top_rows = top if rows is None else rows[top]
+                if self.compressed:
+                    top_rows = np.sort(top_rows)
+                    top_scores = self._matrix[top_rows] @ queries[q]
+                else:
+                    top_scores = scores[q, top]
+                order = np.argsort(-top_scores)[:k]
+                hits.append([
+                    (self._ids[r], float(1.0 - score), self._documents[r], self._metadatas[r])
+                    for r, score in zip(top_rows[order], top_scores[order])
+                ])
+            return hits
+
+    def reset(self):
+        with self._lock:
+            capacity = self._matrix.shape[0]
+            self._ids, self._documents, self._metadatas = [], [], []
+            self._row_by_id.clear()
+            self._free.clear()
+            self._partitions.clear()
+            self._alive = np.zeros(capacity, dtype=bool)
+            self._dates = np.full(capacity, self._NO_DATE, dtype=np.int64)
+            self.persist()
@@ -0,0 +1,104 @@
+"""
+Analyse des décisions du routeur de modèles (logs/chat_*.jsonl)
+Par route : volume, latence LLM p50/p95, coût, taux de refus ; par raison de routage ;
+et effet d'un autre seuil de confiance (ROUTER_CONFIDENT_DISTANCE) sur la part de trafic rapide
+"""
+
+import sys
+import json
+from pathlib import Path
+from datetime import datetime
+from collections import defaultdict
+import logging
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from scripts.calibrate_relevance import is_refusal
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def load_routed(logs_dir: str) -> list:
+    records = []
+    for log_file in sorted(Path(logs_dir).glob("chat_*.jsonl")):
+        with open(log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    # Requêtes coalescées : l'appel LLM est compté une fois, pour la requête d'origine
+                    if record.get('routing') and not record.get('coalesced'):
+                        records.append(record)
+    return records
+
+
+def summarize(records: list) -> dict:
+    latencies = [r['routing']['llm_latency'] for r in records]
+    costs = [r['routing']['cost_usd'] or 0.0 for r in records]
+    return {
+        'requests': len(records),
+        'llm_p50_seconds': round(float(np.percentile(latencies, 50)), 3),
+        'llm_p95_seconds': round(float(np.percentile(latencies, 95)), 3),
+        'cost_usd': round(sum(costs), 4),
+        'cost_per_1000_usd': round(1000 * sum(costs) / len(records), 4),
+        'refusal_rate': round(sum(is_refusal(r['answer']) for r in records) / len(records), 3),
+    }
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analyse du routage des modèles")
+    parser.add_argument("--logs-dir", default="./logs", help="Dossier des logs de conversation")
+    parser.add_argument("--thresholds", default="0.25,0.30,0.35,0.40,0.45",
+                        help="Seuils de confiance à simuler")
+    parser.add_argument("--output", default="./reports/routing_analysis.json", help="Rapport JSON")
+
+    args = parser.parse_args()
+    records = load_routed(args.logs_dir)
+    if not records:
+        logger.error("❌ Aucune conversation routée dans les logs")
+        sys.exit(1)
+
+    by_route, by_reason = defaultdict(list), defaultdict(list)
+    for record in records:
+        by_route[record['routing']['route']].append(record)
+        for reason in record['routing']['reasons']:
+            by_reason[reason].append(record)
+
+    routes = {route: summarize(rs) for route, rs in sorted(by_route.items())}
+    for route, stats in routes.items():
+        logger.info(f"🔀 {route:5s}: {stats['requests']} requêtes, p50 {stats['llm_p50_seconds']}s, "
+                    f"p95 {stats['llm_p95_seconds']}s, {stats['cost_per_1000_usd']} $/1000, "
+                    f"refus {stats['refusal_rate']:.1%}")
+
+    # Part de requêtes sous chaque seuil (autres conditions inchangées)
+    distances = np.array([r['routing']['signals']['top_distance'] for r in records
+                          if r['routing']['signals']['top_distance'] is not None])
+    simulation = {
+        threshold: round(float(np.mean(distances <= float(threshold))), 3) if len(distances) else None
+        for threshold in args.thresholds.split(",")
+    }
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'requests': len(records),
+        'routes': routes,
+        'reasons': {reason: len(rs) for reason, rs in sorted(by_reason.items(), key=lambda item: -len(item[1]))},
+        'confident_share_by_threshold': simulation,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Rapport écrit dans {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark des stratégies de découpage
+Compare le découpage en mots (historique) et le découpage en tokens du modèle :
+nombre de chunks, tokens réellement encodés, temps d'indexation et rappel de recherche
+"""
+
+import re
+import sys
+import json
+import time
+import random
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from backend.document_processor import DocumentProcessor, chunk_text, chunk_text_tokens
+from backend.embedding_batcher import LengthBucketedEncoder
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', text.lower()).strip()
+
+
+def sample_queries(texts: list, n: int, seed: int) -> list:
+    """
+    Phrases du corpus utilisées comme requêtes (rappel auto-supervisé)
+
+    La cible d'une requête est la fenêtre de 6 mots au centre de la phrase :
+    un chunk est pertinent s'il contient cette fenêtre.
+    """
+    sentences = []
+    for text in texts:
+        for sentence in re.split(r'(?<=[.!?])\s+|\n+', text):
+            words = sentence.split()
+            if 8 <= len(words) <= 40:
+                middle = len(words) // 2
+                sentences.append((sentence.strip(), _normalize(' '.join(words[middle - 3:middle + 3]))))
+    rng = random.Random(seed)
+    return rng.sample(sentences, min(n, len(sentences)))
+
+
+def evaluate(name: str, chunker, texts: list, model, queries: list, ks=(1, 3, 5)) -> dict:
+    """Découpe, encode et mesure le rappel d'une stratégie"""
+    start = time.perf_counter()
+    chunks = [chunk for text in texts for chunk in chunker(text)]
+    chunk_time = time.perf_counter() - start
+
+    tokenizer = model.tokenizer
+    lengths = [len(ids) for ids in tokenizer(chunks, add_special_tokens=True)['input_ids']]
+    max_len = model.max_seq_length
+    total_tokens = sum(lengths)
+    visible_tokens = sum(min(length, max_len) for length in lengths)
+
+    encoder = LengthBucketedEncoder(model)
+    start = time.perf_counter()
+    embeddings = encoder.encode(chunks)
+    encode_time = time.perf_counter() - start
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    query_emb = model.encode([q for q, _ in queries], convert_to_numpy=True, show_progress_bar=False)
+    query_emb = query_emb / np.linalg.norm(query_emb, axis=1, keepdims=True)
+    ranking = np.argsort(-query_emb @ embeddings.T, axis=1)
+
+    normalized_chunks = [_normalize(chunk) for chunk in chunks]
+    recall = {}
+    for k in ks:
+        hits = sum(
+            any(target in normalized_chunks[idx] for idx in ranking[qi, :k])
+            for qi, (_, target) in enumerate(queries)
+        )
+        recall[f"recall@{k}"] = round(hits / len(queries), 3) if queries else 0.0
+
+    result = {
+        'strategy': name,
+        'chunks': len(chunks),
+        'mean_tokens_per_chunk': round(total_tokens / len(chunks), 1) if chunks else 0,
+        'tokens_truncated_ratio': round(1 - visible_tokens / total_tokens, 3) if total_tokens else 0,
+        'chunk_seconds': round(chunk_time, 3),
+        'encode_seconds': round(encode_time, 3),
+        'stored_chars': sum(len(chunk) for chunk in chunks),
+        **recall,
+    }
+    logger.info(
+        f"📊 {name:8s}: {result['chunks']} chunks, {result['mean_tokens_per_chunk']} tokens/chunk, "
+        f"{result['tokens_truncated_ratio']:.0%} tronqués, indexation "
+        f"{result['chunk_seconds'] + result['encode_seconds']:.2f}s, "
+        + ", ".join(f"{k}={v}" for k, v in recall.items())
+    )
+    return result
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark des stratégies de découpage")
+    parser.add_argument("--documents-dir", default="./documents", help="Corpus")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Modèle d'embeddings")
+    parser.add_argument("--queries", type=int, default=200, help="Nombre de requêtes échantillonnées")
+    parser.add_argument("--seed", type=int, default=42, help="Graine d'échantillonnage")
+    parser.add_argument("--overlap-tokens", type=int, default=32, help="Chevauchement (tokens)")
+    parser.add_argument("--output", default="./benchmarks/chunking_results.json",
+                        help="Fichier JSON de résultats")
+
+    args = parser.parse_args()
+
+    processor = DocumentProcessor()
+    texts = [r['text'] for r in processor.process_directory(args.documents_dir)
+             if r['success'] and len(r['text']) >= 50]
+    if not texts:
+        logger.error("❌ Aucun document exploitable")
+        sys.exit(1)
+
+    model = SentenceTransformer(args.model)
+    queries = sample_queries(texts, args.queries, args.seed)
+    logger.info(f"📚 {len(texts)} documents, {len(queries)} requêtes, max_seq_length={model.max_seq_length}")
+
+    strategies = {
+        'words': chunk_text,
+        'tokens': lambda text: chunk_text_tokens(
+            text, model.tokenizer, max_tokens=model.max_seq_length, overlap_tokens=args.overlap_tokens
+        ),
+    }
+    results = [evaluate(name, chunker, texts, model, queries) for name, chunker in strategies.items()]
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'model': args.model,
+        'max_seq_length': model.max_seq_length,
+        'documents': len(texts),
+        'queries': len(queries),
+        'seed': args.seed,
+        'results': results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Résultats écrits dans {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark des backends d'embeddings : PyTorch, ONNX, ONNX int8
+Démarrage à froid, mémoire résidente et débit d'encodage, chaque backend
+dans un processus séparé (imports et RSS isolés)
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import tempfile
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+QUERIES = [
+    "Comment réinitialiser mon mot de passe ?",
+    "Mon imprimante ne fonctionne pas",
+    "Je n'arrive pas à me connecter à Citrix",
+    "How do I access the VPN?",
+    "Erreur 0x80070005 lors de l'installation",
+    "Outlook ne synchronise plus mes mails",
+    "Comment demander un nouveau badge ?",
+    "The scanner on floor 3 is offline",
+]
+
+
+def rss_mb() -> float:
+    """Mémoire résidente du processus (pic si psutil est absent)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    except ImportError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(args):
+    """Mesures d'un backend (processus enfant), résultat JSON sur stdout"""
+    start = time.perf_counter()
+    from backend.embedding_backend import load_embedding_model
+    model = load_embedding_model(args.child, args.model, args.onnx_dir,
+                                 quantized=args.quantized, threads=args.threads)
+    model.encode(QUERIES[:1], convert_to_numpy=True, show_progress_bar=False)
+    cold_start = time.perf_counter() - start
+
+    # Chemin requête : une phrase à la fois
+    start = time.perf_counter()
+    for i in range(args.repeat):
+        model.encode([QUERIES[i % len(QUERIES)]], convert_to_numpy=True, show_progress_bar=False)
+    query_time = time.perf_counter() - start
+
+    # Indexation : chunks par lots
+    chunks = [" ".join(QUERIES[(i + j) % len(QUERIES)] for j in range(12)) for i in range(256)]
+    start = time.perf_counter()
+    model.encode(chunks, batch_size=32, convert_to_numpy=True, show_progress_bar=False)
+    chunk_time = time.perf_counter() - start
+
+    vectors = model.encode(QUERIES, convert_to_numpy=True, show_progress_bar=False)
+    np.save(args.vectors_out, np.asarray(vectors, dtype=np.float32))
+    print(json.dumps({
+        'cold_start_seconds': round(cold_start, 2),
+        'rss_mb': round(rss_mb(), 1),
+        'query_encodes_per_second': round(args.repeat / query_time, 1),
+        'chunks_per_second': round(len(chunks) / chunk_time, 1),
+    }))
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark des backends d'embeddings")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Modèle d'embeddings")
+    parser.add_argument("--onnx-dir", default="./models/all-MiniLM-L6-v2-onnx",
+                        help="Dossier produit par export_onnx_model.py")
+    parser.add_argument("--threads", type=int, default=0, help="Threads d'encodage (0 = défaut)")
+    parser.add_argument("--repeat", type=int, default=200, help="Encodages de requêtes mesurés")
+    parser.add_argument("--output", default="./benchmarks/embedding_backends.json",
+                        help="Fichier JSON de résultats")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--quantized", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--vectors-out", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    variants = [("torch", False), ("onnx", False), ("onnx", True)]
+    results = []
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, quantized in variants:
+            name = "onnx-int8" if quantized else backend
+            vectors_path = os.path.join(tmp, f"{name}.npy")
+            command = [sys.executable, __file__, "--child", backend, "--model", args.model,
+                       "--onnx-dir", args.onnx_dir, "--threads", str(args.threads),
+                       "--repeat", str(args.repeat), "--vectors-out", vectors_path]
+            if quantized:
+                command.append("--quantized")
+            process = subprocess.run(command, capture_output=True, text=True)
+            if process.returncode != 0:
+                logger.error(f"❌ {name}: {process.stderr.strip().splitlines()[-1] if process.stderr else 'échec'}")
+                continue
+
+            result = {'backend': name, **json.loads(process.stdout.strip().splitlines()[-1])}
+            vectors = np.load(vectors_path)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            if reference is None and backend == "torch":
+                reference = vectors
+            if reference is not None:
+                result['min_cosine_vs_torch'] = round(float(np.min(np.sum(reference * vectors, axis=1))), 5)
+            results.append(result)
+            logger.info(
+                f"⏱️  {name:9s}: démarrage {result['cold_start_seconds']}s, RSS {result['rss_mb']} Mo, "
+                f"{result['query_encodes_per_second']} requêtes/s, {result['chunks_per_second']} chunks/s"
+            )
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'model': args.model,
+        'threads': args.threads,
+        'results': results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Résultats écrits dans {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark de l'encodage des chunks
+Compare l'encodage par document (historique) et l'encodage inter-documents trié par longueur
+"""
+
+import sys
+import json
+import time
+import platform
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from backend.document_processor import DocumentProcessor, chunk_text
+from backend.embedding_batcher import LengthBucketedEncoder, set_encoder_threads
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def load_corpus(documents_dir: str) -> dict:
+    """Chunks par document, découpés comme à l'indexation"""
+    processor = DocumentProcessor()
+    corpus = {}
+    for result in processor.process_directory(documents_dir):
+        if result['success'] and len(result['text']) >= 50:
+            corpus[Path(result['file_path']).name] = chunk_text(result['text'])
+    return corpus
+
+
+def bench_per_document(model, corpus: dict, batch_size: int) -> tuple:
+    """Un appel encode par document (comportement historique)"""
+    start = time.perf_counter()
+    outputs = [model.encode(chunks, batch_size=batch_size, show_progress_bar=False)
+               for chunks in corpus.values()]
+    return time.perf_counter() - start, np.vstack(outputs)
+
+
+def bench_cross_document(model, corpus: dict, batch_size: int, window: int) -> tuple:
+    """Fenêtres de chunks regroupés entre documents, lots triés par longueur"""
+    encoder = LengthBucketedEncoder(model, batch_size=batch_size)
+    texts = [chunk for chunks in corpus.values() for chunk in chunks]
+    start = time.perf_counter()
+    outputs = [encoder.encode(texts[i:i + window]) for i in range(0, len(texts), window)]
+    return time.perf_counter() - start, np.vstack(outputs), encoder.get_stats()
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de l'encodage des chunks")
+    parser.add_argument("--documents-dir", default="./documents", help="Corpus à encoder")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Modèle d'embeddings")
+    parser.add_argument("--batch-sizes", default="16,32,64", help="Tailles de lot testées")
+    parser.add_argument("--threads", default="0", help="Nombres de threads testés (0 = défaut)")
+    parser.add_argument("--window", type=int, default=512, help="Fenêtre inter-documents")
+    parser.add_argument("--repeat", type=int, default=3, help="Répétitions (meilleur temps)")
+    parser.add_argument("--output", default="./benchmarks/embedding_results.json",
+                        help="Fichier JSON de résultats")
+
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.documents_dir)
+    n_chunks = sum(len(chunks) for chunks in corpus.values())
+    if not n_chunks:
+        logger.error("❌ Aucun chunk à encoder")
+        sys.exit(1)
+    logger.info(f"📚 {len(corpus)} documents, {n_chunks} chunks")
+
+    model = SentenceTransformer(args.model)
+    model.encode(["échauffement"], show_progress_bar=False)
+
+    results = []
+    for threads in [int(t) for t in args.threads.split(',')]:
+        set_encoder_threads(threads)
+        for batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+            per_doc_time, per_doc_emb = min(
+                (bench_per_document(model, corpus, batch_size) for _ in range(args.repeat)),
+                key=lambda r: r[0]
+            )
+            cross_time, cross_emb, stats = min(
+                (bench_cross_document(model, corpus, batch_size, args.window) for _ in range(args.repeat)),
+                key=lambda r: r[0]
+            )
+            result = {
+                'threads': threads,
+                'batch_size': batch_size,
+                'per_document_chunks_per_second': round(n_chunks / per_doc_time, 1),
+                'cross_document_chunks_per_second': round(n_chunks / cross_time, 1),
+                'speedup': round(per_doc_time / cross_time, 2),
+                'padding_efficiency': stats['padding_efficiency'],
+                'max_abs_diff': float(np.abs(per_doc_emb - cross_emb).max()),
+            }
+            results.append(result)
+            logger.info(
+                f"⏱️  threads={threads or 'défaut'} batch={batch_size}: "
+                f"par document {result['per_document_chunks_per_second']} chunks/s, "
+                f"inter-documents {result['cross_document_chunks_per_second']} chunks/s "
+                f"(x{result['speedup']}, padding utile {result['padding_efficiency']:.0%})"
+            )
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'model': args.model,
+        'documents': len(corpus),
+        'chunks': n_chunks,
+        'window': args.window,
+        'results': results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Résultats écrits dans {output}")
+
+
+if __name__ == "__main__":
+    main()
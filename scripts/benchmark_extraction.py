@@ -0,0 +1,357 @@
+"""
+Benchmark du débit d'extraction de DocumentProcessor
+Génère un corpus synthétique reproductible (hors ligne) et mesure chaque extract_from_*
+"""
+
+import sys
+import json
+import time
+import random
+import platform
+import statistics
+import subprocess
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+import logging
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from backend.document_processor import DocumentProcessor
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Méthodes d'extraction à mesurer, par extension
+METHODS_BY_EXTENSION = {
+    '.pdf': ['extract_from_pdf_pymupdf', 'extract_from_pdf_pdfplumber'],
+    '.docx': ['extract_from_word'],
+    '.xlsx': ['extract_from_excel'],
+    '.csv': ['extract_from_csv'],
+    '.pptx': ['extract_from_powerpoint'],
+    '.txt': ['extract_from_txt'],
+    '.png': ['extract_from_image'],
+}
+
+# Tailles du corpus : (nom, nombre d'unités) - pages, lignes, slides...
+CORPUS_SIZES = {
+    'pdf': [('small', 5), ('medium', 40), ('large', 150)],
+    'docx': [('small', 20), ('medium', 200), ('large', 1000)],
+    'xlsx': [('small', 200), ('medium', 2000), ('large', 20000)],
+    'csv': [('small', 200), ('medium', 2000), ('large', 20000)],
+    'pptx': [('small', 5), ('medium', 30), ('large', 100)],
+    'txt': [('small', 50), ('medium', 500), ('large', 5000)],
+    'png': [('small', 1)],
+}
+
+VOCABULAIRE = (
+    "mot de passe réinitialiser imprimante réseau VPN Citrix Cerner poste "
+    "utilisateur compte session navigateur messagerie Outlook ticket "
+    "application serveur connexion accès badge téléphone extension support "
+    "procédure étape redémarrer vérifier configuration sécurité"
+).split()
+
+
+def _rss_peak_mb():
+    """RSS maximal du processus courant (Mo), None si indisponible"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux: Ko, macOS: octets
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+        except ImportError:
+            return None
+
+
+class SyntheticCorpus:
+    """Générateur de corpus multi-formats déterministe"""
+
+    def __init__(self, output_dir: Path, seed: int = 42):
+        self.output_dir = Path(output_dir)
+        self.seed = seed
+
+    def _rng(self, name: str) -> random.Random:
+        # Un générateur par fichier : ajouter un format ne change pas les autres
+        return random.Random(f"{self.seed}-{name}")
+
+    def _sentence(self, rng: random.Random, words: int = 12) -> str:
+        return " ".join(rng.choice(VOCABULAIRE) for _ in range(words)).capitalize() + "."
+
+    def _table_rows(self, rng: random.Random, rows: int):
+        header = ["Ticket", "Application", "Priorité", "Poste"]
+        body = [
+            [f"REQ-{rng.randint(1000, 9999)}", rng.choice(VOCABULAIRE),
+             rng.choice(["Haute", "Moyenne", "Basse"]), str(rng.randint(1000, 9999))]
+            for _ in range(rows)
+        ]
+        return [header] + body
+
+    def generate(self) -> list:
+        """Génère le corpus complet et retourne le manifeste"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        manifest = []
+        generators = {
+            'pdf': self._make_pdf, 'docx': self._make_docx, 'xlsx': self._make_xlsx,
+            'csv': self._make_csv, 'pptx': self._make_pptx, 'txt': self._make_txt,
+            'png': self._make_png,
+        }
+        for fmt, sizes in CORPUS_SIZES.items():
+            for size_name, units in sizes:
+                path = self.output_dir / f"synthetic_{size_name}.{fmt}"
+                unit_name = generators[fmt](path, units, self._rng(path.name))
+                manifest.append({
+                    'file': path.name,
+                    'format': fmt,
+                    'size': size_name,
+                    'units': units,
+                    'unit_name': unit_name,
+                    'bytes': path.stat().st_size,
+                })
+                logger.info(f"📄 {path.name}: {units} {unit_name}, {path.stat().st_size / 1024:.0f} Ko")
+        return manifest
+
+    def _make_pdf(self, path: Path, pages: int, rng: random.Random) -> str:
+        import fitz
+        doc = fitz.open()
+        for _ in range(pages):
+            page = doc.new_page()
+            y = 60
+            for _ in range(20):
+                page.insert_text((50, y), self._sentence(rng, 10), fontsize=9)
+                y += 14
+            # Tableau avec bordures (détectable par pdfplumber)
+            col_width, row_height = 120, 16
+            for r, row in enumerate(self._table_rows(rng, 10)):
+                for c, cell in enumerate(row):
+                    rect = fitz.Rect(50 + c * col_width, y + r * row_height,
+                                     50 + (c + 1) * col_width, y + (r + 1) * row_height)
+                    page.draw_rect(rect, width=0.5)
+                    page.insert_text((rect.x0 + 3, rect.y1 - 4), cell, fontsize=8)
+        doc.set_metadata({})
+        doc.save(str(path), no_new_id=True)
+        doc.close()
+        return 'pages'
+
+    def _make_docx(self, path: Path, paragraphs: int, rng: random.Random) -> str:
+        from docx import Document
+        doc = Document()
+        for i in range(paragraphs):
+            doc.add_paragraph(" ".join(self._sentence(rng) for _ in range(3)))
+            if i % 20 == 19:
+                rows = self._table_rows(rng, 8)
+                table = doc.add_table(rows=len(rows), cols=len(rows[0]))
+                for r, row in enumerate(rows):
+                    for c, cell in enumerate(row):
+                        table.cell(r, c).text = cell
+        doc.save(str(path))
+        return 'paragraphs'
+
+    def _make_xlsx(self, path: Path, rows: int, rng: random.Random) -> str:
+        import openpyxl
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Requetes"
+        for row in self._table_rows(rng, rows):
+            ws.append(row)
+        wb.save(str(path))
+        return 'rows'
+
+    def _make_csv(self, path: Path, rows: int, rng: random.Random) -> str:
+        import csv
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerows(self._table_rows(rng, rows))
+        return 'rows'
+
+    def _make_pptx(self, path: Path, slides: int, rng: random.Random) -> str:
+        from pptx import Presentation
+        from pptx.util import Inches
+        prs = Presentation()
+        layout = prs.slide_layouts[1]
+        for i in range(slides):
+            slide = prs.slides.add_slide(layout)
+            slide.shapes.title.text = f"Procédure {i + 1}"
+            slide.placeholders[1].text = "\n".join(self._sentence(rng) for _ in range(5))
+            box = slide.shapes.add_textbox(Inches(1), Inches(6), Inches(8), Inches(1))
+            box.text_frame.text = self._sentence(rng, 8)
+        prs.save(str(path))
+        return 'slides'
+
+    def _make_txt(self, path: Path, lines: int, rng: random.Random) -> str:
+        with open(path, 'w', encoding='utf-8') as f:
+            for _ in range(lines):
+                f.write(self._sentence(rng, 15) + "\n")
+        return 'lines'
+
+    def _make_png(self, path: Path, images: int, rng: random.Random) -> str:
+        from PIL import Image
+        Image.new('RGB', (800, 600), (rng.randint(0, 255), 255, 255)).save(str(path))
+        return 'images'
+
+
+def _measure(method_name: str, file_path: str, repeat: int) -> dict:
+    """Exécute une méthode d'extraction (dans un processus dédié) et mesure"""
+    processor = DocumentProcessor()
+    method = getattr(processor, method_name)
+    rss_before = _rss_peak_mb()
+
+    timings = []
+    output = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = method(file_path)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'seconds': statistics.median(timings),
+        'seconds_min': min(timings),
+        'output_chars': len(output),
+        'output_bytes': len(output.encode('utf-8')),
+        'peak_rss_mb': _rss_peak_mb(),
+        'baseline_rss_mb': rss_before,
+    }
+
+
+class ExtractionBenchmark:
+    """Exécution du benchmark et comparaison avec une référence"""
+
+    def __init__(self, corpus_dir: Path, repeat: int = 3, isolate: bool = True):
+        self.corpus_dir = Path(corpus_dir)
+        self.repeat = repeat
+        self.isolate = isolate
+
+    def _run_one(self, method_name: str, file_path: Path) -> dict:
+        if not self.isolate:
+            return _measure(method_name, str(file_path), self.repeat)
+        # Processus neuf par mesure : le pic RSS n'est pas pollué par les mesures précédentes
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(1) as pool:
+            return pool.apply(_measure, (method_name, str(file_path), self.repeat))
+
+    def run(self, manifest: list) -> list:
+        covered = {m for methods in METHODS_BY_EXTENSION.values() for m in methods}
+        missing = {m for m in dir(DocumentProcessor) if m.startswith('extract_from_')} - covered
+        if missing:
+            logger.warning(f"⚠️  Méthodes non couvertes par le benchmark: {sorted(missing)}")
+
+        results = []
+        for item in manifest:
+            file_path = self.corpus_dir / item['file']
+            for method_name in METHODS_BY_EXTENSION.get(file_path.suffix, []):
+                measure = self._run_one(method_name, file_path)
+                seconds = measure['seconds'] or 1e-9
+                mb = item['bytes'] / (1024 * 1024)
+                results.append({
+                    'method': method_name,
+                    'file': item['file'],
+                    'format': item['format'],
+                    'size': item['size'],
+                    'bytes': item['bytes'],
+                    'units': item['units'],
+                    'unit_name': item['unit_name'],
+                    **measure,
+                    'mb_per_second': round(mb / seconds, 3),
+                    'pages_per_second': (round(item['units'] / seconds, 2)
+                                         if item['unit_name'] in ('pages', 'slides') else None),
+                })
+                logger.info(
+                    f"⏱️  {method_name:30s} {item['file']:24s} "
+                    f"{measure['seconds'] * 1000:8.1f} ms  {mb / seconds:7.2f} Mo/s  "
+                    f"RSS {measure['peak_rss_mb'] or 0:.0f} Mo"
+                )
+        return results
+
+    @staticmethod
+    def compare(current: list, baseline: list, tolerance: float) -> list:
+        """Retourne les régressions de temps au-delà de la tolérance (ex: 0.2 = +20%)"""
+        reference = {(r['method'], r['file']): r for r in baseline}
+        regressions = []
+        for result in current:
+            ref = reference.get((result['method'], result['file']))
+            if not ref or not ref['seconds']:
+                continue
+            ratio = result['seconds'] / ref['seconds']
+            if ratio > 1 + tolerance:
+                regressions.append({
+                    'method': result['method'],
+                    'file': result['file'],
+                    'baseline_seconds': ref['seconds'],
+                    'seconds': result['seconds'],
+                    'ratio': round(ratio, 2),
+                })
+        return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent.parent
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark d'extraction multi-formats")
+    parser.add_argument("--corpus-dir", default="./benchmarks/corpus",
+                        help="Dossier du corpus synthétique (régénéré à chaque exécution)")
+    parser.add_argument("--output", default="./benchmarks/extraction_results.json",
+                        help="Fichier JSON de résultats")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Répétitions par mesure (médiane)")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="Mesurer dans le processus courant (plus rapide, RSS moins précis)")
+    parser.add_argument("--compare", help="Fichier de résultats de référence")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Régression tolérée par rapport à la référence (0.2 = +20%%)")
+
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(Path(args.corpus_dir), seed=args.seed)
+    manifest = corpus.generate()
+
+    benchmark = ExtractionBenchmark(Path(args.corpus_dir), repeat=args.repeat,
+                                    isolate=not args.no_isolate)
+    results = benchmark.run(manifest)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Résultats écrits dans {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = ExtractionBenchmark.compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            for reg in regressions:
+                logger.error(f"❌ Régression {reg['method']} sur {reg['file']}: x{reg['ratio']}")
+            sys.exit(1)
+        logger.info("✅ Aucune régression par rapport à la référence")
+
+
+if __name__ == "__main__":
+    main()
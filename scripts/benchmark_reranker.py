@@ -0,0 +1,128 @@
+"""
+Benchmark du reranking par cross-encoder sur CPU
+Latence d'un lot (question, candidats) dans les conditions de CrossEncoderReranker,
+pour fixer RERANK_BUDGET_MS à partir d'une mesure plutôt que d'une estimation
+"""
+
+import sys
+import json
+import time
+import platform
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+QUERIES = [
+    "Comment réinitialiser mon mot de passe ?",
+    "Mon imprimante ne fonctionne pas",
+    "Je n'arrive pas à me connecter à Citrix",
+    "How do I access the VPN?",
+    "Erreur 0x80070005 lors de l'installation",
+    "Outlook ne synchronise plus mes mails",
+    "Comment demander un nouveau badge ?",
+    "The scanner on floor 3 is offline",
+]
+
+SENTENCES = [
+    "Ouvrez le portail libre-service et cliquez sur « Mot de passe oublié ».",
+    "Vérifiez que l'imprimante est allumée et reliée au réseau de l'étage.",
+    "Le client Citrix Workspace doit être à jour avant la première connexion.",
+    "Connect to the VPN with your corporate account and the MFA application.",
+    "Lancez l'installation avec un compte disposant des droits administrateur.",
+    "Supprimez puis recréez le profil Outlook si la synchronisation reste bloquée.",
+    "La demande de badge se fait auprès de l'accueil avec une pièce d'identité.",
+    "If the scanner stays offline, restart it and open a ticket with the helpdesk.",
+]
+
+
+def make_candidates(count: int, words: int):
+    """Chunks synthétiques d'environ `words` mots (taille des chunks indexés)"""
+    candidates = []
+    for i in range(count):
+        text = []
+        j = i
+        while sum(len(s.split()) for s in text) < words:
+            text.append(SENTENCES[j % len(SENTENCES)])
+            j += 3
+        candidates.append(" ".join(text))
+    return candidates
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark du reranking cross-encoder")
+    parser.add_argument("--model", default="cross-encoder/ms-marco-MiniLM-L-6-v2", help="Cross-encoder")
+    parser.add_argument("--candidates", type=int, default=20, help="Candidats par requête (RERANK_CANDIDATES)")
+    parser.add_argument("--max-length", type=int, default=256, help="Longueur maximale des paires (tokens)")
+    parser.add_argument("--chunk-words", type=int, default=200, help="Taille des chunks candidats (mots)")
+    parser.add_argument("--repeat", type=int, default=30, help="Lots mesurés")
+    parser.add_argument("--threads", type=int, default=0, help="Threads torch (0 = défaut)")
+    parser.add_argument("--output", default="./benchmarks/reranker.json", help="Fichier JSON de résultats")
+
+    args = parser.parse_args()
+
+    from sentence_transformers import CrossEncoder
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    model = CrossEncoder(args.model, max_length=args.max_length, device="cpu")
+    candidates = make_candidates(args.candidates, args.chunk_words)
+
+    # Préchauffage : premières allocations hors mesure
+    model.predict([(QUERIES[0], text) for text in candidates], batch_size=len(candidates),
+                  show_progress_bar=False)
+
+    timings = []
+    for i in range(args.repeat):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        model.predict([(query, text) for text in candidates], batch_size=len(candidates),
+                      show_progress_bar=False)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings = np.asarray(timings)
+    p95 = float(np.percentile(timings, 95))
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'model': args.model,
+        'candidates': args.candidates,
+        'max_length': args.max_length,
+        'chunk_words': args.chunk_words,
+        'threads': args.threads,
+        'p50_ms': round(float(np.percentile(timings, 50)), 1),
+        'p95_ms': round(p95, 1),
+        'max_ms': round(float(timings.max()), 1),
+        # Marge de 25 % au-dessus du p95 : le budget couvre les lots froids du cache
+        'suggested_budget_ms': int(np.ceil(p95 * 1.25 / 10) * 10),
+    }
+    logger.info(
+        f"⏱️  {args.candidates} candidats, max_length {args.max_length}: "
+        f"p50 {report['p50_ms']} ms, p95 {report['p95_ms']} ms, max {report['max_ms']} ms"
+    )
+    logger.info(f"💡 RERANK_BUDGET_MS suggéré: {report['suggested_budget_ms']}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Résultats écrits dans {output}")
+
+
+if __name__ == "__main__":
+    main()
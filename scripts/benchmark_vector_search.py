@@ -0,0 +1,163 @@
+"""
+Benchmark des bases vectorielles
+Latence par requête (avec et sans filtre) de ChromaDB (HNSW) et de la recherche NumPy exhaustive
+sur des corpus synthétiques de 1k, 10k et 100k chunks
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from backend.vector_store import ChromaVectorStore, NumpyVectorStore
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def random_unit_vectors(n: int, dimension: int, rng) -> np.ndarray:
+    """Vecteurs normalisés aléatoires"""
+    vectors = rng.standard_normal((n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(store, vectors: np.ndarray):
+    """Remplit une base par lots de sa taille maximale"""
+    batch = store.max_batch_size
+    for start in range(0, len(vectors), batch):
+        end = min(start + batch, len(vectors))
+        store.upsert(
+            ids=[f"chunk_{i}" for i in range(start, end)],
+            embeddings=vectors[start:end].tolist(),
+            documents=[f"texte {i}" for i in range(start, end)],
+            metadatas=[{'source': f"doc_{i % 50}.pdf"} for i in range(start, end)]
+        )
+
+
+def percentiles(samples_ms: list) -> dict:
+    return {
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 3),
+        'mean_ms': round(float(np.mean(samples_ms)), 3),
+    }
+
+
+def bench_store(store, queries: np.ndarray, k: int, where: dict = None) -> dict:
+    """Latence d'une requête à la fois"""
+    store.query([queries[0].tolist()], k, where)  # échauffement
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        store.query([query.tolist()], k, where)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def bench_batched(store, queries: np.ndarray, k: int) -> float:
+    """Latence moyenne par requête quand toutes les requêtes partent en un appel"""
+    start = time.perf_counter()
+    store.query(queries.tolist(), k)
+    return round((time.perf_counter() - start) * 1000 / len(queries), 3)
+
+
+def recall_against_exact(store, exact_ids: list, queries: np.ndarray, k: int) -> float:
+    """Part des top-k exacts retrouvés (HNSW est approximatif)"""
+    found = 0
+    for query, expected in zip(queries, exact_ids):
+        ids = {hit[0] for hit in store.query([query.tolist()], k)[0]}
+        found += len(ids & set(expected))
+    return round(found / (len(queries) * k), 4)
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark des bases vectorielles")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Tailles de corpus (chunks)")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension des embeddings")
+    parser.add_argument("--queries", type=int, default=200, help="Nombre de requêtes")
+    parser.add_argument("--k", type=int, default=5, help="Résultats par requête")
+    parser.add_argument("--backends", default="numpy,chroma", help="Bases testées")
+    parser.add_argument("--seed", type=int, default=42, help="Graine aléatoire")
+    parser.add_argument("--output", default="./benchmarks/vector_search_results.json",
+                        help="Fichier JSON de résultats")
+
+    args = parser.parse_args()
+    backends = [b.strip() for b in args.backends.split(',')]
+    rng = np.random.default_rng(args.seed)
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(',')]:
+        vectors = random_unit_vectors(size, args.dimension, rng)
+        queries = random_unit_vectors(args.queries, args.dimension, rng)
+        exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+        exact_ids = [[f"chunk_{i}" for i in row] for row in exact]
+
+        for backend in backends:
+            workdir = Path(tempfile.mkdtemp(prefix=f"bench_{backend}_"))
+            try:
+                if backend == "numpy":
+                    store = NumpyVectorStore(str(workdir), dimension=args.dimension)
+                else:
+                    client = chromadb.Client(Settings(anonymized_telemetry=False))
+                    store = ChromaVectorStore(client, f"bench_{size}")
+
+                start = time.perf_counter()
+                fill(store, vectors)
+                build_seconds = time.perf_counter() - start
+
+                result = {
+                    'backend': backend,
+                    'chunks': size,
+                    'build_seconds': round(build_seconds, 2),
+                    **bench_store(store, queries, args.k),
+                    'batched_ms_per_query': bench_batched(store, queries, args.k),
+                    f'recall@{args.k}': recall_against_exact(store, exact_ids, queries, args.k),
+                    # Une source sur 50 : filtre sélectif
+                    'filtered_p50_ms': bench_store(store, queries, args.k, {'source': 'doc_0.pdf'})['p50_ms'],
+                }
+                results.append(result)
+                logger.info(
+                    f"⏱️  {backend:6s} {size:>7} chunks: p50 {result['p50_ms']} ms, "
+                    f"p95 {result['p95_ms']} ms, filtré {result['filtered_p50_ms']} ms, en lot {result['batched_ms_per_query']} ms/requête, "
+                    f"rappel {result[f'recall@{args.k}']}"
+                )
+                if backend == "chroma":
+                    client.delete_collection(f"bench_{size}")
+                del store
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dimension': args.dimension,
+        'queries': args.queries,
+        'k': args.k,
+        'results': results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Résultats écrits dans {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Intentions des questions les plus fréquentes (logs/chat_*.jsonl), pour la table de réponses précalculées
+Regroupe les questions journalisées par similarité d'embeddings et garde les N intentions les plus
+fréquentes par langue ; le backend en génère les réponses à partir de l'index courant
+(puis les régénère après chaque réindexation)
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+from datetime import datetime, timedelta
+from collections import Counter, defaultdict
+import logging
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from backend.answer_table import cluster_intents
+from backend.deduplication import normalize_text
+from backend.embedding_backend import load_embedding_model
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def load_questions(logs_dir: str, days: int) -> dict:
+    """
+    Returns:
+        {langue: {question normalisée: Counter(formulations d'origine)}}
+    """
+    since = datetime.now() - timedelta(days=days)
+    questions = defaultdict(lambda: defaultdict(Counter))
+    for log_file in sorted(Path(logs_dir).glob("chat_*.jsonl")):
+        with open(log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                # Questions hors périmètre : rien à précalculer
+                if not record.get('has_answer') or datetime.fromisoformat(record['timestamp']) < since:
+                    continue
+                question = record['question'].strip()
+                questions[record['language']][normalize_text(question).strip(" ?!.")][question] += 1
+    return questions
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Intentions fréquentes pour la table de réponses précalculées")
+    parser.add_argument("--logs-dir", default="./logs", help="Dossier des logs de conversation")
+    parser.add_argument("--days", type=int, default=30, help="Fenêtre d'historique (jours)")
+    parser.add_argument("--top-n", type=int, default=20, help="Intentions gardées par langue")
+    parser.add_argument("--min-count", type=int, default=3, help="Occurrences minimales d'une intention")
+    parser.add_argument("--similarity", type=float, default=0.85,
+                        help="Similarité cosinus minimale pour regrouper deux questions")
+    parser.add_argument("--max-variants", type=int, default=10, help="Formulations gardées par intention")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Modèle d'embeddings (celui du backend)")
+    parser.add_argument("--embed-backend", default="torch", choices=["torch", "onnx"])
+    parser.add_argument("--onnx-dir", default="./models/all-MiniLM-L6-v2-onnx")
+    parser.add_argument("--output", default="./answer_table/intents.json", help="Fichier des intentions")
+    parser.add_argument("--backend-url", default=None,
+                        help="URL du backend à notifier (POST /api/answer-table/rebuild), ex. http://localhost:8000")
+    parser.add_argument("--api-key", default=os.getenv("ADMIN_API_KEY"),
+                        help="Clé API d'un plan d'administration (ADMIN_PLANS du backend), défaut : $ADMIN_API_KEY")
+
+    args = parser.parse_args()
+    if args.backend_url and not args.api_key:
+        parser.error("--backend-url requiert --api-key (ou ADMIN_API_KEY)")
+    questions = load_questions(args.logs_dir, args.days)
+    if not questions:
+        logger.error("❌ Aucune question avec réponse dans les logs")
+        sys.exit(1)
+
+    model = load_embedding_model(args.embed_backend, args.model, args.onnx_dir)
+    intents = []
+    for language, groups in sorted(questions.items()):
+        # Une entrée par question normalisée : sa formulation la plus fréquente et son total
+        texts = [forms.most_common(1)[0][0] for forms in groups.values()]
+        counts = [sum(forms.values()) for forms in groups.values()]
+        embeddings = model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+        clusters = cluster_intents(texts, counts, embeddings, similarity=args.similarity)
+
+        selected = [c for c in clusters if c['count'] >= args.min_count][:args.top_n]
+        total = sum(counts)
+        covered = sum(c['count'] for c in selected)
+        logger.info(f"🌐 {language}: {total} questions, {len(groups)} distinctes, {len(clusters)} intentions, "
+                    f"{len(selected)} gardées ({covered / total:.1%} du trafic)")
+
+        for rank, cluster in enumerate(selected, start=1):
+            variants = sorted(cluster['variants'], key=lambda variant: -variant[1])[:args.max_variants]
+            intents.append({
+                'id': f"{language}-{rank:03d}",
+                'language': language,
+                'question': cluster['question'],
+                'count': cluster['count'],
+                'variants': [text for text, _ in variants],
+            })
+            logger.info(f"   {rank:3d}. ({cluster['count']:4d}) {cluster['question'][:80]}")
+
+    report = {
+        'version': datetime.now().strftime('%Y%m%d%H%M%S'),
+        'built_at': datetime.now().isoformat(),
+        'source': {'logs_dir': args.logs_dir, 'days': args.days, 'model': args.model,
+                   'similarity': args.similarity, 'min_count': args.min_count},
+        'intents': intents,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ {len(intents)} intentions écrites dans {output}")
+
+    if args.backend_url:
+        import requests
+        response = requests.post(f"{args.backend_url.rstrip('/')}/api/answer-table/rebuild",
+                                 headers={'X-API-Key': args.api_key}, timeout=10)
+        if response.ok:
+            logger.info("🔄 Reconstruction de la table de réponses lancée sur le backend")
+        else:
+            logger.error(f"❌ Backend: {response.status_code} {response.text[:200]}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Construction du jeu de questions de référence (gold set) pour l'évaluation de la recherche
+Amorcé à partir des conversations journalisées : questions répondues et sources citées,
+à relire avant usage ("reviewed": true)
+"""
+
+import re
+import json
+from pathlib import Path
+from datetime import datetime
+from collections import Counter
+import logging
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r'\s+', ' ', question.lower()).strip(" ?!.")
+
+
+def load_gold_set(path: Path) -> dict:
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'version': 0, 'updated': None, 'items': []}
+
+
+def candidates_from_logs(logs_dir: Path) -> list:
+    """Questions répondues avec sources, de la plus fréquente à la moins fréquente"""
+    counts = Counter()
+    first_seen = {}
+    for log_file in sorted(logs_dir.glob("chat_*.jsonl")):
+        with open(log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                # Réponses sans appel LLM : refus du seuil de pertinence (les réponses précalculées comptent)
+                if (not record.get('has_answer') or not record.get('sources')
+                        or (record.get('llm_called') is False and not record.get('precomputed'))):
+                    continue
+                key = normalize_question(record['question'])
+                counts[key] += 1
+                first_seen.setdefault(key, record)
+    return [(first_seen[key], count) for key, count in counts.most_common()]
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Amorce le gold set à partir des logs de conversation")
+    parser.add_argument("--logs-dir", default="./logs", help="Dossier des logs de conversation")
+    parser.add_argument("--gold-set", default="./evaluation/gold_set.json", help="Gold set à compléter")
+    parser.add_argument("--limit", type=int, default=100, help="Nombre maximum de nouvelles questions")
+    parser.add_argument("--min-count", type=int, default=1, help="Occurrences minimales d'une question")
+
+    args = parser.parse_args()
+    gold_path = Path(args.gold_set)
+    gold = load_gold_set(gold_path)
+    known = {normalize_question(item['question']) for item in gold['items']}
+    next_id = len(gold['items']) + 1
+
+    added = 0
+    for record, count in candidates_from_logs(Path(args.logs_dir)):
+        if added >= args.limit or count < args.min_count:
+            break
+        if normalize_question(record['question']) in known:
+            continue
+        gold['items'].append({
+            'id': f"q{next_id:04d}",
+            'question': record['question'],
+            'language': record.get('language', 'fr'),
+            'expected_sources': sorted(set(record['sources'])),
+            # Extrait attendu dans le chunk (optionnel, à compléter à la relecture)
+            'expected_text': None,
+            'origin': 'logs',
+            'occurrences': count,
+            'reviewed': False,
+        })
+        next_id += 1
+        added += 1
+
+    if not added:
+        logger.info("Aucune nouvelle question à ajouter")
+        return
+
+    gold['version'] += 1
+    gold['updated'] = datetime.now().isoformat()
+    gold_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(gold_path, 'w', encoding='utf-8') as f:
+        json.dump(gold, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ {added} questions ajoutées (version {gold['version']}, {len(gold['items'])} au total) "
+                f"→ relire et passer 'reviewed' à true")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Calibration du seuil de pertinence (RELEVANCE_MAX_DISTANCE, RELEVANCE_MIN_LEXICAL_SCORE)
+À partir du trafic journalisé (logs/chat_*.jsonl) : distance du meilleur chunk
+et issue de la réponse (répondue ou refusée par le LLM)
+
+Les questions rejetées par le seuil n'ont pas de réponse du LLM : elles sont exportées
+dans un fichier de revue (in_scope à renseigner) et comptées dès qu'elles sont annotées.
+"""
+
+import sys
+import json
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import numpy as np
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Formulations de refus du prompt système (FR/EN)
+REFUSAL_MARKERS = (
+    "je n'ai pas", "je ne peux", "uniquement des questions", "qu'aux questions",
+    "hors de mon domaine", "support informatique uniquement",
+    "i can only", "i cannot", "i can't", "only handle", "don't have that information",
+    "not related to it", "outside my scope",
+)
+
+
+def is_refusal(answer: str) -> bool:
+    answer = (answer or "").lower()
+    return any(marker in answer for marker in REFUSAL_MARKERS)
+
+
+def _review_key(record: dict) -> tuple:
+    return record['timestamp'], record['question']
+
+
+def load_review(path: Path) -> dict:
+    """Questions rejetées déjà exportées, avec leur annotation in_scope (true, false ou null)"""
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return {_review_key(item): item for item in map(json.loads, filter(str.strip, f))}
+
+
+def is_rejected(record: dict) -> bool:
+    """Question bloquée par le seuil (logs antérieurs à 'relevance' : pas d'appel LLM, distance connue)"""
+    relevance = record.get('relevance')
+    if relevance is not None:
+        return relevance.get('decision') == 'rejected'
+    return not record.get('llm_called', True) and not record.get('precomputed')
+
+
+def load_labeled(logs_dir: str, review: dict) -> tuple:
+    """
+    (distance, meilleur score BM25, dans le périmètre) pour chaque conversation exploitable
+
+    Une annotation manuelle "in_scope" (dans le log ou le fichier de revue) prime ; sinon une
+    réponse du LLM qui n'est pas un refus compte comme dans le périmètre. Les questions
+    rejetées sans annotation sont renvoyées à part pour la revue.
+
+    Returns:
+        (échantillons, questions rejetées non annotées)
+    """
+    samples, unlabeled = [], []
+    for log_file in sorted(Path(logs_dir).glob("chat_*.jsonl")):
+        with open(log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                distance = record.get('top_distance')
+                if distance is None:
+                    continue
+                lexical = (record.get('relevance') or {}).get('top_lexical_score')
+                label = record.get('in_scope')
+                if label is None and is_rejected(record):
+                    label = review.get(_review_key(record), {}).get('in_scope')
+                    if label is None:
+                        unlabeled.append({
+                            'timestamp': record['timestamp'],
+                            'question': record['question'],
+                            'language': record.get('language'),
+                            'top_distance': distance,
+                            'top_lexical_score': lexical,
+                            'in_scope': None,
+                        })
+                        continue
+                if label is not None:
+                    samples.append((float(distance), lexical, bool(label)))
+                elif record.get('llm_called', True):
+                    samples.append((float(distance), lexical, not is_refusal(record.get('answer'))))
+    return samples, unlabeled
+
+
+def write_review(path: Path, review: dict, unlabeled: list):
+    """Fichier de revue : annotations existantes + nouvelles questions rejetées à annoter"""
+    for item in unlabeled:
+        review.setdefault(_review_key(item), item)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for item in sorted(review.values(), key=lambda item: item['timestamp']):
+            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+
+def sweep(samples: list, thresholds) -> list:
+    """Rappel des questions valides et part des hors-périmètre bloquées pour chaque seuil"""
+    distances = np.array([d for d, _, _ in samples])
+    in_scope = np.array([label for _, _, label in samples])
+    n_in, n_out = in_scope.sum(), (~in_scope).sum()
+    rows = []
+    for threshold in thresholds:
+        passed = distances <= threshold
+        rows.append({
+            'threshold': round(float(threshold), 3),
+            'in_scope_recall': round(float((passed & in_scope).sum() / n_in), 4) if n_in else None,
+            'out_of_scope_blocked': round(float((~passed & ~in_scope).sum() / n_out), 4) if n_out else None,
+            'llm_calls_avoided': round(float((~passed).mean()), 4),
+        })
+    return rows
+
+
+def lexical_sweep(samples: list, max_distance: float, thresholds) -> list:
+    """
+    Au-delà du seuil de distance : questions valides récupérées par le score BM25
+    et questions hors périmètre laissées passer, pour chaque RELEVANCE_MIN_LEXICAL_SCORE
+    """
+    beyond = [(lexical or 0.0, label) for distance, lexical, label in samples if distance > max_distance]
+    n_in = sum(1 for _, label in beyond if label)
+    n_out = len(beyond) - n_in
+    rows = []
+    for threshold in thresholds:
+        rows.append({
+            'min_lexical_score': round(float(threshold), 2),
+            'in_scope_recovered': round(sum(1 for s, label in beyond if label and s >= threshold) / n_in, 4) if n_in else None,
+            'out_of_scope_passed': round(sum(1 for s, label in beyond if not label and s >= threshold) / n_out, 4) if n_out else None,
+        })
+    return rows
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calibration du seuil de pertinence")
+    parser.add_argument("--logs-dir", default="./logs", help="Dossier des logs de conversation")
+    parser.add_argument("--target-recall", type=float, default=0.98,
+                        help="Part minimale des questions valides qui doivent passer le seuil")
+    parser.add_argument("--output", default="./reports/relevance_calibration.json",
+                        help="Fichier JSON de résultats")
+    parser.add_argument("--review-file", default="./reports/relevance_review.jsonl",
+                        help="Questions rejetées par le seuil, à annoter (in_scope: true/false)")
+
+    args = parser.parse_args()
+
+    review_path = Path(args.review_file)
+    review = load_review(review_path)
+    samples, unlabeled = load_labeled(args.logs_dir, review)
+    write_review(review_path, review, unlabeled)
+    rejected_labeled = [item['in_scope'] for item in review.values() if item.get('in_scope') is not None]
+    if unlabeled:
+        logger.warning(f"⚠️ {len(unlabeled)} questions rejetées sans annotation : renseigner in_scope dans "
+                       f"{review_path} puis relancer (sinon le seuil ne voit que les questions qui l'ont passé)")
+
+    n_in = sum(1 for _, _, label in samples if label)
+    n_out = len(samples) - n_in
+    if not n_in:
+        logger.error("❌ Aucune conversation valide avec top_distance dans les logs")
+        sys.exit(1)
+    logger.info(f"📚 {len(samples)} conversations: {n_in} dans le périmètre, {n_out} hors périmètre")
+
+    rows = sweep(samples, np.arange(0.20, 1.0001, 0.01))
+    # Seuil le plus strict qui laisse passer la part visée des questions valides
+    chosen = next((row for row in rows if row['in_scope_recall'] >= args.target_recall), rows[-1])
+
+    in_distances = [d for d, _, label in samples if label]
+    out_distances = [d for d, _, label in samples if not label]
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'conversations': len(samples),
+        'in_scope': n_in,
+        'out_of_scope': n_out,
+        'in_scope_distance_p50': round(float(np.median(in_distances)), 4),
+        'in_scope_distance_p95': round(float(np.percentile(in_distances, 95)), 4),
+        'out_of_scope_distance_p50': round(float(np.median(out_distances)), 4) if out_distances else None,
+        'target_recall': args.target_recall,
+        'recommended': chosen,
+        'rejected_questions': {
+            'annotated': len(rejected_labeled),
+            'annotated_in_scope': sum(1 for label in rejected_labeled if label),
+            'to_review': len(unlabeled),
+            'review_file': str(review_path),
+        },
+        'sweep': rows,
+        'lexical_sweep': lexical_sweep(samples, chosen['threshold'], np.arange(2.0, 15.01, 1.0)),
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    blocked = chosen['out_of_scope_blocked']
+    logger.info(
+        f"🎯 Seuil recommandé: RELEVANCE_MAX_DISTANCE={chosen['threshold']} "
+        f"(rappel {chosen['in_scope_recall']:.1%}, hors périmètre bloqués "
+        f"{f'{blocked:.1%}' if blocked is not None else 'n/a'}, "
+        f"appels LLM évités {chosen['llm_calls_avoided']:.1%})"
+    )
+    logger.info(f"✅ Résultats écrits dans {output}")
+
+
+if __name__ == "__main__":
+    main()
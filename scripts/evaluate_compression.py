@@ -0,0 +1,152 @@
+"""
+Évaluation de la compression des vecteurs sur le corpus
+Perte de rappel@k par rapport à la recherche float32 exacte, mémoire économisée
+et accélération des requêtes pour int8, PCA et PCA + int8
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from backend.document_processor import DocumentProcessor, chunk_text_tokens
+from backend.embedding_batcher import LengthBucketedEncoder
+from backend.vector_store import NumpyVectorStore
+from scripts.benchmark_chunking import sample_queries
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def build_store(directory: Path, embeddings: np.ndarray, compression, reduced_dim: int,
+                rescore_factor: int) -> NumpyVectorStore:
+    store = NumpyVectorStore(str(directory), dimension=embeddings.shape[1], compression=compression,
+                             reduced_dim=reduced_dim, rescore_factor=rescore_factor)
+    n = len(embeddings)
+    store.upsert([str(i) for i in range(n)], embeddings, [""] * n, [{}] * n)
+    store.fit_compression()
+    return store
+
+
+def evaluate(store, queries: np.ndarray, exact: list, k: int) -> dict:
+    """Rappel@k face au top-k exact et latence par requête"""
+    store.query(queries[:1], k)  # échauffement
+    samples, recall = [], []
+    for query, expected in zip(queries, exact):
+        start = time.perf_counter()
+        hits = store.query([query], k)[0]
+        samples.append((time.perf_counter() - start) * 1000)
+        recall.append(len({hit[0] for hit in hits} & expected) / len(expected))
+    return {
+        f'recall@{k}': round(float(np.mean(recall)), 4),
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples, 95)), 3),
+    }
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Évaluation de la compression des vecteurs")
+    parser.add_argument("--documents-dir", default="./documents", help="Corpus")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Modèle d'embeddings")
+    parser.add_argument("--queries", type=int, default=200, help="Nombre de requêtes échantillonnées")
+    parser.add_argument("--k", type=int, default=5, help="Résultats par requête")
+    parser.add_argument("--methods", default="int8,pca,pca_int8", help="Compressions testées")
+    parser.add_argument("--reduced-dims", default="64,128,192", help="Dimensions PCA testées")
+    parser.add_argument("--rescore-factors", default="1,4", help="Présélection = facteur × k")
+    parser.add_argument("--seed", type=int, default=42, help="Graine d'échantillonnage")
+    parser.add_argument("--output", default="./benchmarks/compression_results.json",
+                        help="Fichier JSON de résultats")
+
+    args = parser.parse_args()
+
+    processor = DocumentProcessor()
+    texts = [r['text'] for r in processor.process_directory(args.documents_dir)
+             if r['success'] and len(r['text']) >= 50]
+    if not texts:
+        logger.error("❌ Aucun document exploitable")
+        sys.exit(1)
+
+    model = SentenceTransformer(args.model)
+    chunks = [chunk for text in texts
+              for chunk in chunk_text_tokens(text, model.tokenizer, max_tokens=model.max_seq_length)]
+    embeddings = LengthBucketedEncoder(model).encode(chunks).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    queries = model.encode([q for q, _ in sample_queries(texts, args.queries, args.seed)],
+                           convert_to_numpy=True, show_progress_bar=False)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    k = min(args.k, len(chunks))
+    exact = [set(str(i) for i in np.argsort(-(embeddings @ q))[:k]) for q in queries]
+    logger.info(f"📚 {len(chunks)} chunks, {len(queries)} requêtes, k={k}")
+
+    configs = [(None, embeddings.shape[1], 1)]
+    for method in args.methods.split(','):
+        dims = [int(d) for d in args.reduced_dims.split(',')] if method.startswith('pca') else [embeddings.shape[1]]
+        for dim in dims:
+            for factor in [int(f) for f in args.rescore_factors.split(',')]:
+                configs.append((method, dim, factor))
+
+    results = []
+    baseline_ms = None
+    for method, dim, factor in configs:
+        workdir = Path(tempfile.mkdtemp(prefix="compression_"))
+        try:
+            store = build_store(workdir, embeddings, method, dim, factor)
+            if method and not store.compressed:
+                logger.warning(f"⚠️ Corpus trop petit pour apprendre la compression ({len(chunks)} chunks)")
+                break
+            stats = store.get_stats()
+            result = {
+                'compression': method or 'float32',
+                'dimension': dim,
+                'rescore_factor': factor,
+                **evaluate(store, queries, exact, k),
+                'search_bytes': stats['search_bytes'],
+                'memory_saved': round(1 - stats['search_bytes'] / stats['float32_bytes'], 3),
+            }
+            baseline_ms = baseline_ms or result['p50_ms']
+            result['speedup'] = round(baseline_ms / result['p50_ms'], 2) if result['p50_ms'] else None
+            results.append(result)
+            logger.info(
+                f"🗜️  {result['compression']:8s} dim={dim:3d} x{factor}: rappel {result[f'recall@{k}']:.3f}, "
+                f"p50 {result['p50_ms']} ms (x{result['speedup']}), mémoire -{result['memory_saved']:.0%}"
+            )
+            del store
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'model': args.model,
+        'chunks': len(chunks),
+        'queries': len(queries),
+        'k': k,
+        'results': results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Résultats écrits dans {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Banc d'évaluation hors ligne de la recherche documentaire
+- run : indexe un corpus figé pour chaque configuration et mesure rappel@k, MRR
+  et latence p50/p95 sur le gold set
+- diff : compare deux rapports (métriques et questions gagnées/perdues)
+Fonctionne sans réseau (modèles lus dans le cache local)
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import platform
+from pathlib import Path
+from datetime import datetime
+import logging
+
+# Aucun accès réseau : les modèles doivent être dans le cache Hugging Face
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from backend.document_processor import DocumentProcessor, chunk_text, chunk_text_tokens
+from backend.deduplication import normalize_text
+from backend.embedding_backend import load_embedding_model
+from backend.embedding_batcher import LengthBucketedEncoder
+from backend.lexical_index import BM25Index, reciprocal_rank_fusion
+from backend.vector_store import NumpyVectorStore
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut = configuration de production (voir .env.example)
+DEFAULT_CONFIG = {
+    'name': 'default',
+    'model': 'all-MiniLM-L6-v2',
+    'embed_backend': 'torch',
+    'onnx_dir': './models/all-MiniLM-L6-v2-onnx',
+    'chunk_strategy': 'tokens',
+    'chunk_max_tokens': 0,
+    'chunk_overlap_tokens': 32,
+    'chunk_size': 500,
+    'chunk_overlap': 50,
+    'hybrid': True,
+    'lexical_weight': 0.5,
+    'candidates': 20,
+}
+KS = (1, 3, 5, 10)
+
+
+# ==========================================
+# CORPUS ET INDEX
+# ==========================================
+
+def load_corpus(documents_dir: str) -> tuple:
+    """Textes extraits et empreinte du corpus (noms + contenus)"""
+    processor = DocumentProcessor()
+    results = [r for r in processor.process_directory(documents_dir) if r['success'] and len(r['text']) >= 50]
+    digest = hashlib.sha256()
+    for result in sorted(results, key=lambda r: r['file_path']):
+        digest.update(Path(result['file_path']).name.encode('utf-8'))
+        digest.update(result['text'].encode('utf-8'))
+    return results, digest.hexdigest()[:16]
+
+
+def chunk_corpus(results: list, config: dict, model) -> list:
+    """Chunks (id, texte, source) selon la stratégie de la configuration"""
+    entries = []
+    for result in results:
+        if config['chunk_strategy'] == 'words':
+            chunks = chunk_text(result['text'], config['chunk_size'], config['chunk_overlap'])
+        else:
+            chunks = chunk_text_tokens(
+                result['text'], model.tokenizer,
+                max_tokens=config['chunk_max_tokens'] or model.max_seq_length,
+                overlap_tokens=config['chunk_overlap_tokens']
+            )
+        path = Path(result['file_path'])
+        entries.extend(
+            {'id': f"{path.stem}_chunk_{i}", 'text': text, 'metadata': {'source': path.name}}
+            for i, text in enumerate(chunks)
+        )
+    return entries
+
+
+class Retriever:
+    """Recherche vectorielle exacte (+ BM25 fusionné par RRF), comme search_documents"""
+
+    def __init__(self, entries: list, model, config: dict, workdir: Path):
+        self.model = model
+        self.config = config
+        embeddings = LengthBucketedEncoder(model).encode([e['text'] for e in entries])
+        self.store = NumpyVectorStore(str(workdir), dimension=embeddings.shape[1])
+        ids, texts, metadatas = ([e[key] for e in entries] for key in ('id', 'text', 'metadata'))
+        self.store.upsert(ids, embeddings, texts, metadatas)
+        self.lexical = BM25Index()
+        if config['hybrid']:
+            self.lexical.add(ids, texts, metadatas)
+
+    def search(self, query: str, k: int) -> list:
+        """[(id, texte, métadonnées)] du meilleur au moins bon"""
+        embedding = self.model.encode([query], convert_to_numpy=True, show_progress_bar=False)
+        n = max(k, self.config['candidates']) if self.config['hybrid'] else k
+        dense = self.store.query(embedding, n)[0]
+        if not self.config['hybrid']:
+            return [(hit[0], hit[2], hit[3]) for hit in dense]
+
+        lexical = self.lexical.search(query, n)
+        by_id = {hit[0]: (hit[0], hit[2], hit[3]) for hit in dense}
+        for hit in lexical:
+            by_id.setdefault(hit[0], (hit[0], hit[2], hit[3]))
+        weight = self.config['lexical_weight']
+        fused = reciprocal_rank_fusion([[hit[0] for hit in dense], [hit[0] for hit in lexical]],
+                                       [1 - weight, weight])
+        return [by_id[doc_id] for doc_id, _ in fused[:k]]
+
+
+# ==========================================
+# MÉTRIQUES
+# ==========================================
+
+def is_relevant(item: dict, text: str, metadata: dict) -> bool:
+    """Bonne source et, si précisé, extrait attendu présent dans le chunk"""
+    if metadata.get('source') not in item['expected_sources']:
+        return False
+    expected = item.get('expected_text')
+    return not expected or normalize_text(expected) in normalize_text(text)
+
+
+def evaluate_config(config: dict, results: list, items: list, models: dict) -> dict:
+    """Indexe le corpus avec la configuration et évalue chaque question"""
+    model_key = (config['embed_backend'], config['model'])
+    if model_key not in models:
+        models[model_key] = load_embedding_model(config['embed_backend'], config['model'], config['onnx_dir'])
+    model = models[model_key]
+
+    workdir = Path(tempfile.mkdtemp(prefix="retrieval_eval_"))
+    try:
+        start = time.perf_counter()
+        entries = chunk_corpus(results, config, model)
+        retriever = Retriever(entries, model, config, workdir)
+        index_seconds = time.perf_counter() - start
+
+        retriever.search(items[0]['question'], max(KS))  # échauffement
+        ranks, latencies = {}, []
+        for item in items:
+            start = time.perf_counter()
+            hits = retriever.search(item['question'], max(KS))
+            latencies.append((time.perf_counter() - start) * 1000)
+            ranks[item['id']] = next(
+                (rank for rank, (_, text, metadata) in enumerate(hits, 1) if is_relevant(item, text, metadata)),
+                None
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    found = [rank for rank in ranks.values() if rank is not None]
+    metrics = {f'recall@{k}': round(sum(1 for r in found if r <= k) / len(items), 4) for k in KS}
+    metrics['mrr'] = round(sum(1 / r for r in found) / len(items), 4)
+    metrics['p50_ms'] = round(float(np.percentile(latencies, 50)), 2)
+    metrics['p95_ms'] = round(float(np.percentile(latencies, 95)), 2)
+    return {
+        'name': config['name'],
+        'config': config,
+        'chunks': len(entries),
+        'index_seconds': round(index_seconds, 2),
+        'metrics': metrics,
+        'ranks': ranks,
+    }
+
+
+# ==========================================
+# COMMANDES
+# ==========================================
+
+def run(args):
+    with open(args.gold_set, 'r', encoding='utf-8') as f:
+        gold = json.load(f)
+    items = [item for item in gold['items'] if item.get('reviewed') or not args.reviewed_only]
+    if not items:
+        logger.error("❌ Gold set vide (lancer scripts/build_gold_set.py puis relire les questions)")
+        sys.exit(1)
+
+    configs = [DEFAULT_CONFIG]
+    if args.configs:
+        with open(args.configs, 'r', encoding='utf-8') as f:
+            configs = [{**DEFAULT_CONFIG, **config} for config in json.load(f)]
+
+    results, fingerprint = load_corpus(args.documents_dir)
+    if not results:
+        logger.error("❌ Aucun document exploitable")
+        sys.exit(1)
+    logger.info(f"📚 {len(results)} documents (empreinte {fingerprint}), {len(items)} questions "
+                f"(gold set v{gold['version']})")
+
+    models = {}
+    evaluations = []
+    for config in configs:
+        evaluation = evaluate_config(config, results, items, models)
+        evaluations.append(evaluation)
+        m = evaluation['metrics']
+        logger.info(
+            f"📊 {config['name']:12s}: {evaluation['chunks']} chunks, "
+            + ", ".join(f"R@{k}={m[f'recall@{k}']:.3f}" for k in KS)
+            + f", MRR={m['mrr']:.3f}, p50 {m['p50_ms']} ms, p95 {m['p95_ms']} ms"
+        )
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'gold_set_version': gold['version'],
+        'questions': len(items),
+        'corpus_fingerprint': fingerprint,
+        'documents': len(results),
+        'evaluations': evaluations,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Résultats écrits dans {output}")
+
+
+def _pick(report: dict, name: str) -> dict:
+    evaluations = report['evaluations']
+    if name is None:
+        return evaluations[0]
+    for evaluation in evaluations:
+        if evaluation['name'] == name:
+            return evaluation
+    raise SystemExit(f"Configuration introuvable: {name} (disponibles: {[e['name'] for e in evaluations]})")
+
+
+def diff(args):
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline_report = json.load(f)
+    with open(args.candidate, 'r', encoding='utf-8') as f:
+        candidate_report = json.load(f)
+
+    for key in ('gold_set_version', 'corpus_fingerprint'):
+        if baseline_report[key] != candidate_report[key]:
+            logger.warning(f"⚠️ {key} différent ({baseline_report[key]} ≠ {candidate_report[key]}) : "
+                           f"comparaison non équivalente")
+
+    baseline = _pick(baseline_report, args.baseline_config)
+    candidate = _pick(candidate_report, args.candidate_config)
+    logger.info(f"🔀 {baseline['name']} → {candidate['name']}")
+
+    deltas = {}
+    for metric, before in baseline['metrics'].items():
+        after = candidate['metrics'][metric]
+        deltas[metric] = {'baseline': before, 'candidate': after, 'delta': round(after - before, 4)}
+        logger.info(f"  {metric:10s} {before:>8} → {after:>8} ({after - before:+.4f})")
+
+    def score(rank):
+        return 1 / rank if rank else 0.0
+
+    gained, lost = [], []
+    for item_id, before in baseline['ranks'].items():
+        after = candidate['ranks'].get(item_id)
+        if score(after) > score(before):
+            gained.append({'id': item_id, 'baseline_rank': before, 'candidate_rank': after})
+        elif score(after) < score(before):
+            lost.append({'id': item_id, 'baseline_rank': before, 'candidate_rank': after})
+    logger.info(f"  ✅ {len(gained)} questions améliorées, ❌ {len(lost)} dégradées")
+    for change in lost:
+        logger.info(f"     ❌ {change['id']}: rang {change['baseline_rank']} → {change['candidate_rank']}")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'baseline': baseline['name'], 'candidate': candidate['name'],
+                       'metrics': deltas, 'gained': gained, 'lost': lost}, f, indent=2, ensure_ascii=False)
+        logger.info(f"✅ Différences écrites dans {output}")
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Évaluation hors ligne de la recherche documentaire")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Évalue une ou plusieurs configurations")
+    run_parser.add_argument("--documents-dir", default="./documents", help="Corpus figé")
+    run_parser.add_argument("--gold-set", default="./evaluation/gold_set.json", help="Questions de référence")
+    run_parser.add_argument("--configs", default=None, help="Fichier JSON de configurations (liste)")
+    run_parser.add_argument("--reviewed-only", action="store_true", help="Seulement les questions relues")
+    run_parser.add_argument("--output", default="./benchmarks/retrieval_eval.json", help="Rapport JSON")
+    run_parser.set_defaults(func=run)
+
+    diff_parser = commands.add_parser("diff", help="Compare deux rapports")
+    diff_parser.add_argument("baseline", help="Rapport de référence")
+    diff_parser.add_argument("candidate", help="Rapport à comparer")
+    diff_parser.add_argument("--baseline-config", default=None, help="Configuration du rapport de référence")
+    diff_parser.add_argument("--candidate-config", default=None, help="Configuration du rapport comparé")
+    diff_parser.add_argument("--output", default=None, help="Fichier JSON des différences")
+    diff_parser.set_defaults(func=diff)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Export du modèle d'embeddings en ONNX (+ variante quantifiée int8)
+Produit le dossier lu par EMBED_BACKEND=onnx et vérifie la compatibilité
+des vecteurs avec le modèle PyTorch d'origine
+"""
+
+import sys
+import json
+from pathlib import Path
+import logging
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from backend.embedding_backend import OnnxSentenceEncoder, PROBE_TEXTS, ONNX_CONFIG_FILE
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class _HiddenStates(torch.nn.Module):
+    """Sortie last_hidden_state du transformer (le pooling est fait côté onnxruntime)"""
+
+    def __init__(self, model, input_names):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *inputs):
+        return self.model(**dict(zip(self.input_names, inputs))).last_hidden_state
+
+
+def export(model_name: str, output_dir: Path, opset: int) -> SentenceTransformer:
+    """Exporte le transformer et écrit la configuration de l'encodeur"""
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer, pooling = model[0], model[1]
+    if pooling.get_pooling_mode_str() != "mean":
+        raise ValueError(f"Pooling non supporté: {pooling.get_pooling_mode_str()} (attendu: mean)")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    dummy = model.tokenizer(["Exemple d'export ONNX"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+
+    torch.onnx.export(
+        _HiddenStates(transformer.auto_model.eval(), input_names),
+        tuple(dummy[name] for name in input_names),
+        str(output_dir / "model.onnx"),
+        input_names=input_names,
+        output_names=["last_hidden_state"],
+        dynamic_axes=dynamic_axes,
+        opset_version=opset,
+    )
+    model.tokenizer.save_pretrained(str(output_dir))
+
+    config = {
+        'model_name': model_name,
+        'max_seq_length': model.max_seq_length,
+        'dimension': model.get_sentence_embedding_dimension(),
+        'normalize': any(type(module).__name__ == "Normalize" for module in model),
+    }
+    with open(output_dir / ONNX_CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    logger.info(f"✅ Export ONNX: {output_dir / 'model.onnx'}")
+    return model
+
+
+def quantize(output_dir: Path):
+    """Quantification dynamique int8 des poids (MatMul/Gemm)"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(
+        str(output_dir / "model.onnx"),
+        str(output_dir / "model_int8.onnx"),
+        weight_type=QuantType.QInt8,
+    )
+    logger.info(f"✅ Variante int8: {output_dir / 'model_int8.onnx'}")
+
+
+def check_parity(model: SentenceTransformer, output_dir: Path, min_cosine: float) -> dict:
+    """Cosinus entre vecteurs PyTorch et ONNX sur les phrases sondes"""
+    reference = model.encode(PROBE_TEXTS, convert_to_numpy=True, normalize_embeddings=True,
+                             show_progress_bar=False)
+    report = {}
+    for quantized in (False, True):
+        if quantized and not (output_dir / "model_int8.onnx").exists():
+            continue
+        encoder = OnnxSentenceEncoder(str(output_dir), quantized=quantized)
+        vectors = encoder.encode(PROBE_TEXTS)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        min_cos = float(np.min(np.sum(reference * vectors, axis=1)))
+        report[encoder.backend] = {'min_cosine': round(min_cos, 5), 'compatible': min_cos >= min_cosine}
+        status = "compatible avec l'index existant" if min_cos >= min_cosine else "réindexation nécessaire"
+        logger.info(f"🔎 {encoder.backend}: cosinus min {min_cos:.5f} → {status}")
+    return report
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export ONNX du modèle d'embeddings")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Modèle SentenceTransformer")
+    parser.add_argument("--output-dir", default="./models/all-MiniLM-L6-v2-onnx", help="Dossier de sortie")
+    parser.add_argument("--opset", type=int, default=14, help="Version d'opset ONNX")
+    parser.add_argument("--no-quantize", action="store_true", help="Sans variante int8")
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="Seuil de compatibilité (EMBED_COMPAT_MIN_COSINE)")
+
+    args = parser.parse_args()
+    output_dir = Path(args.output_dir)
+
+    model = export(args.model, output_dir, args.opset)
+    if not args.no_quantize:
+        quantize(output_dir)
+    report = check_parity(model, output_dir, args.min_cosine)
+
+    with open(output_dir / "parity.json", 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
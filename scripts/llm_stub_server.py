@@ -0,0 +1,244 @@
+"""
+Serveur LLM de substitution compatible Groq / OpenAI (chat completions)
+Pour les tests de performance et de résilience hors ligne, sans clé ni quota :
+- réponses déterministes (écho de la question ou réponses préenregistrées)
+- streaming SSE comme l'API réelle
+- latence configurable : délai avant le premier token (TTFT) et débit en tokens/s
+- injection d'erreurs 5xx, de 429 (avec Retry-After) et de requêtes bloquées
+
+Backend : GROQ_BASE_URL=http://localhost:8100 (GROQ_API_KEY quelconque)
+Configuration modifiable à chaud : POST /stub/config, compteurs : GET /stub/stats
+"""
+
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+import logging
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'mode': 'echo',  # echo ou canned
+    'ttft_ms': 300.0,  # médiane du délai avant le premier token
+    'ttft_sigma': 0.3,  # dispersion log-normale du TTFT (0 = constant)
+    'tokens_per_second': 250.0,
+    'answer_tokens': 120,  # longueur des réponses en écho
+    'error_rate': 0.0,  # part de réponses 500
+    'rate_limit_rate': 0.0,  # part de réponses 429
+    'retry_after_seconds': 1.0,
+    'hang_rate': 0.0,  # part de requêtes sans réponse (test des timeouts)
+    'hang_seconds': 120.0,
+}
+
+FILLER = (
+    "Pour résoudre ce problème, vérifiez d'abord la connexion réseau du poste, redémarrez "
+    "l'application concernée puis reconnectez-vous avec vos identifiants habituels. Si le "
+    "problème persiste, ouvrez un ticket auprès du support informatique en précisant le "
+    "message d'erreur affiché et le numéro du poste."
+).split()
+
+
+class StubState:
+    """Configuration courante, réponses préenregistrées et compteurs"""
+
+    def __init__(self, config: Dict, canned: List[Dict], seed: int):
+        self.config = dict(config)
+        self.canned = canned
+        self.random = random.Random(seed)
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def draw(self) -> tuple:
+        """(issue, ttft en secondes) ; issue parmi ok, error, rate_limit, hang"""
+        with self._lock:
+            roll = self.random.random()
+            ttft = self.config['ttft_ms'] / 1000
+            if self.config['ttft_sigma']:
+                ttft *= self.random.lognormvariate(0, self.config['ttft_sigma'])
+        outcome = 'ok'
+        for name, key in (('error', 'error_rate'), ('rate_limit', 'rate_limit_rate'), ('hang', 'hang_rate')):
+            if roll < self.config[key]:
+                outcome = name
+                break
+            roll -= self.config[key]
+        with self._lock:
+            self.counters['requests'] += 1
+            self.counters[outcome] += 1
+        return outcome, ttft
+
+
+def _last_user_message(messages: List[Dict]) -> str:
+    for message in reversed(messages):
+        if message.get('role') == 'user':
+            content = message.get('content') or ""
+            # Prompt du backend : la question suit le dernier "Question: "
+            return content.rsplit("Question: ", 1)[-1].strip()
+    return ""
+
+
+def build_answer(state: StubState, messages: List[Dict]) -> str:
+    """Réponse déterministe pour une conversation donnée"""
+    question = _last_user_message(messages)
+    if state.config['mode'] == 'canned':
+        lowered = question.lower()
+        for entry in state.canned:
+            if entry.get('match', '').lower() in lowered:
+                return entry['response']
+        if state.canned:
+            digest = int(hashlib.sha256(question.encode('utf-8')).hexdigest(), 16)
+            return state.canned[digest % len(state.canned)]['response']
+
+    words = [f"[stub] {question}"]
+    words.extend(FILLER[i % len(FILLER)] for i in range(state.config['answer_tokens']))
+    return " ".join(words)
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def create_app(state: StubState) -> FastAPI:
+    app = FastAPI(title="LLM stub")
+
+    def error_response(outcome: str) -> JSONResponse:
+        if outcome == 'rate_limit':
+            return JSONResponse(
+                status_code=429,
+                headers={'retry-after': str(state.config['retry_after_seconds'])},
+                content={'error': {'message': 'Rate limit reached (stub)', 'type': 'rate_limit_exceeded'}}
+            )
+        return JSONResponse(status_code=500,
+                            content={'error': {'message': 'Internal error (stub)', 'type': 'internal_error'}})
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        outcome, ttft = state.draw()
+        if outcome == 'hang':
+            await asyncio.sleep(state.config['hang_seconds'])
+        if outcome in ('error', 'rate_limit'):
+            return error_response(outcome)
+
+        messages = body.get('messages', [])
+        model = body.get('model', 'stub')
+        tokens = build_answer(state, messages).split(" ")
+        max_tokens = body.get('max_tokens') or len(tokens)
+        finish_reason = "length" if len(tokens) > max_tokens else "stop"
+        tokens = tokens[:max_tokens]
+        usage = {
+            'prompt_tokens': sum(_count_tokens(m.get('content') or "") + 4 for m in messages),
+            'completion_tokens': len(tokens),
+            'prompt_tokens_details': {'cached_tokens': 0},
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        delay = 1 / state.config['tokens_per_second']
+
+        if not body.get('stream'):
+            await asyncio.sleep(ttft + len(tokens) * delay)
+            return {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': created,
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': " ".join(tokens)},
+                    'finish_reason': finish_reason,
+                }],
+                'usage': usage,
+            }
+
+        async def events():
+            def chunk(delta: Dict, finish: Optional[str] = None, extra: Optional[Dict] = None) -> str:
+                payload = {
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                    'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish}],
+                    **(extra or {}),
+                }
+                return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+            await asyncio.sleep(ttft)
+            yield chunk({'role': 'assistant', 'content': ""})
+            for i, token in enumerate(tokens):
+                yield chunk({'content': token if i == 0 else " " + token})
+                await asyncio.sleep(delay)
+            yield chunk({}, finish_reason, {'x_groq': {'usage': usage}, 'usage': usage})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    # Chemin du SDK Groq (/openai/v1) et chemin OpenAI (/v1)
+    app.add_api_route("/openai/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+
+    @app.get("/openai/v1/models")
+    @app.get("/v1/models")
+    async def models():
+        return {'object': 'list', 'data': [{'id': 'stub', 'object': 'model', 'owned_by': 'stub'}]}
+
+    @app.get("/stub/stats")
+    async def stats():
+        return {'config': state.config, 'counters': dict(state.counters)}
+
+    @app.post("/stub/config")
+    async def update_config(request: Request):
+        changes = await request.json()
+        unknown = set(changes) - set(DEFAULT_CONFIG)
+        if unknown:
+            return JSONResponse(status_code=400, content={'error': f"Paramètres inconnus: {sorted(unknown)}"})
+        state.config.update(changes)
+        logger.info(f"⚙️ Configuration du stub: {changes}")
+        return {'config': state.config}
+
+    return app
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serveur LLM de substitution (API chat completions)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--canned", default=None,
+                        help="Fichier JSON [{\"match\": \"vpn\", \"response\": \"...\"}] (active le mode canned), "
+                             "ex. loadtest/canned_answers.json")
+    parser.add_argument("--seed", type=int, default=42, help="Graine des tirages (latence, erreurs)")
+    for key, value in DEFAULT_CONFIG.items():
+        if key != 'mode':
+            parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+
+    args = parser.parse_args()
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG if key != 'mode'}
+    canned = []
+    if args.canned:
+        with open(args.canned, 'r', encoding='utf-8') as f:
+            canned = json.load(f)
+        config['mode'] = 'canned'
+    else:
+        config['mode'] = 'echo'
+
+    logger.info(f"🚀 Stub LLM sur http://{args.host}:{args.port} ({config['mode']}, "
+                f"TTFT {config['ttft_ms']} ms, {config['tokens_per_second']} tokens/s, "
+                f"erreurs {config['error_rate']:.0%}, 429 {config['rate_limit_rate']:.0%})")
+    uvicorn.run(create_app(StubState(config, canned, args.seed)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
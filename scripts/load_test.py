@@ -0,0 +1,440 @@
+"""
+Test de charge de bout en bout de l'API chat (POST /api/chat)
+Scénarios JSON (loadtest/scenarios/) : utilisateurs virtuels, langues, questions répétées
+ou inédites, sessions multi-tours, plusieurs clés API / plans.
+
+Rapport : débit, latence p50/p95/p99, erreurs par type, détail par catégorie,
+ressources du serveur (psutil, --server-pid) et écart des compteurs /api/metrics.
+Comparaison avec une baseline enregistrée : code de sortie 1 en cas de régression.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+from pathlib import Path
+from datetime import datetime
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional
+import logging
+
+import httpx
+import numpy as np
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_SCENARIO = {
+    'duration_seconds': 60,
+    'users': 10,
+    'ramp_up_seconds': 5,
+    'warmup_seconds': None,  # None = durée de la montée en charge
+    'think_time_ms': [500, 2000],
+    'turns_per_session': [1, 1],
+    'timeout_seconds': 60,
+    'novel_ratio': 0.0,
+    'novel_templates': [],
+    'follow_ups': [],
+    'expected_statuses': [],
+}
+
+# Régression si la valeur courante dépasse la baseline de plus de ... (pourcentages, sauf error_rate)
+DEFAULT_THRESHOLDS = {
+    'p50_increase_pct': 25,
+    'p95_increase_pct': 20,
+    'p99_increase_pct': 30,
+    'throughput_drop_pct': 15,
+    'error_rate_increase': 0.01,  # écart absolu
+}
+
+
+class Sample(NamedTuple):
+    """Une requête du test"""
+    started: float  # secondes depuis le début du test
+    latency: float
+    status: str  # code HTTP ou nom de l'exception
+    kind: str  # repeated, novel ou follow_up
+    language: str
+    plan: str
+
+
+def load_scenario(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        scenario = {**DEFAULT_SCENARIO, **json.load(f)}
+    scenario['thresholds'] = {**DEFAULT_THRESHOLDS, **scenario.get('thresholds', {})}
+    # Clés lues dans l'environnement : "${LOADTEST_API_KEY}"
+    for entry in scenario['api_keys']:
+        entry['key'] = os.path.expandvars(entry['key'])
+        entry.setdefault('plan', entry['key'].split("_")[1] if entry['key'].count("_") >= 2 else "unknown")
+        entry.setdefault('weight', 1)
+    if scenario['warmup_seconds'] is None:
+        scenario['warmup_seconds'] = scenario['ramp_up_seconds']
+    return scenario
+
+
+class QuestionPicker:
+    """Tirage des questions : répétées (pondérées), inédites (gabarits) et relances de session"""
+
+    def __init__(self, scenario: Dict, rng: random.Random):
+        self.scenario = scenario
+        self.rng = rng
+
+    def first(self) -> tuple:
+        """(question, catégorie, langue) du premier tour d'une session"""
+        templates = self.scenario['novel_templates']
+        if templates and self.rng.random() < self.scenario['novel_ratio']:
+            template = self.rng.choice(templates)
+            text = template['text'].format(n=self.rng.randint(1, 9999), code=f"{self.rng.randint(0, 0xFFFF):04X}")
+            return text, 'novel', template['lang']
+        questions = self.scenario['questions']
+        entry = self.rng.choices(questions, weights=[q.get('weight', 1) for q in questions])[0]
+        return entry['text'], 'repeated', entry['lang']
+
+    def follow_up(self, language: str, previous: str) -> Optional[tuple]:
+        # Jamais la question précédente : le serveur refuse les doublons rapprochés d'une session
+        candidates = [f for f in self.scenario['follow_ups'] if f['lang'] == language and f['text'] != previous]
+        if not candidates:
+            return None
+        return self.rng.choice(candidates)['text'], 'follow_up', language
+
+
+async def virtual_user(client: httpx.AsyncClient, scenario: Dict, picker: QuestionPicker,
+                       rng: random.Random, start: float, deadline: float, samples: List[Sample]):
+    """Enchaîne des sessions jusqu'à la fin du test"""
+    keys = scenario['api_keys']
+    think_min, think_max = scenario['think_time_ms']
+    turns_min, turns_max = scenario['turns_per_session']
+
+    while time.perf_counter() < deadline:
+        key = rng.choices(keys, weights=[k['weight'] for k in keys])[0]
+        session_id = None
+        turn = picker.first()
+        for index in range(rng.randint(turns_min, turns_max)):
+            if index > 0:
+                turn = picker.follow_up(turn[2], turn[0])
+                if turn is None:
+                    break
+            question, kind, language = turn
+
+            sent = time.perf_counter()
+            try:
+                response = await client.post("/api/chat", json={'question': question, 'session_id': session_id},
+                                             headers={'X-API-Key': key['key']})
+                status = str(response.status_code)
+                if response.status_code == 200:
+                    session_id = response.json().get('session_id')
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            samples.append(Sample(sent - start, time.perf_counter() - sent, status, kind, language, key['plan']))
+
+            if time.perf_counter() >= deadline:
+                return
+            await asyncio.sleep(rng.uniform(think_min, think_max) / 1000)
+
+
+class ProcessSampler:
+    """CPU et mémoire du processus serveur (psutil), échantillonnés pendant le test"""
+
+    def __init__(self, pid: int, interval: float = 1.0):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.cpu, self.rss, self.threads = [], [], []
+
+    async def run(self, stop: asyncio.Event):
+        self.process.cpu_percent(None)
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                with self.process.oneshot():
+                    self.cpu.append(self.process.cpu_percent(None))
+                    self.rss.append(self.process.memory_info().rss / 1024 ** 2)
+                    self.threads.append(self.process.num_threads())
+            except psutil.Error as e:
+                logger.warning(f"⚠️ Échantillonnage du serveur interrompu: {e}")
+                return
+
+    def summary(self) -> Optional[Dict]:
+        if not self.cpu:
+            return None
+        return {
+            'samples': len(self.cpu),
+            'cpu_percent_avg': round(float(np.mean(self.cpu)), 1),
+            'cpu_percent_max': round(float(np.max(self.cpu)), 1),
+            'rss_mb_start': round(self.rss[0], 1),
+            'rss_mb_max': round(float(np.max(self.rss)), 1),
+            'rss_mb_end': round(self.rss[-1], 1),
+            'threads_max': int(np.max(self.threads)),
+        }
+
+
+async def fetch_metrics(client: httpx.AsyncClient) -> Optional[Dict]:
+    try:
+        response = await client.get("/api/metrics")
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        logger.warning(f"⚠️ /api/metrics indisponible: {e}")
+        return None
+
+
+def _flatten(data: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def metrics_delta(before: Optional[Dict], after: Optional[Dict]) -> Optional[Dict]:
+    """Écart des valeurs numériques de /api/metrics (compteurs et moyennes) entre début et fin"""
+    if before is None or after is None:
+        return None
+    before, after = _flatten(before), _flatten(after)
+    return {
+        name: round(value - before[name], 4)
+        for name, value in sorted(after.items())
+        if name in before and value != before[name]
+    }
+
+
+def summarize(samples: List[Sample], elapsed: float, expected_statuses: List[int]) -> Dict:
+    """Débit, latence des réponses 200 et taux d'erreur (hors statuts attendus)"""
+    expected = {str(status) for status in expected_statuses}
+    ok = [s.latency * 1000 for s in samples if s.status == "200"]
+    errors = [s for s in samples if s.status != "200" and s.status not in expected]
+    summary = {
+        'requests': len(samples),
+        'ok': len(ok),
+        'errors': len(errors),
+        'error_rate': round(len(errors) / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(ok) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    if ok:
+        summary['latency_ms'] = {
+            'mean': round(float(np.mean(ok)), 1),
+            'p50': round(float(np.percentile(ok, 50)), 1),
+            'p95': round(float(np.percentile(ok, 95)), 1),
+            'p99': round(float(np.percentile(ok, 99)), 1),
+            'max': round(float(np.max(ok)), 1),
+        }
+    return summary
+
+
+def timeline(samples: List[Sample], bucket_seconds: float = 10.0) -> List[Dict]:
+    buckets = defaultdict(list)
+    for sample in samples:
+        buckets[int(sample.started // bucket_seconds)].append(sample)
+    rows = []
+    for index in sorted(buckets):
+        bucket = buckets[index]
+        ok = [s.latency * 1000 for s in bucket if s.status == "200"]
+        rows.append({
+            'start_seconds': index * bucket_seconds,
+            'requests': len(bucket),
+            'errors': sum(s.status != "200" for s in bucket),
+            'p95_ms': round(float(np.percentile(ok, 95)), 1) if ok else None,
+        })
+    return rows
+
+
+def compare_to_baseline(summary: Dict, baseline: Dict, thresholds: Dict) -> List[Dict]:
+    """Liste des régressions (vide si le test passe)"""
+    regressions = []
+
+    def check(metric: str, current: float, reference: float, limit: float):
+        if current > limit:
+            regressions.append({'metric': metric, 'baseline': reference, 'current': current, 'limit': round(limit, 4)})
+
+    current_latency, base_latency = summary.get('latency_ms', {}), baseline.get('latency_ms', {})
+    for percentile in ('p50', 'p95', 'p99'):
+        if percentile in current_latency and percentile in base_latency:
+            reference = base_latency[percentile]
+            check(f"latency_ms.{percentile}", current_latency[percentile], reference,
+                  reference * (1 + thresholds[f'{percentile}_increase_pct'] / 100))
+
+    # Débit : régression si la valeur passe sous la limite
+    reference = baseline['throughput_rps']
+    limit = reference * (1 - thresholds['throughput_drop_pct'] / 100)
+    if summary['throughput_rps'] < limit:
+        regressions.append({'metric': 'throughput_rps', 'baseline': reference,
+                            'current': summary['throughput_rps'], 'limit': round(limit, 4)})
+
+    check('error_rate', summary['error_rate'], baseline['error_rate'],
+          baseline['error_rate'] + thresholds['error_rate_increase'])
+    return regressions
+
+
+async def run_scenario(scenario: Dict, base_url: str, seed: int, server_pid: Optional[int]) -> Dict:
+    rng = random.Random(seed)
+    samples: List[Sample] = []
+    limits = httpx.Limits(max_connections=scenario['users'] + 2, max_keepalive_connections=scenario['users'] + 2)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=scenario['timeout_seconds'], limits=limits) as client:
+        metrics_before = await fetch_metrics(client)
+
+        sampler = None
+        if server_pid:
+            if PSUTIL_AVAILABLE:
+                sampler = ProcessSampler(server_pid)
+            else:
+                logger.warning("⚠️ psutil non installé : ressources du serveur non mesurées")
+        stop = asyncio.Event()
+        sampler_task = asyncio.create_task(sampler.run(stop)) if sampler else None
+
+        logger.info(f"🚀 Scénario '{scenario['name']}': {scenario['users']} utilisateurs, "
+                    f"{scenario['duration_seconds']}s, montée {scenario['ramp_up_seconds']}s → {base_url}")
+        start = time.perf_counter()
+        deadline = start + scenario['duration_seconds']
+
+        async def delayed_user(index: int):
+            delay = index * scenario['ramp_up_seconds'] / scenario['users']
+            if delay >= scenario['duration_seconds']:
+                return
+            await asyncio.sleep(delay)
+            user_rng = random.Random(rng.random())
+            await virtual_user(client, scenario, QuestionPicker(scenario, user_rng), user_rng,
+                               start, deadline, samples)
+
+        await asyncio.gather(*(delayed_user(i) for i in range(scenario['users'])))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        if sampler_task:
+            await sampler_task
+
+        metrics_after = await fetch_metrics(client)
+
+    # Statistiques sur la fenêtre de mesure : requêtes envoyées entre la fin de l'échauffement et l'échéance
+    warmup = scenario['warmup_seconds']
+    measured = [s for s in samples if s.started >= warmup]
+    measured_elapsed = scenario['duration_seconds'] - warmup
+
+    def breakdown(field: str) -> Dict:
+        groups = defaultdict(list)
+        for sample in measured:
+            groups[getattr(sample, field)].append(sample)
+        return {name: summarize(group, measured_elapsed, scenario['expected_statuses'])
+                for name, group in sorted(groups.items())}
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'scenario': scenario['name'],
+        'base_url': base_url,
+        'seed': seed,
+        'config': {key: scenario[key] for key in DEFAULT_SCENARIO if key not in ('novel_templates', 'follow_ups')},
+        'elapsed_seconds': round(elapsed, 2),
+        'summary': summarize(measured, measured_elapsed, scenario['expected_statuses']),
+        'statuses': dict(Counter(s.status for s in measured).most_common()),
+        'by_kind': breakdown('kind'),
+        'by_language': breakdown('language'),
+        'by_plan': breakdown('plan'),
+        'timeline': timeline(samples),
+        'server': {
+            'process': sampler.summary() if sampler else None,
+            'metrics_delta': metrics_delta(metrics_before, metrics_after),
+            'metrics_after': metrics_after,
+        },
+    }
+
+
+def main():
+    """Point d'entrée du script"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Test de charge de l'API chat")
+    parser.add_argument("scenario", help="Fichier de scénario (ex. loadtest/scenarios/mixed.json)")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="URL du backend")
+    parser.add_argument("--seed", type=int, default=42, help="Graine des tirages (questions, clés, pauses)")
+    parser.add_argument("--server-pid", type=int, default=None,
+                        help="PID du processus uvicorn (CPU / mémoire via psutil)")
+    parser.add_argument("--duration", type=float, default=None, help="Remplace duration_seconds")
+    parser.add_argument("--users", type=int, default=None, help="Remplace users")
+    parser.add_argument("--warmup", type=float, default=None, help="Remplace warmup_seconds")
+    parser.add_argument("--baseline", default=None,
+                        help="Baseline à comparer (défaut : loadtest/baselines/<scénario>.json si présente)")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistre ce run comme baseline")
+    parser.add_argument("--output", default=None, help="Rapport JSON (défaut : benchmarks/load_<scénario>_<date>.json)")
+
+    args = parser.parse_args()
+    scenario = load_scenario(args.scenario)
+    if args.duration:
+        scenario['duration_seconds'] = args.duration
+    if args.users:
+        scenario['users'] = args.users
+    if args.warmup is not None:
+        scenario['warmup_seconds'] = args.warmup
+
+    report = asyncio.run(run_scenario(scenario, args.base_url.rstrip("/"), args.seed, args.server_pid))
+    summary = report['summary']
+    if not summary['requests']:
+        logger.error("❌ Aucune requête dans la fenêtre de mesure (durée trop courte ?)")
+        sys.exit(1)
+
+    latency = summary.get('latency_ms', {})
+    logger.info(f"📊 {summary['requests']} requêtes, {summary['throughput_rps']} req/s, "
+                f"p50 {latency.get('p50')} ms, p95 {latency.get('p95')} ms, p99 {latency.get('p99')} ms, "
+                f"erreurs {summary['error_rate']:.2%} {report['statuses']}")
+    if report['server']['process']:
+        process = report['server']['process']
+        logger.info(f"🖥️ Serveur: CPU moy. {process['cpu_percent_avg']}% (max {process['cpu_percent_max']}%), "
+                    f"RSS max {process['rss_mb_max']} Mo")
+
+    baseline_path = Path(args.baseline or f"loadtest/baselines/{scenario['name']}.json")
+    regressions = None
+    if not args.save_baseline and baseline_path.exists():
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('config') != report['config']:
+            logger.warning("⚠️ Scénario différent de celui de la baseline : comparaison indicative")
+        regressions = compare_to_baseline(summary, baseline['summary'], scenario['thresholds'])
+        report['baseline'] = {'file': str(baseline_path), 'recorded': baseline.get('timestamp'),
+                              'thresholds': scenario['thresholds'], 'regressions': regressions}
+        for regression in regressions:
+            logger.error(f"❌ Régression {regression['metric']}: {regression['current']} "
+                         f"(baseline {regression['baseline']}, limite {regression['limit']})")
+        if not regressions:
+            logger.info(f"✅ Aucune régression par rapport à {baseline_path}")
+    elif not args.save_baseline:
+        logger.info(f"ℹ️ Pas de baseline ({baseline_path}) : lancer avec --save-baseline pour en créer une")
+
+    output = Path(args.output or f"benchmarks/load_{scenario['name']}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Rapport écrit dans {output}")
+
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump({key: report[key] for key in ('timestamp', 'scenario', 'seed', 'config', 'summary', 'statuses')},
+                      f, indent=2, ensure_ascii=False)
+        logger.info(f"💾 Baseline enregistrée dans {baseline_path}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
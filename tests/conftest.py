@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Modules importés comme les scripts : from backend.<module> import ...
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Découpe des documents en chunks (tokens du modèle d'embeddings, offsets et pages)"""
+
+import re
+
+import pytest
+
+from backend.document_processor import chunk_text, iter_chunks, iter_chunks_tokens
+
+
+class WordTokenizer:
+    """Tokenizer de test : un token par mot, deux tokens spéciaux ([CLS], [SEP])"""
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=True):
+        return {'offset_mapping': [[m.span() for m in re.finditer(r"\S+", text)] for text in texts]}
+
+
+def _n_tokens(text):
+    return len(text.split())
+
+
+def _sentence(i, words=8):
+    return " ".join(f"mot{i}_{j}" for j in range(words - 1)) + f" fin{i}."
+
+
+def test_token_chunks_fit_the_model_and_end_on_sentences():
+    text = " ".join(_sentence(i) for i in range(30))
+    chunks = list(iter_chunks_tokens(text, WordTokenizer(), max_tokens=34, overlap_tokens=8))
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert _n_tokens(chunk.text) <= 32
+        assert chunk.text.endswith(".")
+        assert text[chunk.start:chunk.end] == chunk.text
+    # Tout le texte est couvert, dans l'ordre
+    assert chunks[0].start == 0 and chunks[-1].end == len(text)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.start < chunk.start <= previous.end
+
+
+def test_token_overlap_repeats_whole_sentences():
+    text = " ".join(_sentence(i) for i in range(12))
+    first, second, *_ = iter_chunks_tokens(text, WordTokenizer(), max_tokens=26, overlap_tokens=8)
+    # 24 tokens de budget : 3 phrases, puis la dernière est reprise
+    assert first.text == " ".join(_sentence(i) for i in range(3))
+    assert second.text.startswith(_sentence(2))
+
+
+def test_paragraph_end_cuts_a_well_filled_chunk():
+    paragraph = " ".join(_sentence(i) for i in range(3))
+    text = paragraph + "\n\n" + " ".join(_sentence(i) for i in range(3, 5))
+    chunks = list(iter_chunks_tokens(text, WordTokenizer(), max_tokens=34, overlap_tokens=0))
+    assert [chunk.text for chunk in chunks] == [paragraph, text[len(paragraph) + 2:]]
+
+
+def test_long_sentence_is_split_on_token_boundaries():
+    text = " ".join(f"mot{i}" for i in range(50)) + "."
+    chunks = list(iter_chunks_tokens(text, WordTokenizer(), max_tokens=12, overlap_tokens=0))
+    assert [_n_tokens(chunk.text) for chunk in chunks] == [10, 10, 10, 10, 10]
+    assert " ".join(chunk.text for chunk in chunks) == text
+
+
+@pytest.mark.parametrize("text", ["", "   \n\n  "])
+def test_empty_text(text):
+    assert list(iter_chunks_tokens(text, WordTokenizer())) == []
+
+
+# ==========================================
+# CHUNKS DE MOTS : OFFSETS ET PAGES
+# ==========================================
+
+def test_word_chunks_are_slices_of_the_source():
+    text = "  " + "\n".join(f"mot{i}  suivant{i}" for i in range(40)) + "\n "
+    chunks = list(iter_chunks(text, chunk_size=20, overlap=5))
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+        assert chunk.text == chunk.text.strip()
+        assert len(chunk.text.split()) <= 20
+    words = text.split()
+    # Pas de 15 mots, 5 mots de chevauchement
+    assert [chunk.text.split()[0] for chunk in chunks] == words[::15][:len(chunks)]
+    assert chunks[-1].text.split()[-1] == words[-1]
+
+
+def test_no_partial_chunk_without_new_words():
+    text = " ".join(f"w{i}" for i in range(25))
+    assert [len(c.split()) for c in chunk_text(text, chunk_size=10, overlap=5)] == [10, 10, 10, 10]
+    assert [len(c.split()) for c in chunk_text(text, chunk_size=10, overlap=0)] == [10, 10, 5]
+
+
+def test_pages_from_extractor_markers():
+    text = ("Intro\n--- Page 1 ---\n" + "un " * 10 + "\n--- Page 2 ---\n" + "deux " * 10
+            + "\n=== Slide 7 ===\n" + "trois " * 10)
+    pages = [chunk.page for chunk in iter_chunks(text, chunk_size=10, overlap=0)]
+    # Page du début de chunk ; le texte avant le premier marqueur appartient à la première page
+    # (les marqueurs comptent comme des mots : le 4e chunk commence dans "=== Slide 7 ===")
+    assert pages == [1, 1, 2, 7, 7]
+    assert {chunk.page for chunk in iter_chunks("sans marqueur " * 5, chunk_size=4, overlap=0)} == {None}
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        list(iter_chunks("texte", chunk_size=10, overlap=10))
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Assemblage du contexte sous budget de tokens et réduction de l'historique"""
+
+from backend.context_packer import CHARS_PER_TOKEN, ContextPacker, TokenCounter
+from backend.document_processor import _iter_sentences
+from backend.prompt_builder import NO_CONTEXT, PromptBuilder
+
+COUNTER = TokenCounter()  # estimation, sans tokenizer
+
+
+def _doc(doc_id, content, source="guide.pdf", char_start=0):
+    return {'id': doc_id, 'content': content, 'source': source, 'page': None,
+            'char_start': char_start, 'char_end': char_start + len(content)}
+
+
+def _label(doc):
+    return doc['source']
+
+
+VPN = ("Le poste de travail démarre normalement. "
+       "Pour se connecter au VPN, ouvrir FortiClient et saisir son identifiant. "
+       "En cas d'erreur 0x80070005, redémarrer le service. "
+       "La session expire après huit heures. "
+       "Les imprimantes sont gérées par le service logistique.")
+
+
+def test_counter_estimate():
+    assert COUNTER.count("") == 0
+    assert COUNTER.count("a" * (CHARS_PER_TOKEN * 3 + 1)) == 4
+    assert COUNTER.count_messages([{'content': "abcd"}]) == 1 + 1 + TokenCounter.MESSAGE_OVERHEAD
+
+
+def test_pack_keeps_passage_that_fits_whole():
+    packer = ContextPacker(COUNTER, sentence_window=1)
+    packed = packer.pack("erreur 0x80070005", [_doc("a", VPN, char_start=100)], 1000, _label)
+
+    passage = packed.documents[0]
+    assert passage['content'] == VPN
+    assert (passage['char_start'], passage['char_end']) == (100, 100 + len(VPN))
+    assert packed.text == "[Source: guide.pdf]\n" + VPN
+    assert packed.tokens == COUNTER.count(packed.text)
+    assert packed.dropped == 0
+
+
+def test_pack_trims_overflowing_passage_around_best_sentence():
+    packer = ContextPacker(COUNTER, sentence_window=1, max_passage_tokens=50)
+    packed = packer.pack("erreur 0x80070005", [_doc("a", VPN, char_start=100)], 1000, _label)
+
+    passage = packed.documents[0]
+    assert passage['content'].startswith("Pour se connecter au VPN")
+    assert passage['content'].endswith("huit heures.")
+    assert "imprimantes" not in packed.text
+    assert packed.text.startswith("[Source: guide.pdf]\n")
+    assert VPN[passage['char_start'] - 100:passage['char_end'] - 100] == passage['content']
+    assert packed.tokens == COUNTER.count(packed.text) <= 50
+
+
+PROCEDURE = ("Réinitialiser le mot de passe :\n"
+             "1. Ouvrir le portail libre-service.\n"
+             "2. Cliquer sur « Mot de passe oublié ».\n"
+             "3. Saisir le code reçu par SMS.\n"
+             "4. Choisir un nouveau mot de passe.\n"
+             "5. Se reconnecter à la session.\n"
+             "6. Verrouiller puis déverrouiller le poste.\n"
+             "7. Vérifier l'accès à la messagerie.")
+
+
+def test_numbered_procedure_is_not_cut_to_a_window():
+    packer = ContextPacker(COUNTER, sentence_window=2)
+    packed = packer.pack("code SMS", [_doc("a", PROCEDURE)], 1000, _label)
+    assert packed.documents[0]['content'] == PROCEDURE
+
+
+def test_bare_newline_and_list_numbers_are_not_sentence_ends():
+    sentences = [PROCEDURE[start:end] for start, end, _ in _iter_sentences(PROCEDURE)]
+    assert sentences[0] == "Réinitialiser le mot de passe :"
+    assert sentences[1] == "1. Ouvrir le portail libre-service."
+    assert sentences[-1] == "7. Vérifier l'accès à la messagerie."
+    assert len(sentences) == 8
+
+    paragraphs = "Première ligne\nsuite de la phrase\n\nNouveau paragraphe"
+    assert [end for _, _, end in _iter_sentences(paragraphs)] == [True, True]
+
+
+def test_pack_skips_repeated_sentences():
+    packer = ContextPacker(COUNTER, sentence_window=1)
+    packed = packer.pack("erreur 0x80070005", [_doc("a", VPN), _doc("b", VPN, source="copie.pdf")], 1000, _label)
+    assert [doc['id'] for doc in packed.documents] == ["a"]
+    assert packed.dropped == 1
+
+
+def test_pack_respects_budget():
+    packer = ContextPacker(COUNTER, sentence_window=2)
+    documents = [_doc(str(i), f"Procédure {i}. " + VPN) for i in range(5)]
+    packed = packer.pack("erreur 0x80070005", documents, 60, _label)
+    assert packed.tokens <= 60
+    assert packed.documents
+    assert len(packed.documents) + packed.dropped == 5
+
+
+def test_pack_empty_budget_drops_everything():
+    packed = ContextPacker(COUNTER).pack("vpn", [_doc("a", VPN)], 0, _label)
+    assert packed.documents == [] and packed.text == ""
+
+
+def _history(turns, size):
+    history = []
+    for i in range(turns):
+        history.append({'role': "user", 'content': f"question {i} " + "x" * size})
+        history.append({'role': "assistant", 'content': f"réponse {i} " + "y" * size})
+    return history
+
+
+def test_fit_keeps_short_history():
+    builder = PromptBuilder(COUNTER, history_messages=4)
+    history = _history(3, 10)
+    kept, summary, tokens = builder.fit("vpn ?", history, 'fr', "résumé", 10_000)
+    assert kept == history[-4:]
+    assert summary == "résumé"
+    assert tokens == COUNTER.count_messages(builder.build("", "vpn ?", history, 'fr', "résumé"))
+
+
+def test_fit_drops_oldest_turns_then_summary():
+    builder = PromptBuilder(COUNTER, history_messages=4)
+    history = _history(2, 500)  # ~255 tokens par tour
+    summary = "z" * 400  # ~115 tokens avec l'en-tête
+    base = COUNTER.count_messages(builder.build("", "vpn ?", [], 'fr', None))
+
+    kept, kept_summary, tokens = builder.fit("vpn ?", history, 'fr', summary, base + 400)
+    assert kept == history[-2:] and kept_summary == summary
+    assert tokens <= base + 400
+
+    kept, kept_summary, _ = builder.fit("vpn ?", history, 'fr', summary, base + 200)
+    assert kept == [] and kept_summary == summary
+
+    kept, kept_summary, tokens = builder.fit("vpn ?", history, 'fr', summary, base)
+    assert kept == [] and kept_summary is None and tokens == base
+
+
+def test_long_conversation_keeps_documents():
+    """Régression : une conversation longue ne doit pas vider le contexte"""
+    prompt_budget, context_budget, min_budget = 3000, 1500, 500
+    builder = PromptBuilder(COUNTER, history_messages=5)
+    history = _history(3, 2500)
+
+    _, _, base = builder.fit("erreur 0x80070005 ?", history, 'fr', "s" * 1600, prompt_budget - min_budget)
+    budget = max(min_budget, min(context_budget, prompt_budget - base))
+    packed = ContextPacker(COUNTER).pack("erreur 0x80070005", [_doc("a", VPN)], budget, _label)
+
+    assert base <= prompt_budget - min_budget
+    assert [doc['id'] for doc in packed.documents] == ["a"]
+    assert NO_CONTEXT not in packed.text
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Déduplication des chunks : ajout, retrait de source et réindexation incrémentale"""
+
+from pathlib import Path
+
+import json
+
+from backend.deduplication import ChunkDeduplicator, SOURCE_METADATA_KEY, make_chunk_id, join_sources, split_sources
+from backend.vector_store import source_key
+
+
+def _text(topic: str, n: int = 30) -> str:
+    return " ".join(f"{topic}{i}" for i in range(n))
+
+
+SHARED = _text("partage")
+
+
+class FakeCollection:
+    """Collection minimale : upsert par identifiant et suppression par source, comme la base vectorielle"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def upsert(self, entries):
+        for entry in entries:
+            self.rows[entry['id']] = {'text': entry['text'], 'metadata': dict(entry['metadata'])}
+
+    def update_metadata(self, entries):
+        for entry in entries:
+            self.rows[entry['id']]['metadata'] = dict(entry['metadata'])
+
+    def delete_source(self, source):
+        for chunk_id in [i for i, row in self.rows.items() if row['metadata']['source'] == source]:
+            del self.rows[chunk_id]
+
+    def texts_by_source(self):
+        return {row['text']: split_sources(row['metadata']['sources']) for row in self.rows.values()}
+
+
+def _entries(source, texts):
+    stem = Path(source).stem
+    return [{'id': make_chunk_id(stem, i, text), 'text': text, 'metadata': {'source': source}}
+            for i, text in enumerate(texts)]
+
+
+def _index(dedup, collection, source, texts):
+    new, changed, report = dedup.add_entries(_entries(source, texts))
+    collection.upsert(new)
+    collection.update_metadata(changed)
+    return report
+
+
+def _reindex(dedup, collection, source, texts):
+    # Même séquence que l'indexation incrémentale du backend (_remove_document_chunks puis écriture)
+    collection.update_metadata(dedup.remove_source(source))
+    collection.delete_source(source)
+    return _index(dedup, collection, source, texts)
+
+
+def _live(dedup):
+    return [(entry['id'], entry['sources']) for entry in dedup._entries.values()]
+
+
+def test_sources_roundtrip():
+    assert split_sources(join_sources(["a.pdf", "b.docx"])) == ["a.pdf", "b.docx"]
+    assert split_sources(None) == []
+
+
+def test_signature_similarity():
+    dedup = ChunkDeduplicator()
+    assert dedup.similarity(dedup.signature(SHARED), dedup.signature(SHARED)) == 1.0
+    assert dedup.similarity(dedup.signature(SHARED), dedup.signature(_text("autre"))) < 0.2
+
+
+def test_near_duplicates_are_merged():
+    dedup = ChunkDeduplicator()
+    collection = FakeCollection()
+    _index(dedup, collection, "A.pdf", [_text("alpha"), SHARED])
+    report = _index(dedup, collection, "B.pdf", [_text("beta"), SHARED.upper()])
+
+    assert report == {'chunks_in': 2, 'chunks_kept': 1, 'chunks_removed': 1, 'chars_removed': len(SHARED)}
+    assert collection.texts_by_source()[SHARED] == ["A.pdf", "B.pdf"]
+    assert len(collection.rows) == 3
+
+
+def test_remove_source_keeps_shared_chunks():
+    dedup = ChunkDeduplicator()
+    collection = FakeCollection()
+    _index(dedup, collection, "A.pdf", [_text("alpha"), SHARED])
+    _index(dedup, collection, "B.pdf", [_text("beta"), SHARED])
+
+    updated = dedup.remove_source("A.pdf")
+    assert [entry['metadata']['source'] for entry in updated] == ["B.pdf"]
+    assert updated[0]['metadata']['duplicates'] == 0
+    assert sorted(sources for _, sources in _live(dedup)) == [["B.pdf"], ["B.pdf"]]
+
+
+def test_edit_document_sharing_a_chunk():
+    """Régression : réindexer A ne doit pas écraser le chunk qu'il partageait avec B"""
+    dedup = ChunkDeduplicator()
+    collection = FakeCollection()
+    _index(dedup, collection, "A.pdf", [_text("alpha"), SHARED])
+    _index(dedup, collection, "B.pdf", [_text("beta"), SHARED])
+
+    # A modifié : son deuxième chunk change, B garde le chunk partagé
+    _reindex(dedup, collection, "A.pdf", [_text("alpha"), _text("nouveau")])
+
+    assert collection.texts_by_source() == {
+        _text("alpha"): ["A.pdf"],
+        _text("nouveau"): ["A.pdf"],
+        _text("beta"): ["B.pdf"],
+        SHARED: ["B.pdf"],
+    }
+    live_ids = [chunk_id for chunk_id, _ in _live(dedup)]
+    assert len(live_ids) == len(set(live_ids)) == len(collection.rows)
+    assert set(live_ids) == set(collection.rows)
+
+
+def test_edit_document_keeping_shared_chunk():
+    dedup = ChunkDeduplicator()
+    collection = FakeCollection()
+    _index(dedup, collection, "A.pdf", [_text("alpha"), SHARED])
+    _index(dedup, collection, "B.pdf", [_text("beta"), SHARED])
+
+    _reindex(dedup, collection, "A.pdf", [_text("alpha2"), SHARED])
+
+    assert collection.texts_by_source()[SHARED] == ["B.pdf", "A.pdf"]
+    assert len(collection.rows) == 3
+
+
+def test_load_restores_sources():
+    dedup = ChunkDeduplicator()
+    dedup.load([{'id': "A_chunk_0", 'text': SHARED,
+                 'metadata': {'source': "A.pdf", 'sources': join_sources(["A.pdf", "B.pdf"]), 'duplicates': 1}}])
+    new, changed, _ = dedup.add_entries(_entries("C.pdf", [SHARED]))
+    assert new == []
+    assert changed[0]['sources'] == ["A.pdf", "B.pdf", "C.pdf"]
+
+
+def _located(source, texts, page, tag):
+    """Chunks avec métadonnées propres au document (offsets, page, type, tag, date)"""
+    entries = _entries(source, texts)
+    for i, entry in enumerate(entries):
+        entry['metadata'].update({'char_start': 100 * page + i, 'char_end': 100 * page + i + 50, 'page': page,
+                                  'file_type': source.rsplit(".", 1)[1], f"tag_{tag}": True,
+                                  'doc_date': 20240100 + page})
+    return entries
+
+
+def test_removed_primary_hands_over_its_own_metadata():
+    """Régression : le chunk partagé prend les offsets, la page, le type, les tags et la date de B"""
+    dedup = ChunkDeduplicator()
+    collection = FakeCollection()
+    collection.upsert(dedup.add_entries(_located("A.pdf", [_text("alpha"), SHARED], page=1, tag="ancien"))[0])
+    new, changed, _ = dedup.add_entries(_located("B.docx", [SHARED], page=7, tag="nouveau"))
+    collection.upsert(new)
+    collection.update_metadata(changed)
+    assert changed[0]['metadata']['source'] == "A.pdf" and changed[0]['metadata']['page'] == 1
+
+    collection.update_metadata(dedup.remove_source("A.pdf"))
+    collection.delete_source("A.pdf")
+
+    (row,) = collection.rows.values()
+    metadata = row['metadata']
+    assert {key: metadata[key] for key in ('source', 'char_start', 'char_end', 'page', 'file_type', 'doc_date')} == {
+        'source': "B.docx", 'char_start': 700, 'char_end': 750, 'page': 7, 'file_type': "docx", 'doc_date': 20240107}
+    assert metadata['tag_nouveau'] is True and 'tag_ancien' not in metadata
+    assert split_sources(metadata['sources']) == ["B.docx"]
+    assert list(json.loads(metadata[SOURCE_METADATA_KEY])) == ["B.docx"]
+
+
+def test_per_source_metadata_survives_reload():
+    dedup = ChunkDeduplicator()
+    new, _, _ = dedup.add_entries(_located("A.pdf", [SHARED], page=1, tag="a"))
+    _, changed, _ = dedup.add_entries(_located("B.pdf", [SHARED], page=2, tag="b"))
+    stored = {'id': new[0]['id'], 'text': SHARED, 'metadata': changed[0]['metadata']}
+
+    reloaded = ChunkDeduplicator()
+    reloaded.load([stored])
+    (entry,) = reloaded.remove_source("A.pdf")
+    assert entry['metadata']['page'] == 2 and entry['metadata']['tag_b'] is True
+
+
+def test_removed_chunks_leave_no_slots_or_buckets():
+    dedup = ChunkDeduplicator()
+    for round_ in range(5):
+        dedup.add_entries(_entries("A.pdf", [_text(f"version{round_}_{i}") for i in range(4)]))
+        dedup.remove_source("A.pdf")
+    assert len(dedup) == 0
+    assert not dedup._signatures and not dedup._buckets
+
+    dedup.add_entries(_entries("A.pdf", [SHARED]))
+    dedup.add_entries(_entries("B.pdf", [_text("beta")]))
+    dedup.remove_source("B.pdf")
+    assert len(dedup) == 1
+    assert sum(len(bucket) for bucket in dedup._buckets.values()) == dedup.bands
+
+
+def test_every_source_gets_a_filter_key():
+    dedup = ChunkDeduplicator()
+    collection = FakeCollection()
+    _index(dedup, collection, "ancien.pdf", [SHARED])
+    _index(dedup, collection, "nouveau.pdf", [SHARED, _text("ajout")])
+
+    shared = next(row['metadata'] for row in collection.rows.values() if row['text'] == SHARED)
+    assert shared['source'] == "ancien.pdf"
+    assert shared[source_key("ancien.pdf")] is True and shared[source_key("nouveau.pdf")] is True
+
+    collection.update_metadata(dedup.remove_source("ancien.pdf"))
+    shared = next(row['metadata'] for row in collection.rows.values() if row['text'] == SHARED)
+    assert source_key("ancien.pdf") not in shared and shared[source_key("nouveau.pdf")] is True
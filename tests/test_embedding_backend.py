@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""Modèle d'embeddings : encodeur ONNX, vecteurs sondes, partage entre threads"""
+
+import json
+import sys
+import time
+import types
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from backend.embedding_backend import (
+    ONNX_CONFIG_FILE, OnnxSentenceEncoder, SerializedEncoder,
+    check_embedding_compatibility, save_embedding_probe
+)
+from backend.embedding_batcher import LengthBucketedEncoder
+
+
+class BorrowingTokenizer:
+    """Comme un tokenizer rapide HuggingFace : un seul appel à la fois"""
+
+    def __init__(self):
+        self._busy = False
+
+    def __call__(self, texts, **kwargs):
+        if self._busy:
+            raise RuntimeError("Already borrowed")
+        self._busy = True
+        try:
+            time.sleep(0.005)
+            return {'input_ids': [[0] * (len(text.split()) + 2) for text in texts]}
+        finally:
+            self._busy = False
+
+
+class FakeModel:
+    max_seq_length = 128
+
+    def __init__(self):
+        self.tokenizer = BorrowingTokenizer()
+
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+    def encode(self, sentences, **kwargs):
+        self.tokenizer(sentences)
+        return np.ones((len(sentences), 4), dtype=np.float32)
+
+
+def _hammer(fn, n=40):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return [f.result() for f in [executor.submit(fn, i) for i in range(n)]]
+
+
+def test_concurrent_encode_is_serialized():
+    model = SerializedEncoder(FakeModel())
+    results = _hammer(lambda i: model.encode([f"question {i}"]))
+    assert all(r.shape == (1, 4) for r in results)
+    assert model.max_seq_length == 128 and model.get_sentence_embedding_dimension() == 4
+
+
+def test_unserialized_model_fails_under_concurrency():
+    """Contrôle du test précédent : sans verrou, le tokenizer partagé est emprunté deux fois"""
+    model = FakeModel()
+    errors = []
+
+    def encode(i):
+        try:
+            model.encode([f"question {i}"])
+        except RuntimeError as e:
+            errors.append(e)
+
+    _hammer(encode)
+    assert errors
+
+
+def test_bucketed_encoder_tokenizes_with_its_own_copy():
+    model = SerializedEncoder(FakeModel())
+    encoder = LengthBucketedEncoder(model, batch_size=2)
+    assert encoder._tokenizer is not model.tokenizer
+
+    barrier = threading.Barrier(2)
+
+    def ingest(_):
+        barrier.wait()
+        return encoder.encode(["un deux trois", "un", "un deux"])
+
+    def query(_):
+        barrier.wait()
+        return model.encode(["question"])
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for _ in range(20):
+            barrier.reset()
+            embedded, queried = executor.submit(ingest, 0), executor.submit(query, 0)
+            assert embedded.result().shape == (3, 4) and queried.result().shape == (1, 4)
+
+
+# ==========================================
+# ENCODEUR ONNX (onnxruntime et tokenizer factices)
+# ==========================================
+
+DIM = 3
+
+
+class FakeTokenizer:
+    """Un token par mot (id = longueur du mot), remplissage à droite avec l'id 0"""
+
+    def __call__(self, texts, padding=True, truncation=True, max_length=None, return_tensors="np"):
+        ids = [[len(word) for word in text.split()][:max_length] for text in texts]
+        width = max(len(row) for row in ids)
+        return {
+            'input_ids': np.array([row + [0] * (width - len(row)) for row in ids]),
+            'attention_mask': np.array([[1] * len(row) + [0] * (width - len(row)) for row in ids]),
+            'token_type_ids': np.zeros((len(ids), width), dtype=np.int64),
+        }
+
+
+class FakeSession:
+    """États cachés : [id, 1, 0] par token ; les tokens de remplissage valent 1000"""
+
+    runs = []
+
+    def __init__(self, path, options, providers=None):
+        self.path = path
+
+    def get_inputs(self):
+        return [types.SimpleNamespace(name="input_ids"), types.SimpleNamespace(name="attention_mask")]
+
+    def run(self, output_names, feeds):
+        type(self).runs.append(sorted(feeds))
+        ids = feeds['input_ids'].astype(np.float32)
+        hidden = np.stack([ids, np.ones_like(ids), np.zeros_like(ids)], axis=-1)
+        hidden[feeds['attention_mask'] == 0] = 1000.0
+        return [hidden]
+
+
+@pytest.fixture
+def onnx_dir(tmp_path, monkeypatch):
+    ort = types.ModuleType("onnxruntime")
+    ort.SessionOptions = types.SimpleNamespace
+    ort.GraphOptimizationLevel = types.SimpleNamespace(ORT_ENABLE_ALL="all")
+    ort.ExecutionMode = types.SimpleNamespace(ORT_SEQUENTIAL="sequential")
+    ort.InferenceSession = FakeSession
+    transformers = types.ModuleType("transformers")
+    transformers.AutoTokenizer = types.SimpleNamespace(from_pretrained=lambda path: FakeTokenizer())
+    monkeypatch.setitem(sys.modules, "onnxruntime", ort)
+    monkeypatch.setitem(sys.modules, "transformers", transformers)
+    FakeSession.runs = []
+
+    (tmp_path / ONNX_CONFIG_FILE).write_text(json.dumps(
+        {'model_name': "fake-minilm", 'max_seq_length': 4, 'normalize': False, 'dimension': DIM}
+    ), encoding='utf-8')
+    (tmp_path / "model.onnx").write_bytes(b"")
+    return tmp_path
+
+
+def test_onnx_mean_pooling_ignores_padding(onnx_dir):
+    encoder = OnnxSentenceEncoder(str(onnx_dir))
+    vectors = encoder.encode(["ab abcd", "abcdef"], batch_size=8)
+
+    assert vectors.dtype == np.float32 and vectors.shape == (2, DIM)
+    np.testing.assert_allclose(vectors, [[3.0, 1.0, 0.0], [6.0, 1.0, 0.0]])
+    # Seules les entrées déclarées par le graphe sont transmises
+    assert FakeSession.runs == [["attention_mask", "input_ids"]]
+    assert encoder.backend == "onnx" and encoder.get_sentence_embedding_dimension() == DIM
+
+
+def test_onnx_batches_truncation_and_single_sentence(onnx_dir):
+    config = json.loads((onnx_dir / ONNX_CONFIG_FILE).read_text(encoding='utf-8'))
+    (onnx_dir / ONNX_CONFIG_FILE).write_text(json.dumps(dict(config, normalize=True)), encoding='utf-8')
+    encoder = OnnxSentenceEncoder(str(onnx_dir))
+
+    vectors = encoder.encode([f"mot{i}" for i in range(5)], batch_size=2)
+    assert vectors.shape == (5, DIM) and len(FakeSession.runs) == 3
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+
+    # max_seq_length = 4 : les mots suivants sont tronqués
+    single = encoder.encode("a a a a bbbbbbbbbb")
+    assert single.shape == (DIM,)
+    np.testing.assert_allclose(single, np.array([1.0, 1.0, 0.0]) / np.sqrt(2), rtol=1e-6)
+
+
+def test_onnx_missing_model_names_the_export_script(onnx_dir):
+    with pytest.raises(FileNotFoundError, match="export_onnx_model.py"):
+        OnnxSentenceEncoder(str(onnx_dir), quantized=True)
+
+
+# ==========================================
+# VECTEURS SONDES
+# ==========================================
+
+class ProbeModel:
+    """Vecteurs déterministes par texte ; `rotate` simule un autre modèle, `dimension` un autre format"""
+
+    def __init__(self, rotate=0.0, noise=0.0, dimension=8):
+        self.rotate, self.noise, self.dimension = rotate, noise, dimension
+
+    def encode(self, texts, **kwargs):
+        vectors = []
+        for text in texts:
+            rng = np.random.default_rng(sum(text.encode('utf-8')))
+            vector = rng.normal(size=self.dimension)
+            vector += self.noise * np.random.default_rng(len(text)).normal(size=self.dimension)
+            if self.rotate:
+                vector = np.roll(vector, 1) * np.cos(self.rotate) + vector * np.sin(self.rotate)
+            vectors.append(vector)
+        return np.array(vectors, dtype=np.float32)
+
+
+def test_probe_without_file_is_unknown(tmp_path):
+    assert check_embedding_compatibility(ProbeModel(), tmp_path / "absent.json") == {
+        'compatible': None, 'min_cosine': None, 'indexed_with': None
+    }
+
+
+def test_probe_accepts_same_model_and_small_numeric_drift(tmp_path):
+    path = tmp_path / "probe" / "embedding_probe.json"
+    save_embedding_probe(ProbeModel(), path, "torch:all-MiniLM-L6-v2")
+
+    same = check_embedding_compatibility(ProbeModel(), path)
+    assert same['compatible'] is True and same['min_cosine'] == pytest.approx(1.0)
+    assert same['indexed_with'] == "torch:all-MiniLM-L6-v2"
+
+    # Export ONNX / quantification : faible écart numérique
+    drift = check_embedding_compatibility(ProbeModel(noise=0.01), path)
+    assert drift['compatible'] is True and drift['min_cosine'] < 1.0
+
+
+def test_probe_rejects_other_model_or_dimension(tmp_path):
+    path = tmp_path / "embedding_probe.json"
+    save_embedding_probe(ProbeModel(), path, "torch:all-MiniLM-L6-v2")
+
+    other = check_embedding_compatibility(ProbeModel(rotate=0.3), path)
+    assert other['compatible'] is False and other['min_cosine'] < 0.99
+
+    resized = check_embedding_compatibility(ProbeModel(dimension=16), path, min_cosine=0.0)
+    assert resized == {'compatible': False, 'min_cosine': None, 'indexed_with': "torch:all-MiniLM-L6-v2"}
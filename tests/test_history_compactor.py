@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Compaction de l'historique : résumé extractif borné, résumé du modèle léger en arrière-plan"""
+
+import pytest
+
+from backend.context_packer import TokenCounter
+from backend.history_compactor import HistoryCompactor
+
+COUNTER = TokenCounter()  # estimation, sans tokenizer
+
+
+class DeferredExecutor:
+    """Exécuteur manuel : les tâches soumises tournent à l'appel de run()"""
+
+    def __init__(self):
+        self.tasks = []
+
+    def submit(self, fn, *args):
+        self.tasks.append((fn, args))
+
+    def run(self):
+        tasks, self.tasks = self.tasks, []
+        for fn, args in tasks:
+            fn(*args)
+
+
+def _session(turns):
+    history = []
+    for i in range(turns):
+        history.append({'role': "user", 'content': f"Question {i} sur le VPN ?"})
+        history.append({'role': "assistant", 'content': f"Réponse {i}. Détails longs de la procédure {i}."})
+    return {'chat_history': history}
+
+
+def test_short_history_is_left_alone():
+    session = _session(1)
+    HistoryCompactor(COUNTER, keep_messages=2).compact(session)
+    assert len(session['chat_history']) == 2
+    assert 'summary' not in session
+
+
+def test_extractive_summary_keeps_question_and_first_sentence():
+    compactor = HistoryCompactor(COUNTER, keep_messages=2)
+    session = _session(3)
+    compactor.compact(session)
+
+    assert session['chat_history'] == _session(3)['chat_history'][-2:]
+    assert session['summary'].splitlines() == [
+        "- User: Question 0 sur le VPN ?",
+        "  Assistant: Réponse 0.",
+        "- User: Question 1 sur le VPN ?",
+        "  Assistant: Réponse 1.",
+    ]
+    assert session['summary_version'] == 1
+    assert compactor.get_stats()['compactions'] == 1
+
+
+def test_summary_stays_bounded_over_a_long_session():
+    compactor = HistoryCompactor(COUNTER, keep_messages=2, max_summary_tokens=40)
+    session = {'chat_history': []}
+    for i in range(30):
+        session['chat_history'] += _session(30)['chat_history'][2 * i:2 * i + 2]
+        compactor.compact(session)
+
+    assert len(session['chat_history']) == 2
+    assert COUNTER.count(session['summary']) <= 40
+    # Tours les plus récents gardés, jamais une réponse orpheline en tête
+    assert session['summary'].startswith("- User:")
+    assert "Question 28" in session['summary'] and "Question 0 " not in session['summary']
+
+
+def test_llm_mode_requires_summarize_and_executor():
+    with pytest.raises(ValueError):
+        HistoryCompactor(COUNTER, mode="llm")
+
+
+def test_llm_summary_replaces_extractive_one_in_background():
+    executor = DeferredExecutor()
+    calls = []
+
+    def summarize(previous, folded):
+        calls.append((previous, len(folded)))
+        return "L'utilisateur configure le VPN."
+
+    compactor = HistoryCompactor(COUNTER, mode="llm", keep_messages=2, summarize=summarize, executor=executor)
+    session = _session(2)
+    compactor.compact(session)
+    assert session['summary'].startswith("- User: Question 0")
+
+    executor.run()
+    assert session['summary'] == "L'utilisateur configure le VPN."
+    assert calls == [("", 2)]
+    assert compactor.get_stats()['llm_summaries'] == 1
+
+
+def test_stale_or_failed_llm_summary_keeps_current_one():
+    executor = DeferredExecutor()
+    compactor = HistoryCompactor(COUNTER, mode="llm", keep_messages=2,
+                                 summarize=lambda previous, folded: "résumé périmé", executor=executor)
+    session = _session(2)
+    compactor.compact(session)
+    session['chat_history'] += _session(3)['chat_history'][-2:]
+    compactor.compact(session)
+    extractive = session['summary']
+
+    # Le premier résumé arrive après la seconde compaction : ignoré
+    executor.tasks = executor.tasks[:1]
+    executor.run()
+    assert session['summary'] == extractive
+
+    def fail(previous, folded):
+        raise TimeoutError("modèle léger indisponible")
+
+    compactor.summarize = fail
+    other = _session(2)
+    compactor.compact(other)
+    extractive = other['summary']
+    executor.run()
+    assert other['summary'] == extractive
+    assert compactor.get_stats()['llm_failures'] == 1
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Pipeline d'ingestion par étages : lots, backpressure et arrêt sur erreur"""
+
+import threading
+import time
+
+import pytest
+
+from backend.ingestion_pipeline import IngestionPipeline
+
+CHUNKS_PER_FILE = 3
+
+
+def _extract(path):
+    return {'file_path': path, 'success': not path.startswith("bad"), 'text': path}
+
+
+def _prepare(result):
+    if not result['success']:
+        return []
+    return [{'id': f"{result['file_path']}-{i}", 'text': f"{result['file_path']} {i}", 'metadata': {}}
+            for i in range(CHUNKS_PER_FILE)]
+
+
+def _encode(texts):
+    return [[float(len(text))] for text in texts]
+
+
+def test_all_chunks_written_in_bounded_batches():
+    windows, writes = [], []
+
+    def encode(texts):
+        windows.append(len(texts))
+        return _encode(texts)
+
+    def write(entries, embeddings):
+        assert len(entries) == len(embeddings)
+        writes.append([entry['id'] for entry in entries])
+
+    files = [f"doc{i}" for i in range(10)] + ["bad.pdf"]
+    pipeline = IngestionPipeline(_extract, _prepare, encode, write, extract_workers=3,
+                                 queue_size=2, embed_window=4, write_batch_size=5)
+    report = pipeline.run(files)
+
+    written = [chunk_id for batch in writes for chunk_id in batch]
+    assert sorted(written) == sorted(f"doc{i}-{j}" for i in range(10) for j in range(CHUNKS_PER_FILE))
+    assert max(windows) <= 4 and max(len(batch) for batch in writes) <= 5
+    assert report['files'] == 11
+    assert report['documents_extracted'] == 10
+    assert report['chunks_written'] == 30
+    assert report['stages']['extract']['items_out'] == 11
+
+
+def test_slow_writer_stops_extraction_early():
+    """Backpressure : l'écriture bloquée, les files bornées arrêtent l'extraction"""
+    release = threading.Event()
+    extracted = []
+
+    def extract(path):
+        extracted.append(path)
+        return _extract(path)
+
+    def write(entries, embeddings):
+        release.wait(5)
+
+    pipeline = IngestionPipeline(extract, _prepare, _encode, write, extract_workers=2,
+                                 queue_size=1, embed_window=1, write_batch_size=1)
+    reports = []
+    runner = threading.Thread(target=lambda: reports.append(pipeline.run([f"doc{i}" for i in range(50)])))
+    runner.start()
+    time.sleep(0.5)
+
+    # Fichiers en vol bornés par les files (queue_size) et un élément tenu par chaque étage
+    stalled = len(extracted)
+    assert stalled <= 8
+    time.sleep(0.3)
+    assert len(extracted) == stalled
+
+    release.set()
+    runner.join(10)
+    assert not runner.is_alive()
+    report = reports[0]
+    assert report['chunks_written'] == 50 * CHUNKS_PER_FILE
+    assert report['stages']['extract']['blocked_seconds'] > 0.3
+    assert report['stages']['chunk']['max_queue_depth'] <= 1
+
+
+def test_stage_error_aborts_pipeline():
+    def encode(texts):
+        raise RuntimeError("modèle indisponible")
+
+    pipeline = IngestionPipeline(_extract, _prepare, encode, lambda entries, embeddings: None,
+                                 queue_size=1, embed_window=2)
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match="modèle indisponible"):
+        pipeline.run([f"doc{i}" for i in range(20)])
+    assert time.perf_counter() - start < 5
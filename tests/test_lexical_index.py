@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Index lexical BM25 et fusion par rang réciproque"""
+
+import pytest
+
+from backend.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def _index():
+    index = BM25Index()
+    index.add(
+        ["vpn", "imprimante", "erreur"],
+        ["Connexion au VPN depuis l'extérieur avec FortiClient",
+         "L'imprimante du service affiche une erreur papier",
+         "Erreur 0x80070005 lors de la mise à jour de Windows"],
+        [{'source': "vpn.pdf"}, {'source': "impression.docx"}, {'source': "windows.pdf"}],
+    )
+    return index
+
+
+def test_tokenize_normalizes_and_splits_codes():
+    assert tokenize("Comment réinitialiser le mot de passe ?") == ["reinitialiser", "mot", "passe"]
+    assert tokenize("Ticket REQ-1234") == ["ticket", "req-1234", "req", "1234"]
+
+
+def test_exact_code_ranks_first():
+    results = _index().search("code 0x80070005", k=3)
+    assert [doc_id for doc_id, *_ in results] == ["erreur"]
+    doc_id, score, text, metadata = results[0]
+    assert score > 0 and "0x80070005" in text and metadata == {'source': "windows.pdf"}
+
+
+def test_rare_term_scores_higher_than_common_term():
+    scores = {doc_id: score for doc_id, score, _, _ in _index().search("erreur imprimante", k=3)}
+    # "erreur" apparaît dans deux documents, "imprimante" dans un seul
+    assert list(scores) == ["imprimante", "erreur"]
+    assert scores["imprimante"] > 2 * scores["erreur"]
+
+
+def test_unknown_or_empty_query():
+    index = _index()
+    assert index.search("bonjour", k=3) == []
+    assert index.search("le la les", k=3) == []
+    assert BM25Index().search("vpn") == []
+
+
+def test_accept_filter_applies_before_top_k():
+    results = _index().search("erreur", k=1, accept=lambda metadata: metadata['source'].endswith(".docx"))
+    assert [doc_id for doc_id, *_ in results] == ["imprimante"]
+
+
+def test_remove_and_slot_reuse():
+    index = _index()
+    index.remove(["vpn", "absent"])
+    assert len(index) == 2
+    assert index.search("forticlient") == []
+
+    index.add(["citrix"], ["Accès Citrix : ouvrir Workspace"], [{'source': "citrix.pdf"}])
+    assert len(index) == 3
+    assert [doc_id for doc_id, *_ in index.search("citrix")] == ["citrix"]
+    # Les listes de postings du document retiré ont disparu
+    assert "forticlient" not in index._postings
+
+
+def test_add_replaces_existing_document():
+    index = _index()
+    index.add(["vpn"], ["Téléphonie : transférer un appel"], [{'source': "vpn.pdf"}])
+    assert len(index) == 3
+    assert index.search("forticlient") == []
+    assert [doc_id for doc_id, *_ in index.search("transferer appel")] == ["vpn"]
+
+
+def test_update_metadata_keeps_text():
+    index = _index()
+    index.update_metadata(["vpn"], [{'source': "vpn.pdf", 'tags': "reseau"}])
+    (_, _, _, metadata), = index.search("forticlient")
+    assert metadata['tags'] == "reseau"
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], weights=[1.0, 1.0], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "d", "c"]
+    assert dict(fused)["b"] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_rrf_weights():
+    dense, lexical = ["a", "b"], ["b", "a"]
+    assert reciprocal_rank_fusion([dense, lexical], [1.0, 0.5])[0][0] == "a"
+    assert reciprocal_rank_fusion([dense, lexical], [0.5, 1.0])[0][0] == "b"
+
+
+# Recherche hybride : classement vecteurs (NumpyVectorStore) + BM25, fusionnés comme dans app.py
+CORPUS = {
+    'vpn': "Se connecter au VPN : ouvrir FortiClient et saisir son identifiant",
+    'teletravail': "Télétravail : accès distant au réseau de l'hôpital depuis le domicile",
+    'windows': "Erreur 0x80070005 lors de la mise à jour de Windows : relancer en administrateur",
+    'imprimante': "L'imprimante du service affiche une erreur papier",
+}
+# Vecteurs factices : la question « accès distant » est proche de vpn et teletravail
+EMBEDDINGS = {
+    'vpn': [1.0, 0.2, 0.0, 0.0],
+    'teletravail': [0.9, 0.0, 0.3, 0.0],
+    'windows': [0.0, 0.1, 0.2, 1.0],
+    'imprimante': [0.0, 1.0, 0.0, 0.3],
+}
+
+
+@pytest.fixture
+def hybrid(tmp_path):
+    from backend.vector_store import NumpyVectorStore
+
+    ids = list(CORPUS)
+    metadatas = [{'source': f"{doc_id}.pdf"} for doc_id in ids]
+    store = NumpyVectorStore(str(tmp_path / "index"), dimension=4, initial_capacity=4)
+    store.upsert(ids, [EMBEDDINGS[doc_id] for doc_id in ids], [CORPUS[doc_id] for doc_id in ids], metadatas)
+    index = BM25Index()
+    index.add(ids, [CORPUS[doc_id] for doc_id in ids], metadatas)
+
+    def search(query, query_vector, lexical_weight=0.5, k=4):
+        dense = [hit[0] for hit in store.query([query_vector], k)[0]]
+        lexical = [hit[0] for hit in index.search(query, k)]
+        fused = reciprocal_rank_fusion([dense, lexical], [1 - lexical_weight, lexical_weight])
+        return [doc_id for doc_id, _ in fused]
+    return search
+
+
+def test_hybrid_brings_exact_code_above_semantic_neighbours(hybrid):
+    # Question vague côté vecteurs (proche de vpn) mais code d'erreur exact côté BM25
+    ranked = hybrid("VPN erreur 0x80070005", [1.0, 0.1, 0.1, 0.2])
+    assert ranked[:2] == ["vpn", "windows"]
+    assert ranked.index("windows") < ranked.index("teletravail")
+
+
+def test_hybrid_weight_extremes_fall_back_to_one_ranking(hybrid):
+    query, vector = "erreur 0x80070005", [1.0, 0.1, 0.1, 0.2]
+    assert hybrid(query, vector, lexical_weight=0.0)[:2] == ["vpn", "teletravail"]
+    assert hybrid(query, vector, lexical_weight=1.0)[0] == "windows"
+
+
+def test_hybrid_keeps_semantic_match_without_shared_terms(hybrid):
+    # Aucun terme commun avec « teletravail » : le classement vectoriel suffit à le garder
+    ranked = hybrid("travailler depuis chez moi", [0.9, 0.0, 0.3, 0.0])
+    assert ranked[0] == "teletravail"
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Disjoncteur et appels LLM résilients (nouvelles tentatives, délais, couverture)"""
+
+import time
+
+import pytest
+
+from backend.llm_client import (CircuitBreaker, LLMTimeoutError, LLMUnavailableError,
+                                ResilientLLMClient, is_retryable)
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ScriptedProvider:
+    """Fonction create qui rejoue une suite de résultats (valeur, exception ou durée d'attente)"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def __call__(self, timeout=None, **kwargs):
+        self.calls.append(timeout)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, float):
+            time.sleep(outcome)
+            return "lent"
+        return outcome
+
+
+def _client(provider, **options):
+    options.setdefault('backoff_base', 0.0)
+    options.setdefault('backoff_max', 0.0)
+    return ResilientLLMClient(provider, **options)
+
+
+def test_is_retryable():
+    assert is_retryable(ProviderError(429))
+    assert is_retryable(ProviderError(503))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(ProviderError(400))
+    assert not is_retryable(ValueError())
+
+
+def test_breaker_opens_after_threshold_and_probes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # appel d'essai
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # un seul essai à la fois
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_breaker_reopens_when_probe_fails():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opens == 2
+    assert not breaker.allow()
+
+
+def test_retries_then_succeeds():
+    provider = ScriptedProvider(ProviderError(503), ProviderError(429), "ok")
+    client = _client(provider, max_retries=2)
+    assert client.create(model="m") == "ok"
+    assert client.stats['retries'] == 2 and client.stats['attempts'] == 3
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_gives_up_after_max_retries():
+    provider = ScriptedProvider(ProviderError(500))
+    client = _client(provider, max_retries=1)
+    with pytest.raises(ProviderError):
+        client.create()
+    assert len(provider.calls) == 2 and client.stats['failures'] == 1
+
+
+def test_request_errors_are_not_retried():
+    provider = ScriptedProvider(ProviderError(400))
+    client = _client(provider, breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(ProviderError):
+        client.create()
+    assert len(provider.calls) == 1
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_breaker_fails_fast():
+    provider = ScriptedProvider("ok")
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    client = _client(provider, breaker=breaker)
+    with pytest.raises(LLMUnavailableError):
+        client.create()
+    assert provider.calls == [] and client.stats['fast_failures'] == 1
+
+
+def test_failed_probe_raises_unavailable():
+    """Régression : l'échec de l'appel d'essai doit donner LLMUnavailableError, pas l'erreur du fournisseur"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    client = _client(ScriptedProvider(ProviderError(503)), breaker=breaker, max_retries=2)
+    with pytest.raises(LLMUnavailableError) as excinfo:
+        client.create()
+    assert isinstance(excinfo.value.__cause__, ProviderError)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_failure_that_opens_breaker_raises_unavailable():
+    client = _client(ScriptedProvider(ProviderError(503)), breaker=CircuitBreaker(failure_threshold=2),
+                     max_retries=5)
+    with pytest.raises(LLMUnavailableError):
+        client.create()
+    assert client.stats['attempts'] == 2
+
+
+def test_attempt_timeout_is_bounded_by_total_timeout():
+    provider = ScriptedProvider(ProviderError(503), "ok")
+    client = _client(provider, attempt_timeout=20.0, total_timeout=5.0)
+    assert client.create() == "ok"
+    assert all(timeout <= 5.0 for timeout in provider.calls)
+
+
+def test_hedge_wins_over_slow_first_attempt():
+    provider = ScriptedProvider(0.5, "rapide")
+    client = _client(provider, hedge=True, hedge_delay=0.05)
+    start = time.monotonic()
+    assert client.create() == "rapide"
+    assert time.monotonic() - start < 0.4
+    assert client.stats['hedges'] == 1 and client.stats['hedge_wins'] == 1
+
+
+def test_hedge_timeout():
+    client = _client(ScriptedProvider(0.5), hedge=True, hedge_delay=0.05, attempt_timeout=0.2,
+                     total_timeout=0.2, max_retries=0)
+    with pytest.raises(LLMTimeoutError):
+        client.create()
+    assert client.stats['timeouts'] == 1
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Fournisseur LLM : SDK Groq sur un serveur local, erreurs et délais vus par llm_client"""
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.llm_client import _retry_after, is_retryable
+from backend.llm_provider import LLMProvider, PoolConfig, ProviderConfig, load_provider_config
+
+COMPLETION = {'id': "c1", 'object': "chat.completion", 'created': 0, 'model': "m",
+              'choices': [{'index': 0, 'finish_reason': "stop",
+                           'message': {'role': "assistant", 'content': "Redémarrez le poste."}}],
+              'usage': {'prompt_tokens': 12, 'completion_tokens': 4, 'total_tokens': 16}}
+
+
+class Handler(BaseHTTPRequestHandler):
+    """/<type>/openai/v1/chat/completions — fast : réponse immédiate ; slow : en-têtes après 1 s ; error : 503"""
+
+    protocol_version = "HTTP/1.1"
+    paths = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        type(self).paths.append(self.path)
+        kind = self.path.split("/")[1]
+        try:
+            if kind == "error":
+                self._send(503, {'error': {'message': "surcharge"}}, {'Retry-After': "2"})
+                return
+            if kind == "slow":
+                time.sleep(1)
+            self._send(200, COMPLETION)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def _provider(base_url, path):
+    return LLMProvider(ProviderConfig("groq", f"{base_url}/{path}", "cle"), PoolConfig(max_connections=2))
+
+
+def test_groq_base_url_is_passed_to_the_sdk_unchanged():
+    config = load_provider_config("groq", "cle", "http://localhost:8100")
+    assert config.base_url == "http://localhost:8100"
+    assert load_provider_config("groq", "cle").base_url is None
+
+    with pytest.raises(ValueError):
+        load_provider_config("inconnu")
+
+
+def test_create_reuses_one_pooled_connection(server):
+    provider = _provider(server, "fast")
+    for _ in range(3):
+        completion = provider.create(model="m", messages=[{'role': "user", 'content': "vpn"}], timeout=5)
+        assert completion.choices[0].message.content == "Redémarrez le poste."
+        assert completion.usage.completion_tokens == 4
+
+    assert Handler.paths[-1] == "/fast/openai/v1/chat/completions"
+    stats = provider.get_stats()
+    assert stats['base_url'] == f"{server}/fast"
+    assert stats['pool'] == {'max_connections': 2, 'open': 1, 'in_use': 0, 'idle': 1}
+    provider.close()
+
+
+def test_http_error_is_not_retried_by_the_sdk(server):
+    provider = _provider(server, "error")
+    calls = len(Handler.paths)
+    with pytest.raises(Exception) as excinfo:
+        provider.create(model="m", messages=[], timeout=5)
+
+    # Nouvelles tentatives, Retry-After et disjoncteur : llm_client
+    assert len(Handler.paths) == calls + 1
+    assert excinfo.value.status_code == 503
+    assert is_retryable(excinfo.value)
+    assert _retry_after(excinfo.value) == 2.0
+    provider.close()
+
+
+def test_timeout_bounds_the_call(server):
+    provider = _provider(server, "slow")
+    start = time.monotonic()
+    with pytest.raises(Exception) as excinfo:
+        provider.create(model="m", messages=[], timeout=0.3)
+
+    assert time.monotonic() - start < 0.9
+    assert is_retryable(excinfo.value)
+    provider.close()
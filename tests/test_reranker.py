@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Tests du budget et de la file du reranker (cross-encoder factice)"""
+
+import sys
+import threading
+import types
+
+import pytest
+
+
+class SlowCrossEncoder:
+    """Score = longueur du texte ; bloque tant que `release` n'est pas levé"""
+
+    release = None
+    calls = 0
+
+    def __init__(self, name, max_length=256, device="cpu"):
+        pass
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        type(self).calls += 1
+        type(self).release.wait(5)
+        return [float(len(text)) for _, text in pairs]
+
+
+@pytest.fixture
+def reranker(monkeypatch):
+    module = types.ModuleType("sentence_transformers")
+    module.CrossEncoder = SlowCrossEncoder
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    SlowCrossEncoder.release = threading.Event()
+    SlowCrossEncoder.calls = 0
+    from backend.reranker import CrossEncoderReranker
+    instance = CrossEncoderReranker("fake", budget_ms=20)
+    yield instance
+    SlowCrossEncoder.release.set()
+    instance._executor.shutdown(wait=True)
+
+
+def _docs(*texts):
+    return [{'id': f"d{i}", 'content': text} for i, text in enumerate(texts)]
+
+
+def test_no_new_job_while_an_abandoned_one_runs(reranker):
+    docs = _docs("a", "bbb", "cc")
+
+    assert reranker.rerank("q", docs, 3) == docs
+    assert reranker.stats['fallbacks'] == 1
+
+    # Le premier scoring tourne encore : les requêtes suivantes ne s'empilent pas
+    for _ in range(5):
+        assert reranker.rerank("autre", _docs("x", "yy"), 2)[0]['id'] == "d0"
+    assert reranker.stats['skipped_busy'] == 5
+    assert SlowCrossEncoder.calls == 1
+    assert reranker._executor._work_queue.qsize() == 0
+
+
+def test_finished_job_fills_cache_and_frees_the_slot(reranker):
+    docs = _docs("a", "bbb", "cc")
+    reranker.rerank("q", docs, 3)
+
+    SlowCrossEncoder.release.set()
+    reranker._executor.submit(lambda: None).result(timeout=5)
+
+    ranked = reranker.rerank("q", _docs("a", "bbb", "cc"), 2)
+    assert [doc['id'] for doc in ranked] == ["d1", "d2"]
+    assert reranker.stats['cache_hits'] == 3
+
+    ranked = reranker.rerank("q2", _docs("zz", "z"), 1)
+    assert ranked[0]['id'] == "d0"
+    assert SlowCrossEncoder.calls == 2
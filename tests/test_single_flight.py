@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Coalescence des requêtes identiques en cours"""
+
+import asyncio
+
+import pytest
+
+from backend.single_flight import SingleFlight
+
+
+def _counted(calls, result, delay=0.05, error=None):
+    async def fn():
+        calls.append(result)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return result
+    return fn
+
+
+def test_identical_calls_share_one_computation():
+    async def run():
+        flight, calls = SingleFlight(), []
+        results = await asyncio.gather(*(flight.do("q", _counted(calls, "réponse")) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(run())
+    assert calls == ["réponse"]
+    assert [result for result, _ in results] == ["réponse"] * 5
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    assert flight.get_stats() == {'leaders': 1, 'coalesced': 4, 'max_waiters': 5, 'in_flight': 0}
+
+
+def test_distinct_keys_and_sequential_calls_are_not_coalesced():
+    async def run():
+        flight, calls = SingleFlight(), []
+        await asyncio.gather(flight.do("a", _counted(calls, "a")), flight.do("b", _counted(calls, "b")))
+        await flight.do("a", _counted(calls, "a2"))
+        return flight, calls
+
+    flight, calls = asyncio.run(run())
+    assert calls == ["a", "b", "a2"]
+    assert flight.get_stats()['leaders'] == 3 and flight.get_stats()['coalesced'] == 0
+
+
+def test_error_reaches_every_caller_and_clears_the_key():
+    async def run():
+        flight, calls = SingleFlight(), []
+        failing = _counted(calls, "x", error=RuntimeError("LLM indisponible"))
+        results = await asyncio.gather(flight.do("q", failing), flight.do("q", failing), return_exceptions=True)
+        retry, shared = await flight.do("q", _counted(calls, "ok"))
+        return calls, results, retry, shared
+
+    calls, results, retry, shared = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert (retry, shared) == ("ok", False)
+    assert calls == ["x", "ok"]
+
+
+def test_leader_cancellation_does_not_cancel_followers():
+    async def run():
+        flight, calls = SingleFlight(), []
+        fn = _counted(calls, "réponse", delay=0.1)
+        leader = asyncio.ensure_future(flight.do("q", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("q", fn))
+        await asyncio.sleep(0.02)
+        leader.cancel()  # client déconnecté
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return calls, await follower, flight.get_stats()['in_flight']
+
+    calls, follower, in_flight = asyncio.run(run())
+    assert calls == ["réponse"]
+    assert follower == ("réponse", True)
+    assert in_flight == 0
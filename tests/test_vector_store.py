@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""NumpyVectorStore : recherche exhaustive, suppressions, persistance"""
+
+import numpy as np
+import pytest
+
+from backend.vector_store import NumpyVectorStore
+
+DIM = 16
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def _fill(store, vectors, metadatas=None):
+    ids = [f"c{i}" for i in range(len(vectors))]
+    store.upsert(ids, vectors, [f"texte {i}" for i in range(len(vectors))],
+                 metadatas or [{'source': f"doc{i % 3}.pdf"} for i in range(len(vectors))])
+    return ids
+
+
+def _exact(vectors, query, k, rows=None):
+    """Top-k cosinus de référence (ids)"""
+    rows = np.arange(len(vectors)) if rows is None else np.asarray(rows)
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed[rows] @ (query / np.linalg.norm(query))
+    return [f"c{rows[i]}" for i in np.argsort(-scores)[:k]]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(str(tmp_path / "index"), dimension=DIM, initial_capacity=4)
+
+
+def test_query_matches_brute_force(store):
+    vectors = _vectors(50)
+    _fill(store, vectors)
+    queries = _vectors(3, seed=1)
+    hits = store.query(queries, n_results=5)
+    for query, query_hits in zip(queries, hits):
+        assert [hit[0] for hit in query_hits] == _exact(vectors, query, 5)
+        distances = [hit[1] for hit in query_hits]
+        assert distances == sorted(distances)
+    chunk_id, distance, text, metadata = hits[0][0]
+    assert text == f"texte {chunk_id[1:]}" and 'source' in metadata
+
+
+def test_distance_is_cosine(store):
+    _fill(store, np.eye(DIM, dtype=np.float32)[:2] * 3)
+    (first, second), = store.query([np.eye(DIM)[0]], n_results=2)
+    assert first[0] == "c0" and first[1] == pytest.approx(0.0, abs=1e-6)
+    assert second[1] == pytest.approx(1.0, abs=1e-6)
+
+
+def test_delete_reuses_rows_and_upsert_replaces(store):
+    vectors = _vectors(10)
+    _fill(store, vectors)
+    store.delete(["c3", "absent"])
+    assert store.count() == 9
+    assert "c3" not in [hit[0] for hit in store.query([vectors[3]], n_results=9)[0]]
+
+    store.upsert(["nouveau"], [vectors[3]], ["remplaçant"], [{'source': "doc0.pdf"}])
+    assert store.count() == 10 and len(store._ids) == 10
+    assert store.query([vectors[3]], n_results=1)[0][0][0] == "nouveau"
+
+    store.upsert(["c0"], [vectors[5]], ["modifié"], [{'source': "doc0.pdf"}])
+    assert store.count() == 10
+    assert {hit[0] for hit in store.query([vectors[5]], n_results=2)[0]} == {"c0", "c5"}
+
+
+def test_n_results_larger_than_store(store):
+    _fill(store, _vectors(3))
+    assert len(store.query(_vectors(1, seed=1), n_results=10)[0]) == 3
+    store.reset()
+    assert store.count() == 0
+    assert store.query(_vectors(2, seed=1), n_results=3) == [[], []]
+
+
+def test_persist_and_reload(tmp_path):
+    directory = str(tmp_path / "index")
+    vectors = _vectors(20)
+    store = NumpyVectorStore(directory, dimension=DIM, initial_capacity=4)
+    _fill(store, vectors)
+    store.delete(["c7"])
+    store.persist()
+    expected = store.query(vectors[:2], n_results=4)
+    del store
+
+    reloaded = NumpyVectorStore(directory, dimension=DIM)
+    assert reloaded.count() == 19
+    assert reloaded.query(vectors[:2], n_results=4) == expected
+    ids, texts, metadatas = reloaded.get_all()
+    assert "c7" not in ids and len(texts) == len(metadatas) == 19
+
+
+# ==========================================
+# FILTRES
+# ==========================================
+
+from backend.vector_store import matches_where, source_key  # noqa: E402
+
+
+def _tagged_metadatas(n):
+    return [{'source': f"doc{i % 4}.pdf", 'file_type': "pdf" if i % 2 else "docx",
+             'tag_reseau': i % 3 == 0, 'doc_date': 20240101 + i, 'page': i} for i in range(n)]
+
+
+def test_matches_where():
+    metadata = {'source': "vpn.pdf", 'doc_date': 20240315}
+    assert matches_where(metadata, None)
+    assert matches_where(metadata, {'source': "vpn.pdf"})
+    assert matches_where(metadata, {'doc_date': {'$gte': 20240101, '$lt': 20250101}})
+    assert not matches_where(metadata, {'source': {'$nin': ["vpn.pdf"]}})
+    assert matches_where(metadata, {'$or': [{'source': "x.pdf"}, {'doc_date': {'$gt': 20240000}}]})
+    assert not matches_where(metadata, {'$and': [{'source': "vpn.pdf"}, {'file_type': "pdf"}]})
+    # Clé absente : aucune comparaison satisfaite, comme ChromaDB
+    assert not matches_where(metadata, {'page': {'$gt': 0}})
+    assert not matches_where(metadata, {'page': {'$ne': 3}})
+    assert matches_where(metadata, {'page': {'$nin': [3]}})
+
+
+@pytest.mark.parametrize("where", [
+    {'source': "doc1.pdf"},
+    {'file_type': "pdf"},  # peu sélectif : balayage complet masqué
+    {'source': {'$in': ["doc0.pdf", "doc2.pdf"]}, 'file_type': "pdf"},
+    {'tag_reseau': True},
+    {'doc_date': {'$gte': 20240110, '$lt': 20240120}},
+    {'$and': [{'file_type': {'$eq': "docx"}}, {'page': {'$lt': 12}}]},
+    {'$or': [{'source': "doc3.pdf"}, {'page': {'$gte': 35}}]},
+    {'source': "inconnu.pdf"},
+])
+def test_filtered_query_matches_brute_force(store, where):
+    vectors = _vectors(40)
+    metadatas = _tagged_metadatas(40)
+    _fill(store, vectors, metadatas)
+    store.delete(["c5"])
+    rows = [i for i, metadata in enumerate(metadatas) if i != 5 and matches_where(metadata, where)]
+
+    assert sorted(store.ids_where(where)) == sorted(f"c{i}" for i in rows)
+    query = _vectors(1, seed=2)[0]
+    hits = store.query([query], n_results=4, where=where)[0]
+    assert [hit[0] for hit in hits] == (_exact(vectors, query, 4, rows) if rows else [])
+    assert all(matches_where(hit[3], where) for hit in hits)
+
+
+def test_source_filter_matches_every_source_of_a_chunk(store):
+    """Chunk dédupliqué : trouvé par chacun de ses documents, pas seulement le principal"""
+    vectors = _vectors(4)
+    metadatas = [{'source': "v1.pdf", source_key("v1.pdf"): True, source_key("v2.pdf"): True},
+                 {'source': "v1.pdf", source_key("v1.pdf"): True},
+                 {'source': "v2.pdf", source_key("v2.pdf"): True},
+                 {'source': "autre.pdf", source_key("autre.pdf"): True}]
+    _fill(store, vectors, metadatas)
+    assert sorted(store.ids_where({source_key("v2.pdf"): True})) == ["c0", "c2"]
+    either = {'$or': [{source_key("v2.pdf"): True}, {source_key("autre.pdf"): True}]}
+    assert sorted(store.ids_where(either)) == ["c0", "c2", "c3"]
+    assert {hit[0] for hit in store.query([vectors[0]], n_results=4, where=either)[0]} == {"c0", "c2", "c3"}
+
+
+def test_filter_indexes_follow_metadata_updates(store):
+    _fill(store, _vectors(6), _tagged_metadatas(6))
+    store.update_metadata(["c0"], [{'source': "deplace.pdf", 'doc_date': 20300101}])
+    assert store.ids_where({'source': "deplace.pdf"}) == ["c0"]
+    assert "c0" not in store.ids_where({'source': "doc0.pdf"})
+    assert store.ids_where({'doc_date': {'$gt': 20290000}}) == ["c0"]
+    store.delete(["c0"])
+    assert store.ids_where({'source': "deplace.pdf"}) == []
+
+
+# ==========================================
+# COMPRESSION
+# ==========================================
+
+from backend.vector_compression import VectorCompressor  # noqa: E402
+
+
+def _clustered(n, seed=0):
+    """Vecteurs de rang faible + bruit : structure que la PCA conserve"""
+    basis = np.random.default_rng(0).normal(size=(6, DIM))
+    rng = np.random.default_rng(seed + 1)
+    return (rng.normal(size=(n, 6)) @ basis + 0.05 * rng.normal(size=(n, DIM))).astype(np.float32)
+
+
+def test_unknown_compression_method():
+    with pytest.raises(ValueError):
+        VectorCompressor("pq")
+
+
+@pytest.mark.parametrize("method", ["int8", "pca", "pca_int8"])
+def test_compressed_query_rescored_in_float32(tmp_path, method):
+    vectors = _clustered(400)
+    store = NumpyVectorStore(str(tmp_path / method), dimension=DIM, compression=method, reduced_dim=8)
+    _fill(store, vectors)
+    store.fit_compression()
+    assert store.compressed
+    stats = store.get_stats()
+    assert stats['compression'] == method and stats['search_bytes'] < stats['float32_bytes']
+
+    queries = _clustered(20, seed=1)
+    recalls = []
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    for query, hits in zip(queries, store.query(queries, n_results=5)):
+        exact = _exact(vectors, query, 5)
+        recalls.append(len({hit[0] for hit in hits} & set(exact)) / 5)
+        # Distances des candidats retenus : recalculées en float32
+        for chunk_id, distance, _, _ in hits:
+            cosine = normed[int(chunk_id[1:])] @ (query / np.linalg.norm(query))
+            assert distance == pytest.approx(1 - cosine, abs=1e-5)
+    assert np.mean(recalls) >= 0.9
+
+
+def test_compression_deferred_on_small_corpus(tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "index"), dimension=DIM, compression="int8")
+    vectors = _vectors(20)
+    _fill(store, vectors)
+    store.fit_compression()
+    assert not store.compressed
+    assert [hit[0] for hit in store.query([vectors[4]], n_results=1)[0]] == ["c4"]
+
+
+def test_compression_survives_upsert_and_reload(tmp_path):
+    directory = str(tmp_path / "index")
+    vectors = _clustered(301)
+    vectors, extra = vectors[:300], vectors[300:]
+    store = NumpyVectorStore(directory, dimension=DIM, compression="pca_int8", reduced_dim=8)
+    _fill(store, vectors)
+    store.fit_compression()
+    store.upsert(["ajout"], extra, ["ajouté"], [{'source': "doc0.pdf"}])
+    assert store.query(extra, n_results=1)[0][0][0] == "ajout"
+    store.persist()
+    expected = store.query(extra, n_results=5)
+    del store
+
+    reloaded = NumpyVectorStore(directory, dimension=DIM, compression="pca_int8", reduced_dim=8)
+    assert reloaded.compressed
+    assert reloaded.query(extra, n_results=5) == expected